@@ -12,14 +12,18 @@ from fastapi import UploadFile, File, Form, APIRouter
 import pandas as pd
 from elasticsearch import Elasticsearch, helpers
 import os
-from app.services.excel_to_elasticsearch import ExcelToElasticsearch
+from app.services.agent_jobs import agent_jobs
+from app.services.ingestion_jobs import IngestionJob, IngestionQueueFull, ingestion_jobs
+from app.utils.upload_spool import FORM_OVERHEAD, InvalidUpload, SpooledFile, SpooledForm, UploadTooLarge, spool_form
+import itertools
 import tempfile
-from app.services.avatar import generate_speech
-from fastapi.responses import JSONResponse, FileResponse
+from app.services.avatar import AUDIO_MEDIA_TYPES, generate_speech, stream_speech
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 import requests
 import tempfile
-from app.services.predictive_analysis import  get_predictive_analysis,generate_predictive_report
+from app.services.predictive_analysis import  get_predictive_analysis,get_batch_predictive_analysis,generate_predictive_report
 from app.services.next_step_agent import  next_step_analyser
+from app.services.report_store import report_store
 
 # Add these imports at the top of your agent_job.py file
 
@@ -41,19 +45,29 @@ def create_job(job: AgentJob):
 
 @router.get("/agent-job/{job_id}")
 def get_job(job_id: str):
-    return agent_job_dao.get_by_id(job_id)
+    """Status of a queued /run job: QUEUED, RUNNING (with lease), COMPLETED or FAILED."""
+    job = agent_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"Agent job '{job_id}' not found"}
+        )
+    return job
 
 @router.get("/agent-jobs/status/{status}")
 def get_jobs_by_status(status: str):
     return agent_job_dao.search_jobs_by_status(status)
 
 
-@router.post("/run")
+@router.post("/run", status_code=202)
 def run_agent_job(payload: dict = Body(...)):
     input_text = payload["input"]
     tenant_id = payload["tenant_id"]
-    chain = payload["agent_chain"]  # List of agent names
-    return dispatch_agent_job(input_text, tenant_id, chain)
+    chain = payload["agent_chain"]  # Agent names, or {"agent", "depends_on"} entries for a DAG
+    try:
+        return dispatch_agent_job(input_text, tenant_id, chain)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
 
 @router.post("/run-autogen")
@@ -174,17 +188,61 @@ def run_individual_agent_endpoint(payload: dict = Body(...), request: Request =
     
 
 
-@router.post("/uploadfile")
-async def upload_file(
-    file: UploadFile = File(...),
-    sub_index: str = Form(...),
-    index_name: str = Form(...),
-    tenant_id: str = Form(...)
-):
-    temp_path = None
-    start_time = time.time()
-    
+def _multipart_form(file_field: str, required: List[str], optional: dict = None, many: bool = False) -> dict:
+    """OpenAPI requestBody for routes that read their multipart body themselves (see spool_form)."""
+    file_schema = {"type": "string", "format": "binary"}
+    properties = {file_field: {"type": "array", "items": file_schema} if many else file_schema}
+    properties.update({name: {"type": "string"} for name in required})
+    properties.update({name: {"type": "string", "default": default} for name, default in (optional or {}).items()})
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": properties, "required": [file_field] + required}}}}}
+
+
+def _form_errors(form: SpooledForm, file_field: str, required: List[str]):
+    """A 422 response naming missing form parts, like FastAPI's own validation, or None."""
+    missing = [name for name in required if name not in form.fields]
+    if not form.get_files(file_field):
+        missing.insert(0, file_field)
+    if missing:
+        return JSONResponse(status_code=422, content={"error": f"Missing form field(s): {', '.join(missing)}"})
+    return None
+
+
+@router.post("/uploadfile", status_code=202,
+             openapi_extra=_multipart_form("file", ["sub_index", "index_name", "tenant_id"]))
+async def upload_file(request: Request):
+    """Accept an Excel upload and enqueue it as a background ingestion job.
+
+    The body is read with spool_form, so the file goes to disk once as it
+    arrives and an oversized upload is refused without receiving all of it.
+    Returns immediately with a job id; poll /uploadfile/jobs/{job_id} for
+    rows parsed/embedded/indexed and the final result.
+    """
+    # Spool the upload to disk as it arrives, enforcing the size limit (10MB)
+    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    try:
+        form = await spool_form(request, max_file_size=MAX_FILE_SIZE, max_body_size=MAX_FILE_SIZE + FORM_OVERHEAD)
+    except UploadTooLarge:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB"}
+        )
+    except InvalidUpload as invalid:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(invalid)}
+        )
+    handed_over = None
+    file = None
+
     try:
+        invalid = _form_errors(form, "file", ["sub_index", "index_name", "tenant_id"])
+        if invalid is not None:
+            return invalid
+        file = form.get_files("file")[0]
+        upload = file.upload
+        sub_index, index_name, tenant_id = form.fields["sub_index"], form.fields["index_name"], form.fields["tenant_id"]
+
         # Enhanced validation
         if not file.filename:
             return JSONResponse(
@@ -198,18 +256,6 @@ async def upload_file(
                 content={"error": "Only Excel files (.xlsx, .xls) are supported"}
             )
 
-        # File size validation (e.g., 10MB limit)
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            return JSONResponse(
-                status_code=413,
-                content={
-                    "error": f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB",
-                    "actual_size_mb": round(len(content) / (1024*1024), 2)
-                }
-            )
-
         # Validate input parameters
         if not all([sub_index.strip(), index_name.strip(), tenant_id.strip()]):
             return JSONResponse(
@@ -222,82 +268,37 @@ async def upload_file(
         index_name = re.sub(r'[^a-zA-Z0-9_-]', '', index_name.strip())
         tenant_id = re.sub(r'[^a-zA-Z0-9_-]', '', tenant_id.strip())
 
-        # Save uploaded file temporarily with better naming
-        file_extension = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(
-            delete=False, 
-            suffix=file_extension,
-            prefix=f"{tenant_id}_{sub_index}_"
-        ) as temp_file:
-            temp_file.write(content)
-            temp_path = temp_file.name
-
-        logger.info(f"Processing file: {file.filename}, size: {len(content)} bytes, tenant: {tenant_id}")
-
-        # Initialize and validate Elasticsearch connection
-        pipeline = ExcelToElasticsearch(
-            index_name=index_name, 
-            sub_index=sub_index,
-            tenant_id=tenant_id
-        )
-        
-        if not pipeline.validate_elasticsearch_connection():
-            return JSONResponse(
-                status_code=503,
-                content={
-                    "error": "Elasticsearch connection failed",
-                    "suggestion": "Please check Elasticsearch service status"
-                }
-            )
+        logger.info(f"Queueing file: {file.filename}, size: {upload.size} bytes, tenant: {tenant_id}")
 
-        # Process the Excel file with progress tracking
         try:
-            processing_result = pipeline.process_excel(temp_path)
-            processing_time = time.time() - start_time
-            
-            # Get additional metrics if available
-            stats = {}
-            if hasattr(processing_result, 'get') and isinstance(processing_result, dict):
-                stats = processing_result
-            
-            return {
-                "message": f"File '{file.filename}' processed and indexed successfully.",
-                "index_name": index_name,
-                "sub_index": sub_index,
-                "tenant_id": tenant_id,
-                "processing_time_seconds": round(processing_time, 2),
-                "file_size_mb": round(len(content) / (1024*1024), 2),
-                "stats": stats,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-        except Exception as processing_error:
-            logger.error(f"Excel processing failed: {str(processing_error)}")
+            job = ingestion_jobs.submit(IngestionJob(
+                tenant_id=tenant_id,
+                index_name=index_name,
+                sub_index=sub_index,
+                filename=file.filename,
+                file_path=upload.path,
+                file_hash=upload.md5
+            ))
+        except IngestionQueueFull as queue_error:
             return JSONResponse(
-                status_code=422,
-                content={
-                    "error": f"Failed to process Excel file: {str(processing_error)}",
-                    "file": file.filename,
-                    "suggestion": "Please check if the Excel file format is valid and contains data"
-                }
+                status_code=503,
+                content={"error": str(queue_error)}
             )
 
-    except asyncio.TimeoutError:
-        return JSONResponse(
-            status_code=408,
-            content={
-                "error": "File processing timeout",
-                "file": file.filename if file.filename else "unknown"
-            }
-        )
-    except MemoryError:
-        return JSONResponse(
-            status_code=413,
-            content={
-                "error": "File too large to process in memory",
-                "suggestion": "Please try with a smaller file"
-            }
-        )
+        # The ingestion worker owns the temp file from here on
+        handed_over = upload.path
+        return {
+            "message": f"File '{file.filename}' queued for processing.",
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": f"/api/v1/uploadfile/jobs/{job.job_id}",
+            "index_name": index_name,
+            "sub_index": sub_index,
+            "tenant_id": tenant_id,
+            "file_size_mb": round(upload.size / (1024*1024), 2),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
     except Exception as e:
         logger.exception(f"Unexpected error processing file {getattr(file, 'filename', 'unknown')}: {str(e)}")
         return JSONResponse(
@@ -309,20 +310,22 @@ async def upload_file(
             }
         )
     finally:
-        # Enhanced cleanup with retry mechanism
-        if temp_path and os.path.exists(temp_path):
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    os.unlink(temp_path)
-                    logger.info(f"Temporary file {temp_path} cleaned up successfully")
-                    break
-                except Exception as cleanup_error:
-                    if attempt == max_retries - 1:
-                        logger.error(f"Failed to clean up temporary file after {max_retries} attempts: {cleanup_error}")
-                    else:
-                        logger.warning(f"Cleanup attempt {attempt + 1} failed, retrying: {cleanup_error}")
-                        await asyncio.sleep(0.1)  # Brief pause before retry
+        try:
+            form.cleanup(keep=handed_over)
+        except Exception as cleanup_error:
+            logger.error(f"Failed to clean up temporary upload files: {cleanup_error}")
+
+
+@router.get("/uploadfile/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Progress of an ingestion job: status plus rows parsed, embedded and indexed."""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"Ingestion job '{job_id}' not found"}
+        )
+    return job.to_dict()
 
 
 @router.post("/text-to-speech")
@@ -350,6 +353,17 @@ def convert_text_to_speech(payload: dict = Body(...), request: Request = None):
             "voice": voice
         })
 
+        if payload.get("stream"):
+            # Stream sentence-sized audio chunks as they are synthesized
+            response_format = payload.get("response_format", "mp3")
+            chunks = stream_speech(text=text, tenant_id=tenant_id, voice=voice, response_format=response_format)
+            first_chunk = next(chunks, b"")  # failures before any audio still get a JSON error
+            return StreamingResponse(
+                itertools.chain([first_chunk], chunks),
+                media_type=AUDIO_MEDIA_TYPES.get(response_format, "application/octet-stream"),
+                headers={"X-Tenant-ID": tenant_id}
+            )
+
         # Generate audio with OpenAI TTS
         audio_path = generate_speech(text=text, tenant_id=tenant_id, voice=voice)
 
@@ -390,16 +404,38 @@ def convert_text_to_speech(payload: dict = Body(...), request: Request = None):
 
 
 import requests
+import threading
 import time
 import os
 import tempfile
 import logging
+import hashlib
+from collections import OrderedDict
+from typing import Tuple
 from fastapi import File, UploadFile, Form
 from fastapi.responses import JSONResponse
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from starlette.concurrency import run_in_threadpool
 
 logger = logging.getLogger(__name__)
 
+NIFI_HEALTH_TTL_SECONDS = 30
+NIFI_POOL_SIZE = 16
+NIFI_UPLOADER_CACHE_SIZE = 8
+
+NIFI_CONTENT_TYPES = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xls': 'application/vnd.ms-excel',
+    '.csv': 'text/csv',
+    '.txt': 'text/plain',
+    '.json': 'application/json',
+    '.xml': 'application/xml',
+    '.pdf': 'application/pdf'
+}
+
+
 class NiFiUploader:
     def __init__(self, nifi_url: str, username: str = None, password: str = None):
         # Properly format the NiFi URL for internal Docker communication
@@ -423,10 +459,18 @@ class NiFiUploader:
         self.username = username
         self.password = password
         self.session = requests.Session()
+
+        # Keep-alive connection pool shared by every upload to this NiFi
+        adapter = HTTPAdapter(pool_connections=NIFI_POOL_SIZE, pool_maxsize=NIFI_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
         # Set up authentication if provided
         if username and password:
             self.session.auth = HTTPBasicAuth(username, password)
+
+        self._health_lock = threading.Lock()
+        self._healthy_until = 0.0
             
         logger.info(f"NiFi URL set to: {self.nifi_url}")
         logger.info(f"NiFi API base URL: {self.api_base_url}")
@@ -449,6 +493,20 @@ class NiFiUploader:
         except Exception as e:
             logger.error(f"NiFi connection validation failed: {str(e)}")
             return False
+
+    def is_healthy(self) -> bool:
+        """validate_nifi_connection, cached for NIFI_HEALTH_TTL_SECONDS after a success."""
+        with self._health_lock:
+            if time.monotonic() < self._healthy_until:
+                return True
+            healthy = self.validate_nifi_connection()
+            if healthy:
+                self._healthy_until = time.monotonic() + NIFI_HEALTH_TTL_SECONDS
+            return healthy
+
+    def mark_unhealthy(self) -> None:
+        with self._health_lock:
+            self._healthy_until = 0.0
     
     def get_listen_http_processors(self) -> list:
         """Get all ListenHTTP processors"""
@@ -472,11 +530,17 @@ class NiFiUploader:
         except Exception as e:
             logger.error(f"Failed to get ListenHTTP processors: {str(e)}")
             return []
-    
+
     def upload_file_to_nifi(self, file_path: str, filename: str, 
                            content_type: str = 'application/octet-stream',
                            additional_attributes: dict = None) -> dict:
-        """Upload file to NiFi ListenHTTP processor"""
+        """Upload file to NiFi ListenHTTP processor.
+
+        Sent as the same multipart/form-data body as before (one `file`
+        part), but encoded with MultipartEncoder so the file is streamed
+        from `file_path` over the pooled session instead of being loaded
+        into memory.
+        """
         try:
             # For ListenHTTP processor, we typically upload to a specific endpoint
             # You may need to adjust this URL based on your NiFi processor configuration
@@ -495,14 +559,14 @@ class NiFiUploader:
                     headers[f'X-{key}'] = str(value)
             
             with open(file_path, 'rb') as file:
-                files = {
+                body = MultipartEncoder(fields={
                     'file': (filename, file, content_type)
-                }
-                
-                # For ListenHTTP, we typically use POST without authentication
-                response = requests.post(
+                })
+                headers['Content-Type'] = body.content_type
+
+                response = self.session.post(
                     upload_url,
-                    files=files,
+                    data=body,
                     headers=headers,
                     timeout=300  # 5 minutes timeout for large files
                 )
@@ -519,86 +583,60 @@ class NiFiUploader:
         except requests.exceptions.Timeout:
             raise Exception("Upload to NiFi timed out")
         except requests.exceptions.ConnectionError as e:
+            self.mark_unhealthy()
             raise Exception(f"Failed to connect to NiFi: {str(e)}")
         except Exception as e:
             raise Exception(f"NiFi upload failed: {str(e)}")
 
 
+_nifi_uploaders: "OrderedDict[Tuple[str, str], NiFiUploader]" = OrderedDict()
+_nifi_uploaders_lock = threading.Lock()
 
-@router.post("/upload-to-nifi")
-async def upload_to_nifi(
-    file: UploadFile = File(...),
-    nifi_url: str = Form(...),
-    tenant_id: str = Form(...),
-    process_name: str = Form(default="file_processing"),
-    nifi_username: str = Form(default="admin"),
-    nifi_password: str = Form(default="admin123456789"),
-    allowed_extensions: str = Form(default=".xlsx,.xls,.csv,.txt,.json,.xml")
-):
-    """
-    Upload file to NiFi for processing
+
+def _nifi_uploader_key(nifi_url: str, username: str = None, password: str = None) -> Tuple[str, str]:
+    # Credentials only enter the key as a digest, never in plain text
+    credentials = hashlib.sha256(f"{username or ''}\0{password or ''}".encode("utf-8")).hexdigest()
+    return nifi_url, credentials
+
+
+def get_nifi_uploader(nifi_url: str, username: str = None, password: str = None) -> NiFiUploader:
+    """Pooled NiFiUploader per (NiFi URL, credentials), reused across requests.
+
+    Kept in a small LRU of NIFI_UPLOADER_CACHE_SIZE entries so callers
+    passing arbitrary URLs can't grow it without bound.
     """
+    key = _nifi_uploader_key(nifi_url, username, password)
+    with _nifi_uploaders_lock:
+        uploader = _nifi_uploaders.get(key)
+        if uploader is None:
+            uploader = NiFiUploader(nifi_url=nifi_url, username=username, password=password)
+            _nifi_uploaders[key] = uploader
+        _nifi_uploaders.move_to_end(key)
+        while len(_nifi_uploaders) > NIFI_UPLOADER_CACHE_SIZE:
+            _nifi_uploaders.popitem(last=False)
+        return uploader
+
+
+async def _send_to_nifi(uploader: NiFiUploader, file: SpooledFile, tenant_id: str,
+                        process_name: str, max_file_size: int) -> dict:
+    """Stream one spooled upload to NiFi; returns a per-file result."""
     temp_path = None
     try:
-        # Parse allowed extensions
-        allowed_exts = [ext.strip() for ext in allowed_extensions.split(',')]
-        
-        # Validate file type
-        if not any(file.filename.lower().endswith(ext.lower()) for ext in allowed_exts):
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "error": f"File type not supported. Allowed extensions: {', '.join(allowed_exts)}",
-                    "filename": file.filename
-                }
-            )
-
-        # Validate file size (optional - set your own limits)
-        MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            return JSONResponse(
-                status_code=413,
-                content={
-                    "error": f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024):.0f}MB",
-                    "file_size_mb": len(content) / (1024*1024)
-                }
-            )
-
-        # Save uploaded file temporarily
         file_extension = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file.write(content)
-            temp_path = temp_file.name
+        upload = file.upload
+        if upload is None:
+            return {
+                "status_code": 413,
+                "error": f"File too large. Maximum size: {max_file_size / (1024*1024):.0f}MB",
+                "file_size_mb": file.size / (1024*1024),
+                "filename": file.filename
+            }
+        temp_path = upload.path
 
-        logger.info(f"Processing file: {file.filename}, size: {len(content)} bytes")
-
-        # Initialize NiFi uploader
-        uploader = NiFiUploader(
-            nifi_url=nifi_url,
-            username=nifi_username,
-            password=nifi_password
-        )
-        
-        # Validate NiFi connection
-        if not uploader.validate_nifi_connection():
-            return JSONResponse(
-                status_code=503,
-                content={"error": "NiFi connection failed. Please check the NiFi URL and credentials."}
-            )
+        logger.info(f"Processing file: {file.filename}, size: {upload.size} bytes")
 
         # Determine content type based on file extension
-        content_type_mapping = {
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.xls': 'application/vnd.ms-excel',
-            '.csv': 'text/csv',
-            '.txt': 'text/plain',
-            '.json': 'application/json',
-            '.xml': 'application/xml',
-            '.pdf': 'application/pdf'
-        }
-        
-        content_type = content_type_mapping.get(
+        content_type = NIFI_CONTENT_TYPES.get(
             file_extension.lower(), 
             'application/octet-stream'
         )
@@ -608,12 +646,14 @@ async def upload_to_nifi(
             'tenant-id': tenant_id,
             'process-name': process_name,
             'original-filename': file.filename,
-            'file-size': len(content),
+            'file-size': upload.size,
+            'file-md5': upload.md5,
             'upload-timestamp': str(int(time.time()))  # Fixed: use time.time() instead of os.time.time()
         }
 
-        # Upload file to NiFi
-        upload_result = uploader.upload_file_to_nifi(
+        # Upload file to NiFi off the event loop
+        upload_result = await run_in_threadpool(
+            uploader.upload_file_to_nifi,
             file_path=temp_path,
             filename=file.filename,
             content_type=content_type,
@@ -621,43 +661,196 @@ async def upload_to_nifi(
         )
 
         if not upload_result['success']:
+            return {
+                "status_code": upload_result['status_code'],
+                "error": f"NiFi upload failed with status {upload_result['status_code']}",
+                "nifi_response": upload_result['response_text'],
+                "filename": file.filename
+            }
+
+        return {
+            "status_code": 200,
+            "filename": file.filename,
+            "file_size_bytes": upload.size,
+            "upload_status": "success",
+            "nifi_response": upload_result['response_text']
+        }
+    finally:
+        # Clean up temporary file
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.unlink(temp_path)
+                logger.info(f"Temporary file {temp_path} cleaned up")
+            except Exception as e:
+                logger.warning(f"Failed to clean up temporary file: {str(e)}")
+
+
+def _unsupported_files(files: List[SpooledFile], allowed_exts: List[str]) -> List[str]:
+    return [
+        file.filename for file in files
+        if not any(file.filename.lower().endswith(ext.lower()) for ext in allowed_exts)
+    ]
+
+
+NIFI_FORM_DEFAULTS = {
+    "process_name": "file_processing",
+    "nifi_username": "admin",
+    "nifi_password": "admin123456789",
+    "allowed_extensions": ".xlsx,.xls,.csv,.txt,.json,.xml",
+}
+
+
+@router.post("/upload-to-nifi",
+             openapi_extra=_multipart_form("file", ["nifi_url", "tenant_id"], NIFI_FORM_DEFAULTS))
+async def upload_to_nifi(request: Request):
+    """
+    Upload file to NiFi for processing
+    """
+    # Validate file size (optional - set your own limits)
+    MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+    try:
+        form = await spool_form(request, max_file_size=MAX_FILE_SIZE, max_body_size=MAX_FILE_SIZE + FORM_OVERHEAD)
+    except UploadTooLarge as too_large:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "error": f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024):.0f}MB",
+                "file_size_mb": too_large.size / (1024*1024)
+            }
+        )
+    except InvalidUpload as invalid:
+        return JSONResponse(status_code=400, content={"error": str(invalid)})
+    file = None
+
+    try:
+        invalid = _form_errors(form, "file", ["nifi_url", "tenant_id"])
+        if invalid is not None:
+            return invalid
+        file = form.get_files("file")[0]
+        fields = {**NIFI_FORM_DEFAULTS, **form.fields}
+        nifi_url, tenant_id, process_name = fields["nifi_url"], fields["tenant_id"], fields["process_name"]
+        nifi_username, nifi_password = fields["nifi_username"], fields["nifi_password"]
+        allowed_extensions = fields["allowed_extensions"]
+
+        # Parse allowed extensions
+        allowed_exts = [ext.strip() for ext in allowed_extensions.split(',')]
+        
+        # Validate file type
+        if _unsupported_files([file], allowed_exts):
             return JSONResponse(
-                status_code=upload_result['status_code'],
+                status_code=400,
                 content={
-                    "error": f"NiFi upload failed with status {upload_result['status_code']}",
-                    "nifi_response": upload_result['response_text'],
+                    "error": f"File type not supported. Allowed extensions: {', '.join(allowed_exts)}",
                     "filename": file.filename
                 }
             )
 
+        # Pooled uploader; connection health is cached for a short TTL
+        uploader = get_nifi_uploader(nifi_url, nifi_username, nifi_password)
+        if not await run_in_threadpool(uploader.is_healthy):
+            return JSONResponse(
+                status_code=503,
+                content={"error": "NiFi connection failed. Please check the NiFi URL and credentials."}
+            )
+
+        result = await _send_to_nifi(uploader, file, tenant_id, process_name, MAX_FILE_SIZE)
+
+        status_code = result.pop("status_code")
+        if status_code != 200:
+            return JSONResponse(status_code=status_code, content=result)
+
         return {
             "message": f"File '{file.filename}' uploaded to NiFi successfully.",
-            "filename": file.filename,
             "tenant_id": tenant_id,
             "process_name": process_name,
-            "file_size_bytes": len(content),
             "nifi_url": nifi_url,
-            "upload_status": "success",
-            "nifi_response": upload_result['response_text']
+            **result
         }
 
     except Exception as e:
-        logger.exception(f"Error uploading file {file.filename} to NiFi: {str(e)}")
+        logger.exception(f"Error uploading file {getattr(file, 'filename', 'unknown')} to NiFi: {str(e)}")
         return JSONResponse(
             status_code=500,
             content={
                 "error": f"Failed to upload file to NiFi: {str(e)}",
-                "filename": file.filename
+                "filename": getattr(file, 'filename', 'unknown')
             }
         )
     finally:
-        # Clean up temporary file
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-                logger.info(f"Temporary file {temp_path} cleaned up")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file: {str(e)}")
+        form.cleanup()
+
+
+@router.post("/upload-to-nifi/batch",
+             openapi_extra=_multipart_form("files", ["nifi_url", "tenant_id"], NIFI_FORM_DEFAULTS, many=True))
+async def upload_many_to_nifi(request: Request):
+    """
+    Upload several files to NiFi concurrently over one pooled connection set
+    """
+    MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+    try:
+        # Oversized files are reported per file below instead of failing the batch
+        form = await spool_form(request, max_file_size=MAX_FILE_SIZE, drain_oversized=True)
+    except InvalidUpload as invalid:
+        return JSONResponse(status_code=400, content={"error": str(invalid)})
+
+    try:
+        invalid = _form_errors(form, "files", ["nifi_url", "tenant_id"])
+        if invalid is not None:
+            return invalid
+        files = form.get_files("files")
+        fields = {**NIFI_FORM_DEFAULTS, **form.fields}
+        nifi_url, tenant_id, process_name = fields["nifi_url"], fields["tenant_id"], fields["process_name"]
+        nifi_username, nifi_password = fields["nifi_username"], fields["nifi_password"]
+        allowed_extensions = fields["allowed_extensions"]
+
+        allowed_exts = [ext.strip() for ext in allowed_extensions.split(',')]
+        unsupported = _unsupported_files(files, allowed_exts)
+        if unsupported:
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "error": f"File type not supported. Allowed extensions: {', '.join(allowed_exts)}",
+                    "filenames": unsupported
+                }
+            )
+
+        uploader = get_nifi_uploader(nifi_url, nifi_username, nifi_password)
+        if not await run_in_threadpool(uploader.is_healthy):
+            return JSONResponse(
+                status_code=503,
+                content={"error": "NiFi connection failed. Please check the NiFi URL and credentials."}
+            )
+
+        results = await asyncio.gather(
+            *(_send_to_nifi(uploader, file, tenant_id, process_name, MAX_FILE_SIZE) for file in files),
+            return_exceptions=True
+        )
+
+        files_result = []
+        for file, result in zip(files, results):
+            if isinstance(result, Exception):
+                result = {"status_code": 500, "error": str(result), "filename": file.filename}
+            files_result.append(result)
+        uploaded = sum(1 for result in files_result if result["status_code"] == 200)
+
+        return {
+            "message": f"{uploaded} of {len(files)} file(s) uploaded to NiFi.",
+            "tenant_id": tenant_id,
+            "process_name": process_name,
+            "nifi_url": nifi_url,
+            "uploaded": uploaded,
+            "failed": len(files) - uploaded,
+            "files": files_result
+        }
+
+    except Exception as e:
+        logger.exception(f"Error uploading files to NiFi: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Failed to upload files to NiFi: {str(e)}"}
+        )
+    finally:
+        form.cleanup()
 
 @router.post("/predictive-analysis")
 def run_predictive_analysis(payload: dict = Body(...), request: Request = None):
@@ -671,18 +864,19 @@ def run_predictive_analysis(payload: dict = Body(...), request: Request = None):
         metric_key = payload.get("metric_key", chart_data.get("title", "metric"))
         chart_type = chart_data.get("plotType", "line")
         analysis_type = payload.get("analysis_type", "quick")  # "quick" or "full"
+        include_narrative = payload.get("include_narrative")  # None -> PREDICTIVE_LLM_NARRATIVE
 
         if not chart_data:
             return {"status": "error", "message": "chart_data is required"}
 
         if analysis_type == "quick":
             # Quick predictive summary (returns chart with predictions)
-            predicted_chart = get_predictive_analysis(chart_data)
+            predicted_chart = get_predictive_analysis(chart_data, include_narrative=include_narrative, tenant_id=tenant_id)
             return {"status": "success", "chart_data": predicted_chart}
 
         elif analysis_type == "full":
-            # Full report: save to file and return chart + report path
-            predicted_chart = get_predictive_analysis(chart_data)
+            # Full report: queued for a background write; returns chart + report path
+            predicted_chart = get_predictive_analysis(chart_data, include_narrative=include_narrative, tenant_id=tenant_id)
             report_path = generate_predictive_report(
                 chart_data=predicted_chart,
                 tenant_id=tenant_id,
@@ -698,6 +892,56 @@ def run_predictive_analysis(payload: dict = Body(...), request: Request = None):
         return {"status": "error", "message": str(e)}
 
 
+@router.post("/predictive-analysis/batch")
+def run_batch_predictive_analysis(payload: dict = Body(...), request: Request = None):
+    """
+    Forecast every chart of a dashboard in one request.
+    Accepts "charts" as either {metric_key: chart_data} or a list of
+    {"metric_key": ..., "chart_data": ...}; returns results keyed by metric.
+    """
+    try:
+        charts = payload.get("charts")
+        tenant_id = payload.get("tenant_id", "default_tenant")
+        include_narrative = payload.get("include_narrative")  # None -> PREDICTIVE_LLM_NARRATIVE
+
+        if not charts:
+            return {"status": "error", "message": "charts is required"}
+
+        if isinstance(charts, list):
+            keyed = {}
+            for i, item in enumerate(charts):
+                chart_data = item.get("chart_data", {}) if isinstance(item, dict) else {}
+                metric_key = item.get("metric_key") if isinstance(item, dict) else None
+                metric_key = metric_key or chart_data.get("title") or f"chart_{i}"
+                if metric_key in keyed:
+                    metric_key = f"{metric_key}_{i}"
+                keyed[metric_key] = chart_data
+            charts = keyed
+
+        results = get_batch_predictive_analysis(charts, include_narrative=include_narrative, tenant_id=tenant_id)
+        return {
+            "status": "success",
+            "results": {
+                metric_key: ({"status": "error", "message": result["error"]} if "error" in result
+                             else {"status": "success", "chart_data": result})
+                for metric_key, result in results.items()
+            }
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@router.get("/predictive-reports/{tenant_id}")
+def list_predictive_reports(tenant_id: str, metric_key: str = None, limit: int = 50):
+    """Newest-first metadata of a tenant's saved predictive reports."""
+    try:
+        reports = report_store.list_reports(tenant_id, metric_key=metric_key, limit=limit)
+        return {"status": "success", "reports": reports}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
 @router.post("/next-step-analysis")
 def run_next_step_analysis(payload: dict = Body(...), request: Request = None):
     """
@@ -763,7 +1007,7 @@ def run_next_step_analysis(payload: dict = Body(...), request: Request = None):
         logger.info(f"Next-step analysis request: tenant={tenant_id}, metric={metric_key}")
 
         # Run analysis using NextStepAnalyser
-        result = next_step_analyser.analyze(analysis_input)
+        result = next_step_analyser.analyze(analysis_input, tenant_id=tenant_id)
 
 
         # Handle analysis errors/blocks
@@ -31,6 +31,7 @@ def _flatten_agents() -> List[Dict[str, Any]]:
         "token_budget": parent_data.get("token_budget"),
         "retry_policy": parent_data.get("retry_policy", {}),
         "critical": parent_data.get("critical", False),
+        "fused_mode": bool(parent_data.get("fused_mode", False)),
       })
       for sub in parent_data.get("sub_agents", []):
         llm_cfg_sub = sub.get("llm_config") or {}
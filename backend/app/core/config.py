@@ -35,6 +35,12 @@ class Settings(BaseSettings):
     elasticsearch_password: Optional[str] = Field(
         default=None, env="ELASTICSEARCH_PASSWORD"
     )
+    # Shared client tuning (see app.core.elastic)
+    elasticsearch_pool_maxsize: int = Field(default=25, env="ES_POOL_MAXSIZE")
+    elasticsearch_request_timeout: float = Field(default=30, env="ES_REQUEST_TIMEOUT")
+    elasticsearch_max_retries: int = Field(default=3, env="ES_MAX_RETRIES")
+    elasticsearch_retry_on_timeout: bool = Field(default=True, env="ES_RETRY_ON_TIMEOUT")
+    elasticsearch_http_compress: bool = Field(default=False, env="ES_HTTP_COMPRESS")
     
     # Kafka Configuration
     kafka_bootstrap_servers: str = Field(
@@ -112,12 +118,57 @@ class Settings(BaseSettings):
     # Performance Configuration
     max_workers: int = Field(default=4, env="MAX_WORKERS")
     worker_timeout: int = Field(default=30, env="WORKER_TIMEOUT")
-    
+
+    # Ingestion Configuration
+    ingestion_chunk_size: int = Field(default=500, env="INGESTION_CHUNK_SIZE")
+    ingestion_embedding_batch_size: int = Field(default=64, env="INGESTION_EMBEDDING_BATCH_SIZE")
+    ingestion_embedding_workers: int = Field(default=2, env="INGESTION_EMBEDDING_WORKERS")
+    ingestion_embedding_processes: bool = Field(default=False, env="INGESTION_EMBEDDING_PROCESSES")
+    ingestion_max_in_flight_chunks: int = Field(default=4, env="INGESTION_MAX_IN_FLIGHT_CHUNKS")
+    ingestion_job_workers: int = Field(default=1, env="INGESTION_JOB_WORKERS")
+    ingestion_job_queue_size: int = Field(default=50, env="INGESTION_JOB_QUEUE_SIZE")
+    ingestion_job_retention: int = Field(default=500, env="INGESTION_JOB_RETENTION")
+
+    # Agent Job Queue Configuration
+    agent_job_broker: str = Field(default="memory", env="AGENT_JOB_BROKER")  # "memory" or "kafka"
+    agent_job_workers: int = Field(default=2, env="AGENT_JOB_WORKERS")
+    agent_job_lease_seconds: float = Field(default=120, env="AGENT_JOB_LEASE_SECONDS")
+    agent_job_heartbeat_seconds: float = Field(default=30, env="AGENT_JOB_HEARTBEAT_SECONDS")
+    agent_job_max_attempts: int = Field(default=3, env="AGENT_JOB_MAX_ATTEMPTS")
+    agent_job_timeout_seconds: float = Field(default=1800, env="AGENT_JOB_TIMEOUT_SECONDS")
+    agent_chain_max_parallel: int = Field(default=4, env="AGENT_CHAIN_MAX_PARALLEL")
+    agent_retry_workers: int = Field(default=4, env="AGENT_RETRY_WORKERS")
+    agent_retry_max_delay_seconds: float = Field(default=60, env="AGENT_RETRY_MAX_DELAY_SECONDS")
+    agent_prompt_max_tokens: int = Field(default=8000, env="AGENT_PROMPT_MAX_TOKENS")
+    agent_context_max_tokens: int = Field(default=3000, env="AGENT_CONTEXT_MAX_TOKENS")
+    agent_context_max_columns: int = Field(default=12, env="AGENT_CONTEXT_MAX_COLUMNS")
+    orchestrator_prefetch_workers: int = Field(default=8, env="ORCHESTRATOR_PREFETCH_WORKERS")
+
+    # Predictive Analysis Configuration
+    predictive_llm_narrative: bool = Field(default=False, env="PREDICTIVE_LLM_NARRATIVE")
+    predictive_narrative_max_tokens: int = Field(default=400, env="PREDICTIVE_NARRATIVE_MAX_TOKENS")
+    predictive_custom_prompt_max_tokens: int = Field(default=4000, env="PREDICTIVE_CUSTOM_PROMPT_MAX_TOKENS")
+    analysis_cache_ttl_seconds: int = Field(default=3600, env="ANALYSIS_CACHE_TTL_SECONDS")
+    analysis_cache_max_entries: int = Field(default=512, env="ANALYSIS_CACHE_MAX_ENTRIES")
+    analysis_cache_use_es: bool = Field(default=True, env="ANALYSIS_CACHE_USE_ES")
+    analysis_cache_prune_interval_seconds: int = Field(default=3600, env="ANALYSIS_CACHE_PRUNE_INTERVAL_SECONDS")
+    predictive_report_retention_days: int = Field(default=30, env="PREDICTIVE_REPORT_RETENTION_DAYS")
+    predictive_report_max_per_tenant: int = Field(default=200, env="PREDICTIVE_REPORT_MAX_PER_TENANT")
+
+    # Text-to-Speech Configuration
+    tts_cache_dir: str = Field(default="temp_audio", env="TTS_CACHE_DIR")
+    tts_cache_max_bytes: int = Field(default=512 * 1024 * 1024, env="TTS_CACHE_MAX_BYTES")
+    tts_stream_max_parallel: int = Field(default=3, env="TTS_STREAM_MAX_PARALLEL")
+    tts_stream_workers: int = Field(default=8, env="TTS_STREAM_WORKERS")
+
     # Feature Flags
     enable_agent_chaining: bool = Field(default=True, env="ENABLE_AGENT_CHAINING")
     enable_memory_management: bool = Field(default=True, env="ENABLE_MEMORY_MANAGEMENT")
     enable_token_tracking: bool = Field(default=True, env="ENABLE_TOKEN_TRACKING")
     enable_llm_guard: bool = Field(default=True, env="ENABLE_LLM_GUARD")
+    llm_guard_timeout_seconds: float = Field(default=20.0, env="LLM_GUARD_TIMEOUT_SECONDS")
+    llm_guard_cache_size: int = Field(default=2048, env="LLM_GUARD_CACHE_SIZE")
+    llm_guard_workers: int = Field(default=4, env="LLM_GUARD_WORKERS")
     
     class Config:
         env_file = ".env"
@@ -136,17 +187,21 @@ class Settings(BaseSettings):
     def is_production(self) -> bool:
         return self.environment == Environment.PRODUCTION
     
-    def get_elasticsearch_config(self):
-        """Get Elasticsearch configuration based on environment"""
+    def get_elasticsearch_config(self, url: Optional[str] = None):
+        """Get Elasticsearch client options based on environment"""
         config = {
-            "hosts": [self.elasticsearch_url],
-            "timeout": 30,
-            "max_retries": 3,
-            "retry_on_timeout": True
+            "hosts": [url or self.elasticsearch_url],
+            "request_timeout": self.elasticsearch_request_timeout,
+            "max_retries": self.elasticsearch_max_retries,
+            "retry_on_timeout": self.elasticsearch_retry_on_timeout,
+            "retry_on_status": (429, 502, 503, 504),
+            # Pooled keep-alive connections per node, shared by all threads
+            "connections_per_node": self.elasticsearch_pool_maxsize,
+            "http_compress": self.elasticsearch_http_compress
         }
         
         if self.elasticsearch_username and self.elasticsearch_password:
-            config["http_auth"] = (self.elasticsearch_username, self.elasticsearch_password)
+            config["basic_auth"] = (self.elasticsearch_username, self.elasticsearch_password)
         
         if self.is_production:
             config["verify_certs"] = True
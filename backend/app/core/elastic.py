@@ -3,20 +3,72 @@
 import os
 import time
 import logging
-from elasticsearch import Elasticsearch, ConnectionError
+import threading
+from typing import Optional
+from elasticsearch import AsyncElasticsearch, Elasticsearch, ConnectionError
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-ES_URL = os.getenv("ES_URL", "http://elasticsearch:9200")
+# ES_URL still wins for deployments that set it; otherwise ELASTICSEARCH_URL
+ES_URL = os.getenv("ES_URL") or settings.elasticsearch_url
+
+_client: Optional[Elasticsearch] = None
+_async_client: Optional[AsyncElasticsearch] = None
+_client_lock = threading.Lock()
+
+
+def create_es_client(url: Optional[str] = None) -> Elasticsearch:
+    """Build a new tuned client with its own connection pool.
+
+    Everything in the app should share get_es_client(); this is for the
+    rare caller that needs a different cluster.
+    """
+    return Elasticsearch(**settings.get_elasticsearch_config(url or ES_URL))
+
+
+def get_es_client() -> Elasticsearch:
+    """The process-wide client: one keep-alive connection pool, tuned from settings.
+
+    Creating it does not touch the network, so importing this module is
+    cheap; use wait_for_es() where startup should block until ES answers.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_es_client()
+    return _client
+
 
-def get_es_client(retries: int = 10, delay: float = 3.0) -> Elasticsearch:
+def _async_node_class() -> str:
+    try:
+        import aiohttp  # noqa: F401
+        return "aiohttp"
+    except ImportError:
+        return "httpxasync"
+
+
+def get_async_es_client() -> AsyncElasticsearch:
+    """Async twin of get_es_client() with the same tuning, for use from async routes."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncElasticsearch(node_class=_async_node_class(),
+                                                   **settings.get_elasticsearch_config(ES_URL))
+    return _async_client
+
+
+def wait_for_es(retries: int = 10, delay: float = 3.0) -> Elasticsearch:
+    """Ping the shared client until Elasticsearch answers."""
+    client = get_es_client()
     for attempt in range(retries):
         try:
-            es = Elasticsearch(ES_URL)
-
-            if es.ping():
+            if client.ping():
                 logger.info(f"✅ Connected to Elasticsearch at {ES_URL}")
-                return es
+                return client
             else:
                 logger.warning(f"❌ Attempt {attempt+1}: Ping failed.")
         except ConnectionError as e:
@@ -25,5 +77,18 @@ def get_es_client(retries: int = 10, delay: float = 3.0) -> Elasticsearch:
 
     raise RuntimeError("❌ Could not connect to Elasticsearch after retries")
 
+
+async def close_es_clients() -> None:
+    """Close the shared clients' connection pools (application shutdown)."""
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client, _async_client = None, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+
 # Global client instance (import this)
 es = get_es_client()
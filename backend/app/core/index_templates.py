@@ -8,7 +8,15 @@ INDEX_TEMPLATES = {
                 "created_at": {"type": "date"},
                 "updated_at": {"type": "date"},
                 "input": {"type": "text"},
-                "output": {"type": "text"}
+                "output": {"type": "text"},
+                "agent_chain": {"type": "object", "enabled": False},
+                "started_at": {"type": "date"},
+                "finished_at": {"type": "date"},
+                "worker_id": {"type": "keyword"},
+                "lease_expires_at": {"type": "date", "format": "epoch_millis"},
+                "heartbeat_at": {"type": "date"},
+                "attempts": {"type": "integer"},
+                "error": {"type": "text"}
             }
         }
     },
@@ -20,7 +28,25 @@ INDEX_TEMPLATES = {
                 "step": {"type": "integer"},
                 "agent_name": {"type": "keyword"},
                 "status": {"type": "keyword"},
-                "log": {"type": "text"}
+                "log": {"type": "text"},
+                "attempt_count": {"type": "integer"},
+                "duration_ms": {"type": "float"},
+                "attempts": {
+                    "type": "nested",
+                    "properties": {
+                        "attempt": {"type": "integer"},
+                        "started_at": {"type": "date"},
+                        "prompt_tokens": {"type": "integer"},
+                        "context_trimmed": {"type": "boolean"},
+                        "duration_ms": {"type": "float"},
+                        "status": {"type": "keyword"},
+                        "error": {"type": "text"},
+                        "retryable": {"type": "boolean"},
+                        "status_code": {"type": "integer"},
+                        "retry_after": {"type": "float"},
+                        "retry_in_seconds": {"type": "float"}
+                    }
+                }
             }
         }
     },
@@ -77,6 +103,17 @@ INDEX_TEMPLATES = {
             }
         }
     },
+    "analysis_cache": {
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0},
+        "mappings": {
+            "properties": {
+                "kind": {"type": "keyword"},
+                "tenant_id": {"type": "keyword"},
+                "expires_at": {"type": "date", "format": "epoch_second"},
+                "value": {"type": "object", "enabled": False}
+            }
+        }
+    },
     "token_usage": {
         "mappings": {
             "properties": {
@@ -1,5 +1,4 @@
 # app/dao/job_index.py
-from elasticsearch import Elasticsearch
 from app.core.elastic import get_es_client
 
 INDEX_NAME = "agent-jobs"
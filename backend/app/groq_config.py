@@ -1,45 +1,58 @@
 from vault.client import get_vault_secret
+from functools import lru_cache
 import os
 
-def get_groq_config():
-    """
-    Updated configuration to support Groq, hosted LM Studio, and OpenRouter
-    """
-    # Check which provider to use based on environment variables
-    provider = os.getenv("AI_PROVIDER", "openrouter").lower()
-    
+
+@lru_cache(maxsize=None)
+def _provider_config(provider: str) -> dict:
+    """Model/base URL and where the API key lives, resolved once per provider."""
     if provider == "lm_studio":
         # Hosted LM Studio configuration
-        # Try to get API key from vault, fallback to environment variable
-        try:
-            api_key = get_vault_secret(secret_path="lm_studio", key="api_key")
-            print("api_key", api_key)
-        except:
-            api_key = os.getenv("LM_STUDIO_API_KEY", "lm-studio")
-        
         return {
             "model": os.getenv("LM_STUDIO_MODEL", "qwen/qwen3-coder-30b"),
-            "api_key": api_key,
-            "base_url": os.getenv("LM_STUDIO_BASE_URL", "https://api.pinguaicloud.com/v1")
+            "base_url": os.getenv("LM_STUDIO_BASE_URL", "https://api.pinguaicloud.com/v1"),
+            "secret_path": "lm_studio",
+            "fallback_api_key": os.getenv("LM_STUDIO_API_KEY", "lm-studio")
         }
     elif provider == "openrouter":
         # OpenRouter configuration
-        # Try to get API key from vault, fallback to environment variable
-        try:
-            api_key = get_vault_secret(secret_path="openrouter", key="api_key")
-        except:
-            api_key = os.getenv("OPENROUTER_API_KEY")
-        
         return {
             "model": os.getenv("OPENROUTER_MODEL", "openai/gpt-4.1-mini"),
-            "api_key": api_key,
-            "base_url": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+            "base_url": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+            "secret_path": "openrouter",
+            "fallback_api_key": os.getenv("OPENROUTER_API_KEY")
         }
     else:
-        # Default Groq configuration
-        api_key = get_vault_secret(secret_path="groq", key="api_key")
+        # Default Groq configuration (no environment fallback)
         return {
             "model": os.getenv("GROQ_MODEL", "gemma2-9b-it"),
-            "api_key": api_key,
-            "base_url": os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
-        }
\ No newline at end of file
+            "base_url": os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+            "secret_path": "groq",
+            "fallback_api_key": None
+        }
+
+
+def get_groq_config():
+    """
+    Updated configuration to support Groq, hosted LM Studio, and OpenRouter
+
+    The provider settings are resolved once; the API key comes from the
+    in-process Vault secret cache, so this is cheap to call per LLM step.
+    """
+    # Check which provider to use based on environment variables
+    provider = os.getenv("AI_PROVIDER", "openrouter").lower()
+    config = _provider_config(provider)
+
+    # Try to get API key from vault, fallback to environment variable
+    try:
+        api_key = get_vault_secret(secret_path=config["secret_path"], key="api_key")
+    except Exception:
+        if provider not in ("lm_studio", "openrouter"):
+            raise
+        api_key = config["fallback_api_key"]
+
+    return {
+        "model": config["model"],
+        "api_key": api_key,
+        "base_url": config["base_url"]
+    }
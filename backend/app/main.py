@@ -11,7 +11,7 @@ from app.api.v1.routes import status as status_routes
 from app.api.v1.routes import agents as agents_routes
 from app.api.v1.routes import kafka_status as kafka_status_routes
 from app.core.index_manager import IndexManager
-from app.core.elastic import get_es_client
+from app.core.elastic import close_es_clients, wait_for_es
 from app.core.core_log import logger
 from app.core.config import settings, get_environment_config
 
@@ -64,10 +64,18 @@ if settings.is_development or settings.is_testing:
 async def startup_event():
     logger.info("🚀 Starting up EA AURA Backend...")
     try:
-        get_es_client()
+        wait_for_es()
         IndexManager.create_indices()
         logger.info("✅ Elasticsearch and indices initialized successfully")
        
+        # Start agent job workers (/run chains execute here, not in the request)
+        try:
+            from app.services.agent_jobs import agent_jobs
+            agent_jobs.start()
+            logger.info(f"✅ Agent job workers started ({settings.agent_job_broker} broker)")
+        except Exception as job_error:
+            logger.warning(f"⚠️ Agent job workers failed to start: {job_error}")
+
         # Start Kafka event monitoring
         try:
             from app.services.kafka_event_monitor import start_kafka_monitoring
@@ -83,6 +91,11 @@ async def startup_event():
             raise e
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_es_clients()
+
+
 # CORS middleware with environment-specific origins
 app.add_middleware(
     CORSMiddleware,
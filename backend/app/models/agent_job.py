@@ -1,10 +1,23 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
 
 class AgentJob(BaseModel):
-    id: Optional[str]
+    id: Optional[str] = None
+    job_id: Optional[str] = None
     tenant_id: str
-    job_type: str
-    status: str
+    job_type: str = "agent_chain"
+    status: str  # QUEUED -> RUNNING -> COMPLETED | FAILED
+    input: str = ""
+    output: str = ""
+    agent_chain: List[Union[str, Dict[str, Any]]] = []  # names or {"agent", "depends_on"} entries
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Lease held by the worker running the job, renewed by its heartbeat
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[int] = None  # epoch millis
+    heartbeat_at: Optional[datetime] = None
+    attempts: int = 0
+    error: Optional[str] = None
@@ -0,0 +1,444 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from elasticsearch import ConflictError, Elasticsearch, NotFoundError
+from kafka import KafkaConsumer, KafkaProducer
+
+from app.core.config import settings
+from app.core.elastic import get_es_client
+from app.core.core_log import agent_logger as logger
+
+AGENT_JOB_INDEX = "agent_job"
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+
+
+def _now_millis() -> int:
+    return int(time.time() * 1000)
+
+
+def _claimable(job: Dict[str, Any], now_millis: int) -> bool:
+    if job.get("status") == "QUEUED":
+        return True
+    # A RUNNING job whose worker stopped heartbeating may be taken over
+    return job.get("status") == "RUNNING" and (job.get("lease_expires_at") or 0) < now_millis
+
+
+# --- Job state ---------------------------------------------------------------
+
+class AgentJobStore:
+    """Agent job documents in the `agent_job` index, keyed by job_id.
+
+    Claims, heartbeats and requeues are compare-and-set updates (if_seq_no /
+    if_primary_term), so two workers can never both hold a job's lease.
+    """
+
+    def __init__(self, index: str = AGENT_JOB_INDEX):
+        self.index = index
+        self._es: Optional[Elasticsearch] = None
+
+    @property
+    def es(self) -> Elasticsearch:
+        if self._es is None:
+            self._es = get_es_client()
+        return self._es
+
+    def create(self, job: Dict[str, Any]) -> None:
+        self.es.index(index=self.index, id=job["job_id"], document=job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.es.get(index=self.index, id=job_id)["_source"]
+        except NotFoundError:
+            return None
+
+    def _compare_and_set(self, job_id: str, update: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+                         ) -> Optional[Dict[str, Any]]:
+        try:
+            doc = self.es.get(index=self.index, id=job_id)
+        except NotFoundError:
+            return None
+        changes = update(doc["_source"])
+        if changes is None:
+            return None
+        try:
+            # No transport retries: a retried write that had already landed would
+            # conflict with its own new seq_no and report a lease we actually hold as lost
+            self.es.options(max_retries=0).update(index=self.index, id=job_id, doc=changes,
+                                                  if_seq_no=doc["_seq_no"], if_primary_term=doc["_primary_term"])
+        except ConflictError:
+            return None
+        return {**doc["_source"], **changes}
+
+    def claim(self, job_id: str, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        def update(job):
+            now = _now_millis()
+            if not _claimable(job, now):
+                return None
+            return {
+                "status": "RUNNING",
+                "worker_id": worker_id,
+                "lease_expires_at": now + int(lease_seconds * 1000),
+                "heartbeat_at": datetime.utcnow().isoformat(),
+                "started_at": job.get("started_at") or datetime.utcnow().isoformat(),
+                "attempts": int(job.get("attempts") or 0) + 1,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+        return self._compare_and_set(job_id, update)
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        def update(job):
+            if job.get("status") != "RUNNING" or job.get("worker_id") != worker_id:
+                return None
+            return {
+                "lease_expires_at": _now_millis() + int(lease_seconds * 1000),
+                "heartbeat_at": datetime.utcnow().isoformat()
+            }
+        return self._compare_and_set(job_id, update) is not None
+
+    def finish(self, job_id: str, worker_id: str, status: str, output: str = "", error: Optional[str] = None) -> bool:
+        def update(job):
+            if job.get("worker_id") != worker_id or job.get("status") in TERMINAL_STATUSES:
+                return None
+            return {
+                "status": status,
+                "output": output,
+                "error": error,
+                "lease_expires_at": None,
+                "finished_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat()
+            }
+        return self._compare_and_set(job_id, update) is not None
+
+    def requeue_expired(self, job_id: str, max_attempts: int) -> Optional[str]:
+        """Release an expired lease; returns the new status, or None if it was renewed meanwhile."""
+        def update(job):
+            if job.get("status") != "RUNNING" or (job.get("lease_expires_at") or 0) >= _now_millis():
+                return None
+            if int(job.get("attempts") or 0) >= max_attempts:
+                return {"status": "FAILED", "error": "Worker lease expired too many times",
+                        "lease_expires_at": None, "finished_at": datetime.utcnow().isoformat(),
+                        "updated_at": datetime.utcnow().isoformat()}
+            return {"status": "QUEUED", "worker_id": None, "lease_expires_at": None,
+                    "updated_at": datetime.utcnow().isoformat()}
+        changed = self._compare_and_set(job_id, update)
+        return changed["status"] if changed else None
+
+    def expired(self, limit: int = 100) -> List[str]:
+        result = self.es.search(index=self.index, size=limit, query={
+            "bool": {"filter": [
+                {"term": {"status": "RUNNING"}},
+                {"range": {"lease_expires_at": {"lt": _now_millis()}}}
+            ]}
+        }, source=False)
+        return [hit["_id"] for hit in result["hits"]["hits"]]
+
+
+class InMemoryAgentJobStore(AgentJobStore):
+    """Process-local stand-in for AgentJobStore (tests, single-process dev)."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _compare_and_set(self, job_id, update):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            changes = update(dict(job))
+            if changes is None:
+                return None
+            job.update(changes)
+            return dict(job)
+
+    def expired(self, limit: int = 100) -> List[str]:
+        now = _now_millis()
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items()
+                    if job.get("status") == "RUNNING" and (job.get("lease_expires_at") or 0) < now][:limit]
+
+
+# --- Delivery ----------------------------------------------------------------
+
+class InMemoryJobBroker:
+    """queue.Queue-backed broker: jobs are only seen by this process."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+
+    def publish(self, job_id: str) -> None:
+        self._queue.put(job_id)
+
+    def consume(self, stop: threading.Event) -> Iterator[Tuple[str, Callable[[], None]]]:
+        while not stop.is_set():
+            try:
+                job_id = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            yield job_id, self._queue.task_done
+
+
+class KafkaJobBroker:
+    """Job ids on a Kafka topic; every worker thread joins one consumer group.
+
+    Offsets are committed only after a job has been handled (at-least-once);
+    a redelivered job that already finished is skipped by the lease claim.
+    The chain runs between two polls, so `max_poll_interval_seconds` must
+    outlast the longest job (AGENT_JOB_TIMEOUT_SECONDS); otherwise the group
+    rebalances mid-job and the commit fails with CommitFailedError.
+    """
+
+    def __init__(self, topic: str, bootstrap_servers: str, group_id: str, max_poll_interval_seconds: float = 300):
+        self.topic = topic
+        self.bootstrap_servers = bootstrap_servers
+        self.group_id = group_id
+        self.max_poll_interval_seconds = max_poll_interval_seconds
+        self._producer = None
+        self._producer_lock = threading.Lock()
+
+    def publish(self, job_id: str) -> None:
+        with self._producer_lock:
+            if self._producer is None:
+                self._producer = KafkaProducer(
+                    bootstrap_servers=self.bootstrap_servers,
+                    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+                    retries=3,
+                )
+        self._producer.send(self.topic, value={"job_id": job_id})
+        self._producer.flush()
+
+    def consume(self, stop: threading.Event) -> Iterator[Tuple[str, Callable[[], None]]]:
+        consumer = KafkaConsumer(
+            self.topic,
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=self.group_id,
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+            max_poll_records=1,
+            max_poll_interval_ms=int(self.max_poll_interval_seconds * 1000),
+            value_deserializer=lambda m: json.loads(m.decode("utf-8")),
+        )
+        try:
+            while not stop.is_set():
+                for records in consumer.poll(timeout_ms=1000).values():
+                    for record in records:
+                        yield record.value["job_id"], consumer.commit
+        finally:
+            consumer.close()
+
+
+# --- Workers -----------------------------------------------------------------
+
+def run_agent_job(job: Dict[str, Any], cancelled: threading.Event) -> str:
+    """Orchestrator first, then the requested agent chain on its output.
+
+    Stops before the next step once `cancelled` is set (lease lost or job timed out).
+    """
+    from app.services.chaining_controller import ChainCancelled, execute_chain
+    from app.services.orchestrator_agent import run_autogen_agent
+
+    orchestrator_output = run_autogen_agent(job["input"], job["tenant_id"])
+    if cancelled.is_set():
+        raise ChainCancelled(f"Agent job {job['job_id']} cancelled after the orchestrator")
+    if not isinstance(orchestrator_output, str):
+        orchestrator_output = json.dumps(orchestrator_output, default=str)
+    return execute_chain(job["job_id"], orchestrator_output, job["agent_chain"], job["tenant_id"],
+                         cancelled=cancelled)
+
+
+class AgentJobQueue:
+    """Runs agent chains on worker threads, detached from HTTP requests.
+
+    `enqueue` stores the job as QUEUED and publishes its id; workers claim it
+    with a lease (RUNNING), renew the lease from a heartbeat thread while the
+    chain runs, and finish it as COMPLETED or FAILED. A reaper hands jobs
+    whose lease ran out (crashed or stuck worker) back to the queue, up to
+    `max_attempts` times.
+
+    The handler gets a cancellation event it checks between steps. It is set
+    when the lease is lost (renewal refused, or not renewed before it
+    expired), in which case another worker may already run the job and
+    nothing more is written for it here, and when the job runs past
+    `timeout_seconds`, which fails it.
+    """
+
+    def __init__(self, store: AgentJobStore, broker,
+                 handler: Callable[[Dict[str, Any], threading.Event], str] = run_agent_job,
+                 workers: int = 2, lease_seconds: float = 120, heartbeat_seconds: float = 30,
+                 max_attempts: int = 3, timeout_seconds: Optional[float] = None):
+        self.store = store
+        self.broker = broker
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.timeout_seconds = timeout_seconds
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            host = f"{socket.gethostname()}:{os.getpid()}"
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, args=(f"{host}:{i}",),
+                                          name=f"agent_job_{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            reaper = threading.Thread(target=self._reaper, name="agent_job_reaper", daemon=True)
+            reaper.start()
+            self._threads.append(reaper)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def enqueue(self, job_input: str, tenant_id: str, agent_chain: List[Any],
+                job_id: Optional[str] = None) -> Dict[str, Any]:
+        self.start()
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": job_id or str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "job_type": "agent_chain",
+            "status": "QUEUED",
+            "input": job_input,
+            "output": "",
+            "agent_chain": list(agent_chain),
+            "created_at": now,
+            "updated_at": now,
+            "attempts": 0
+        }
+        self.store.create(job)
+        self.broker.publish(job["job_id"])
+        logger.info(f"📥 Queued agent job {job['job_id']} for {tenant_id}", extra={"job_id": job["job_id"]})
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _worker(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            try:
+                for job_id, ack in self.broker.consume(self._stop):
+                    try:
+                        self._process(job_id, worker_id)
+                    finally:
+                        ack()
+            except Exception as e:
+                logger.exception(f"❌ Agent job worker {worker_id} error: {e}")
+                self._stop.wait(5)
+
+    def _process(self, job_id: str, worker_id: str) -> None:
+        job = self.store.claim(job_id, worker_id, self.lease_seconds)
+        if job is None:
+            logger.info(f"Agent job {job_id} already claimed or finished, skipping", extra={"job_id": job_id})
+            return
+
+        finished = threading.Event()
+        cancelled = threading.Event()
+        lease_lost = threading.Event()
+        started = time.monotonic()
+
+        def heartbeat():
+            lease_until = started + self.lease_seconds
+            while not finished.wait(self.heartbeat_seconds):
+                try:
+                    renewed = self.store.heartbeat(job_id, worker_id, self.lease_seconds)
+                except Exception as e:
+                    # The lease may still be ours; keep trying until it would have run out
+                    logger.warning(f"⚠️ Agent job {job_id} heartbeat failed: {e}", extra={"job_id": job_id})
+                    renewed = None
+                if renewed:
+                    lease_until = time.monotonic() + self.lease_seconds
+                elif renewed is False or time.monotonic() >= lease_until:
+                    lease_lost.set()
+                    cancelled.set()
+                    logger.warning(f"⚠️ Agent job {job_id} lease lost by {worker_id}", extra={"job_id": job_id})
+                    return
+                if self.timeout_seconds is not None and time.monotonic() - started > self.timeout_seconds:
+                    cancelled.set()
+
+        threading.Thread(target=heartbeat, name=f"agent_job_heartbeat_{job_id[:8]}", daemon=True).start()
+        logger.info(f"🔄 Agent job {job_id} → RUNNING on {worker_id}", extra={"job_id": job_id})
+        try:
+            output = self.handler(job, cancelled)
+            if lease_lost.is_set():
+                logger.warning(f"⚠️ Agent job {job_id} finished after losing its lease; result dropped",
+                               extra={"job_id": job_id})
+            elif cancelled.is_set():
+                self.store.finish(job_id, worker_id, "FAILED",
+                                  error=f"Agent job timed out after {self.timeout_seconds:g}s")
+            else:
+                self.store.finish(job_id, worker_id, "COMPLETED", output=output or "")
+                logger.info(f"✅ Agent job {job_id} completed", extra={"job_id": job_id})
+        except Exception as e:
+            if lease_lost.is_set():
+                logger.warning(f"⚠️ Agent job {job_id} stopped after losing its lease: {e}", extra={"job_id": job_id})
+            elif cancelled.is_set():
+                self.store.finish(job_id, worker_id, "FAILED",
+                                  error=f"Agent job timed out after {self.timeout_seconds:g}s")
+                logger.warning(f"⏱️ Agent job {job_id} timed out", extra={"job_id": job_id})
+            else:
+                self.store.finish(job_id, worker_id, "FAILED", error=str(e))
+                logger.exception(f"❌ Agent job {job_id} failed: {e}", extra={"job_id": job_id})
+        finally:
+            finished.set()
+
+    def _reaper(self) -> None:
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                for job_id in self.store.expired():
+                    status = self.store.requeue_expired(job_id, self.max_attempts)
+                    if status == "QUEUED":
+                        self.broker.publish(job_id)
+                    if status:
+                        logger.warning(f"⚠️ Agent job {job_id} lease expired → {status}", extra={"job_id": job_id})
+            except Exception as e:
+                logger.warning(f"Agent job reaper failed: {e}")
+
+
+def _build_broker():
+    if settings.agent_job_broker == "kafka":
+        return KafkaJobBroker(
+            topic=f"{settings.kafka_topic_prefix}.agent.jobs",
+            bootstrap_servers=settings.kafka_bootstrap_servers,
+            group_id=f"{settings.kafka_topic_prefix}-agent-jobs",
+            # Timed-out jobs stop at the next step boundary; leave that step as long again to return
+            max_poll_interval_seconds=2 * settings.agent_job_timeout_seconds
+        )
+    return InMemoryJobBroker()
+
+
+agent_jobs = AgentJobQueue(
+    store=AgentJobStore(),
+    broker=_build_broker(),
+    workers=settings.agent_job_workers,
+    lease_seconds=settings.agent_job_lease_seconds,
+    heartbeat_seconds=settings.agent_job_heartbeat_seconds,
+    max_attempts=settings.agent_job_max_attempts,
+    timeout_seconds=settings.agent_job_timeout_seconds
+)
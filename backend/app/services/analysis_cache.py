@@ -0,0 +1,184 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from elasticsearch import Elasticsearch, NotFoundError
+
+from app.core.config import settings
+from app.core.elastic import get_es_client
+from app.core.index_templates import INDEX_TEMPLATES
+from app.core.core_log import agent_logger as logger
+
+ANALYSIS_CACHE_INDEX = "analysis_cache"
+ES_RETRY_AFTER_SECONDS = 60
+
+
+def series_fingerprint(kind: str, tenant_id: Optional[str], title: Any, plot_type: Any,
+                       x_values: Sequence[Any], y_values: Sequence[Any], prompt_version: str) -> str:
+    """Content address for a chart analysis: same inputs -> same key."""
+    canonical = json.dumps(
+        [kind, tenant_id or "", title, plot_type, list(x_values), list(y_values), prompt_version],
+        sort_keys=True, default=str, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def prompt_version(*parts: Any) -> str:
+    """Short hash of whatever shapes an analysis (prompt text, engine version, flags)."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+
+
+class AnalysisCache:
+    """Two-tier TTL cache for chart analyses (predictive, next-step).
+
+    An in-process LRU answers repeat requests without any I/O; misses fall
+    through to an Elasticsearch index shared by all workers. Entries are
+    keyed by series_fingerprint and expire after `ttl_seconds` in both tiers;
+    expired documents are deleted from the index at most once every
+    `prune_interval_seconds`, piggybacking on writes.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 512, use_es: bool = True,
+                 index: str = ANALYSIS_CACHE_INDEX, prune_interval_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.use_es = use_es
+        self.index = index
+        self.prune_interval_seconds = prune_interval_seconds
+        self._next_prune_at = 0.0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._es: Optional[Elasticsearch] = None
+        self._index_ready = False
+        self._es_down_until = 0.0
+
+    # --- in-process tier ----------------------------------------------------
+
+    def _local_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- Elasticsearch tier -------------------------------------------------
+
+    def _client(self) -> Optional[Elasticsearch]:
+        if not self.use_es or time.time() < self._es_down_until:
+            return None
+        if self._es is None:
+            self._es = get_es_client()
+        if not self._index_ready:
+            # Normally created at startup by IndexManager; workers and scripts may get here first
+            if not self._es.indices.exists(index=self.index):
+                self._es.indices.create(index=self.index, body=INDEX_TEMPLATES[ANALYSIS_CACHE_INDEX])
+            self._index_ready = True
+        return self._es
+
+    def _remote_get(self, key: str) -> Optional[tuple]:
+        try:
+            es = self._client()
+            if es is None:
+                return None
+            doc = es.get(index=self.index, id=key)["_source"]
+        except NotFoundError:
+            return None
+        except Exception as e:
+            self._mark_es_down(e)
+            return None
+        if doc.get("expires_at", 0) < time.time():
+            return None
+        return doc["expires_at"], doc["value"]
+
+    def _remote_set(self, key: str, value: Dict[str, Any], expires_at: float, kind: str,
+                    tenant_id: Optional[str]) -> None:
+        try:
+            es = self._client()
+            if es is None:
+                return
+            es.index(index=self.index, id=key, document={
+                "kind": kind,
+                "tenant_id": tenant_id,
+                "expires_at": int(expires_at),
+                "value": value
+            })
+            self._prune_expired(es)
+        except Exception as e:
+            self._mark_es_down(e)
+
+    def _prune_expired(self, es: Elasticsearch) -> None:
+        """Delete expired documents, at most once per prune interval per process.
+
+        Runs as a background task in Elasticsearch (wait_for_completion=False),
+        so the write that triggers it doesn't wait for the deletion.
+        """
+        now = time.time()
+        with self._lock:
+            if now < self._next_prune_at:
+                return
+            self._next_prune_at = now + self.prune_interval_seconds
+        try:
+            es.delete_by_query(index=self.index, query={"range": {"expires_at": {"lt": int(now)}}},
+                               conflicts="proceed", wait_for_completion=False)
+        except Exception as e:
+            logger.warning(f"[ANALYSIS CACHE] Failed to prune expired entries: {e}")
+
+    def _mark_es_down(self, error: Exception) -> None:
+        # Skip the ES tier for a while instead of paying a timeout on every request
+        logger.warning(f"[ANALYSIS CACHE] Elasticsearch tier unavailable, using in-process cache only: {error}")
+        self._es_down_until = time.time() + ES_RETRY_AFTER_SECONDS
+
+    # --- public API ---------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._local_get(key)
+        if value is None:
+            remote = self._remote_get(key)
+            if remote is None:
+                return None
+            expires_at, value = remote
+            self._local_set(key, value, expires_at)
+        # Callers decorate results (tenant_id, metric_key...), so never hand out the cached object
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any], kind: str = "analysis", tenant_id: Optional[str] = None) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        value = copy.deepcopy(value)
+        self._local_set(key, value, expires_at)
+        self._remote_set(key, value, expires_at, kind, tenant_id)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]], kind: str = "analysis",
+                       tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return the cached result for `key`, or compute and cache it (errors are not cached)."""
+        cached = self.get(key)
+        if cached is not None:
+            logger.info(f"✅ [ANALYSIS CACHE] {kind} HIT", extra={"tenant_id": tenant_id})
+            return cached
+        result = compute()
+        if isinstance(result, dict) and "error" not in result and result.get("status") != "error":
+            self.set(key, result, kind=kind, tenant_id=tenant_id)
+        return result
+
+
+analysis_cache = AnalysisCache(
+    ttl_seconds=settings.analysis_cache_ttl_seconds,
+    max_entries=settings.analysis_cache_max_entries,
+    use_es=settings.analysis_cache_use_es,
+    prune_interval_seconds=settings.analysis_cache_prune_interval_seconds
+)
@@ -1,13 +1,37 @@
 import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 import httpx
-from pathlib import Path
 from groq import Groq
 from vault.client import get_vault_secret
+from app.core.config import settings
+from app.core.core_log import logger
+from app.services.tts_cache import tts_cache
 
-def summarize_text_with_llama3(text: str) -> str:
-    """
-    Use LLaMA3 (llama3-70b-8192) model to summarize the input text.
-    """
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
+SUMMARY_SYSTEM_PROMPT = "You are an expert summarizer. Summarize the input text clearly and concisely for a voiceover script. Always expand any abbreviations into their full forms. Ensure the tone is professional and easy to understand.Add one line of insight it is good or poor. Do not copy text directly—rephrase it into a smooth narration style. Start your output with: 'Here is a clear and concise summary of the response.'"
+
+# Sentence end: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r"[.!?][\"')\]]*(\s+)")
+# Sentences shorter than this are merged with the next one to avoid tiny TTS calls
+MIN_CHUNK_CHARS = 40
+
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+# Sentence synthesis for every stream; each stream keeps at most
+# TTS_STREAM_MAX_PARALLEL of its sentences in flight on it
+_tts_executor = ThreadPoolExecutor(max_workers=max(1, settings.tts_stream_workers), thread_name_prefix="tts_stream")
+
+
+def _groq_client() -> Groq:
     # Get API key from vault or environment
     try:
         api_key = get_vault_secret(secret_path="groq", key="api_key")
@@ -18,13 +42,20 @@ def summarize_text_with_llama3(text: str) -> str:
         raise Exception("Groq API key not found in vault or environment variables")
     
     # Initialize Groq client
-    client = Groq(api_key=api_key)
+    return Groq(api_key=api_key)
+
+
+def summarize_text_with_llama3(text: str) -> str:
+    """
+    Use LLaMA3 (llama3-70b-8192) model to summarize the input text.
+    """
+    client = _groq_client()
     
     try:
         response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+            model=SUMMARY_MODEL,
             messages=[
-                {"role": "system", "content": "You are an expert summarizer. Summarize the input text clearly and concisely for a voiceover script. Always expand any abbreviations into their full forms. Ensure the tone is professional and easy to understand.Add one line of insight it is good or poor. Do not copy text directly—rephrase it into a smooth narration style. Start your output with: 'Here is a clear and concise summary of the response.'"},
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                 {"role": "user", "content": text}
             ],
             temperature=0.5
@@ -36,6 +67,53 @@ def summarize_text_with_llama3(text: str) -> str:
         raise Exception(f"Summarization request failed: {str(e)}")
 
 
+def stream_summary_with_llama3(text: str) -> Iterator[str]:
+    """
+    Same summary as summarize_text_with_llama3, yielded as tokens arrive.
+    """
+    client = _groq_client()
+
+    try:
+        stream = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            temperature=0.5,
+            stream=True
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    except Exception as e:
+        raise Exception(f"Summarization request failed: {str(e)}")
+
+
+def split_sentences(tokens: Iterable[str], min_chars: int = MIN_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Regroup a token stream into sentence chunks, yielding each one as soon as
+    its boundary arrives. Short sentences are held back and merged.
+    """
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        while True:
+            boundary = None
+            for match in SENTENCE_BOUNDARY.finditer(buffer):
+                if match.start(1) >= min_chars:
+                    boundary = match
+                    break
+            if boundary is None:
+                break
+            sentence, buffer = buffer[:boundary.start(1)].strip(), buffer[boundary.end(1):]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
 def generate_speech(
     text: str,
     tenant_id: str,
@@ -46,39 +124,124 @@ def generate_speech(
     """
     Generate TTS audio using summarized input and return local audio file path.
     Uses Groq TTS with fallback to local text file if TTS fails.
-    """
-    # Step 1: Summarize input text using llama3
-    summarized_text = summarize_text_with_llama3(text)
 
-    # Step 2: Prepare audio output directory
-    temp_dir = Path("temp_audio")
-    temp_dir.mkdir(exist_ok=True)
+    Summaries and audio are cached per tenant by a hash of the input, so a
+    replayed narration skips both remote model calls.
+    """
+    audio_key = tts_cache.key(text, voice, model, response_format)
+    cached_audio = tts_cache.get(tenant_id, audio_key, response_format)
+    if cached_audio is not None:
+        return str(cached_audio)
 
-    # Clean up previous files
-    for file in temp_dir.glob("*"):
-        try:
-            file.unlink()
-        except Exception as e:
-            print(f"Failed to delete {file}: {e}")
+    # Step 1: Summarize input text using llama3 (cached by text)
+    summary_key = tts_cache.key(text, SUMMARY_MODEL)
+    summarized_text = tts_cache.get_text(tenant_id, summary_key, "summary.txt")
+    if summarized_text is None:
+        summarized_text = summarize_text_with_llama3(text)
+        tts_cache.put_text(tenant_id, summary_key, "summary.txt", summarized_text)
 
-    # Step 3: Try Groq TTS with fallback to text file
-    file_name = f"{tenant_id}_{os.urandom(6).hex()}"
-    
-    # Try Groq TTS
+    # Step 2: Try Groq TTS with fallback to text file
     try:
-        return _try_groq_tts(summarized_text, temp_dir, file_name, model, voice, response_format)
+        audio = _try_groq_tts(summarized_text, model, voice, response_format)
+        return str(tts_cache.put(tenant_id, audio_key, response_format, audio))
     except Exception as groq_error:
-        print(f"Groq TTS failed: {groq_error}")
+        logger.warning(f"⚠️ Groq TTS failed: {groq_error}")
     
     # Final fallback: return text file with summarized content
-    return _create_text_fallback(summarized_text, temp_dir, file_name)
+    return _create_text_fallback(summarized_text, tenant_id, summary_key)
 
 
+def stream_speech(
+    text: str,
+    tenant_id: str,
+    voice: str = "Fritz-PlayAI",
+    model: str = "playai-tts",
+    response_format: str = "mp3",
+    max_parallel: int = None
+) -> Iterator[bytes]:
+    """
+    Streaming variant of generate_speech: yields audio as it is synthesized.
 
+    The summary is consumed token by token and cut at sentence boundaries;
+    each sentence is synthesized on a bounded pool while later sentences are
+    still being summarized, and audio chunks are yielded in sentence order.
+    Use a format whose chunks can be concatenated (mp3/ogg), since every
+    chunk is a complete encoded file. The full result is added to the TTS
+    cache, and a cached narration is streamed straight from disk. Streamed
+    audio is cached under its own key: the concatenated per-sentence files
+    are not what generate_speech returns and must not be served in its place.
+    """
+    audio_key = tts_cache.key(text, voice, model, response_format, "stream")
+    cached_audio = tts_cache.get(tenant_id, audio_key, response_format)
+    if cached_audio is not None:
+        with open(cached_audio, "rb") as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+
+    summary_key = tts_cache.key(text, SUMMARY_MODEL)
+    cached_summary = tts_cache.get_text(tenant_id, summary_key, "summary.txt")
+    summary_parts = []
+
+    def sentences() -> Iterator[str]:
+        if cached_summary is not None:
+            yield from split_sentences([cached_summary])
+            return
+        for sentence in split_sentences(stream_summary_with_llama3(text)):
+            summary_parts.append(sentence)
+            yield sentence
+
+    max_parallel = max(1, max_parallel or settings.tts_stream_max_parallel)
+    ordered = queue.Queue()  # futures in sentence order, then a final None
+    submitted = []
+    slots = threading.Semaphore(max_parallel)
+    stop = threading.Event()
+
+    def produce():
+        # Runs the summary stream so that reading tokens never delays yielding audio
+        try:
+            for sentence in sentences():
+                slots.acquire()
+                if stop.is_set():
+                    return
+                future = _tts_executor.submit(_try_groq_tts, sentence, model, voice, response_format)
+                submitted.append(future)
+                ordered.put(future)
+            ordered.put(None)
+        except Exception as e:
+            ordered.put(e)
 
-def _try_groq_tts(text: str, temp_dir: Path, file_name: str, model: str, voice: str, response_format: str) -> str:
+    threading.Thread(target=produce, name="tts_summary", daemon=True).start()
+    audio_parts = []
+    try:
+        while True:
+            item = ordered.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            audio = item.result()
+            slots.release()
+            audio_parts.append(audio)
+            yield audio
+    finally:
+        # Client gone or a chunk failed: stop the producer and drop this stream's queued synthesis
+        stop.set()
+        for _ in range(max_parallel):
+            slots.release()
+        for future in submitted:
+            future.cancel()
+
+    if cached_summary is None and summary_parts:
+        tts_cache.put_text(tenant_id, summary_key, "summary.txt", " ".join(summary_parts))
+    tts_cache.put(tenant_id, audio_key, response_format, b"".join(audio_parts))
+
+
+def _try_groq_tts(text: str, model: str, voice: str, response_format: str) -> bytes:
     """
-    Try Groq TTS API with error handling for terms acceptance
+    Try Groq TTS API with error handling for terms acceptance; returns the audio bytes
     """
     # Get API key from vault or environment
     try:
@@ -113,26 +276,19 @@ def _try_groq_tts(text: str, temp_dir: Path, file_name: str, model: str, voice:
     if response.status_code != 200:
         raise Exception(f"Groq TTS request failed: {response.status_code} - {response.text}")
 
-    # Save the audio to file
-    audio_path = temp_dir / f"{file_name}.{response_format}"
-    with open(audio_path, "wb") as f:
-        f.write(response.content)
-
-    return str(audio_path)
+    return response.content
 
 
-def _create_text_fallback(text: str, temp_dir: Path, file_name: str) -> str:
+def _create_text_fallback(text: str, tenant_id: str, summary_key: str) -> str:
     """
     Create a text file as fallback when TTS is not available
     """
-    text_path = temp_dir / f"{file_name}_summary.txt"
-    
-    with open(text_path, "w", encoding="utf-8") as f:
-        f.write("=== AUDIO SUMMARY (TTS NOT AVAILABLE) ===\n\n")
-        f.write(text)
-        f.write("\n\n=== END SUMMARY ===")
+    text_path = tts_cache.put_text(
+        tenant_id, summary_key, "fallback.txt",
+        "=== AUDIO SUMMARY (TTS NOT AVAILABLE) ===\n\n" + text + "\n\n=== END SUMMARY ==="
+    )
     
-    print(f"TTS not available, created text summary: {text_path}")
+    logger.info(f"TTS not available, created text summary: {text_path}")
     return str(text_path)
 
 
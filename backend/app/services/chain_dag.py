@@ -0,0 +1,120 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+ChainEntry = Union[str, Dict[str, Any]]
+
+
+@dataclass
+class DagNode:
+    id: str
+    agent_name: str
+    depends_on: List[str] = field(default_factory=list)
+    config: Dict[str, Any] = field(default_factory=dict)
+
+
+def build_nodes(entries: Sequence[ChainEntry]) -> List[DagNode]:
+    """Turn chain entries into DAG nodes.
+
+    An entry is an agent name or a dict with "agent" (or "agent_id"), an
+    optional "id" and an optional "depends_on" list of node ids. Entries
+    without "depends_on" depend on the entry before them, so a plain list of
+    names is the old linear chain; `"depends_on": []` makes an entry
+    independent.
+    """
+    nodes: List[DagNode] = []
+    seen = set()
+    for i, entry in enumerate(entries):
+        config = dict(entry) if isinstance(entry, dict) else {}
+        agent_name = config.get("agent") or config.get("agent_id") or (entry if isinstance(entry, str) else None)
+        if not agent_name:
+            raise ValueError(f"Chain entry {i} has no agent name: {entry!r}")
+        node_id = config.get("id") or agent_name
+        if node_id in seen:
+            node_id = f"{node_id}#{i}"
+        seen.add(node_id)
+        if "depends_on" in config:
+            depends_on = list(config["depends_on"] or [])
+        else:
+            depends_on = [nodes[-1].id] if nodes else []
+        nodes.append(DagNode(id=node_id, agent_name=agent_name, depends_on=depends_on, config=config))
+
+    ids = {node.id for node in nodes}
+    for node in nodes:
+        unknown = [dep for dep in node.depends_on if dep not in ids]
+        if unknown:
+            raise ValueError(f"Chain entry '{node.id}' depends on unknown entries {unknown}")
+    _check_acyclic(nodes)
+    return nodes
+
+
+def _check_acyclic(nodes: List[DagNode]) -> None:
+    remaining = {node.id: set(node.depends_on) for node in nodes}
+    while remaining:
+        ready = [node_id for node_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Chain has a dependency cycle among {sorted(remaining)}")
+        for node_id in ready:
+            del remaining[node_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def merge_outputs(outputs: Dict[str, str]) -> str:
+    """Combine several upstream outputs into one input.
+
+    A single output passes through unchanged; several become a JSON object
+    keyed by node id (JSON outputs are embedded as parsed values).
+    """
+    if len(outputs) == 1:
+        return next(iter(outputs.values()))
+    merged = {}
+    for node_id, output in outputs.items():
+        try:
+            merged[node_id] = json.loads(output)
+        except (TypeError, ValueError):
+            merged[node_id] = output
+    return json.dumps(merged, ensure_ascii=False)
+
+
+def sinks(nodes: List[DagNode]) -> List[str]:
+    """Ids of nodes nothing depends on, in chain order."""
+    depended_on = {dep for node in nodes for dep in node.depends_on}
+    return [node.id for node in nodes if node.id not in depended_on]
+
+
+def run_dag(nodes: List[DagNode], initial_input: str,
+            run_node: Callable[[DagNode, str], Union[Optional[str], "Future[Optional[str]]"]],
+            max_parallel: int = 4) -> Dict[str, str]:
+    """Run every node once its dependencies are done, up to `max_parallel` at a time.
+
+    A node's input is `initial_input` (no dependencies) or the merged outputs
+    of its dependencies. `run_node` returning None marks a failed node; its
+    input is passed through as its output so dependents still run, the same
+    way a failed step used to leave the linear chain's input unchanged.
+    `run_node` may also return a Future (e.g. a step waiting on a scheduled
+    retry); the node then completes when that future does, without holding
+    a pool thread in the meantime. Returns every node's output by id.
+    """
+    outputs: Dict[str, str] = {}
+    pending = {node.id: node for node in nodes}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="agent_chain") as executor:
+        while pending or running:
+            for node_id, node in list(pending.items()):
+                if all(dep in outputs for dep in node.depends_on):
+                    node_input = (merge_outputs({dep: outputs[dep] for dep in node.depends_on})
+                                  if node.depends_on else initial_input)
+                    running[executor.submit(run_node, node, node_input)] = (node, node_input)
+                    del pending[node_id]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node, node_input = running.pop(future)
+                output = future.result()
+                if isinstance(output, Future):
+                    running[output] = (node, node_input)
+                    continue
+                outputs[node.id] = node_input if output is None else output
+    return outputs
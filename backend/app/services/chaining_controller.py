@@ -1,12 +1,19 @@
 from app.dao.agent_memory_dao import agent_memory_dao
 from app.dao.sub_agent_chain_dao import sub_agent_chain_dao
 from app.utils.agent_config_loader import get_agent_config
-from app.services.llm_runner import real_agent_response
+from app.services.llm_runner import build_agent_prompt, real_agent_response
 from app.services.token_tracker import token_tracker
 from app.services.memory_manager import memory_manager
 from app.core.core_log import agent_logger as logger
 from app.core.kafka import send_event
+from app.core.config import settings
+from app.services.chain_dag import DagNode, build_nodes, merge_outputs, run_dag, sinks
+from app.services.retry_scheduler import RetryPolicy, classify_error, retry_scheduler
+from app.services.prompt_budget import TokenBudgetExceeded, completion_reserve, fit_agent_prompt
+from concurrent.futures import Future
 from datetime import datetime
+import json
+import threading
 import time
 import uuid
 
@@ -44,15 +51,335 @@ def emit_agent_event(event_type: str, agent_id: str, job_id: str, tenant_id: str
 
 
 
-def execute_chain(job_id: str, job_input: str, agent_chain: list[str], tenant_id: str):
-    # Reset token tracking for this job
-    try:
-        token_tracker.reset_tracking()
-    except Exception:
-        pass
-
+class SuccessCriteriaError(ValueError):
+    """Output didn't meet the agent's success criteria; a fresh sample may, so it's retryable."""
+    retryable = True
+    retry_after = None
+
+
+def _check_success_criteria(criteria: list, output: str) -> None:
+    failures = []
+    lower_resp = (output or "").lower()
+    if any(c.lower() in ("must output json", "output must be json", "return json") for c in criteria):
+        try:
+            json.loads(output)
+        except Exception:
+            failures.append("Output is not valid JSON")
+    if any("include at least 2 charts" in c.lower() or "include at least two charts" in c.lower() for c in criteria):
+        indicators = ["plot_type", "chart", "graph", "figure"]
+        count = sum(lower_resp.count(ind) for ind in indicators)
+        if count < 2:
+            failures.append("Fewer than 2 chart indicators found in output")
+    if failures:
+        raise SuccessCriteriaError(f"Success criteria failed: {failures}")
+
+
+class ChainCancelled(Exception):
+    """The chain was stopped between steps (its job lost the lease or timed out)."""
+
+
+class _ChainSpend:
+    """Tokens each agent has used within one chain run.
+
+    The budget check reads this instead of the process-wide token_tracker,
+    which concurrent jobs on other workers add to as well.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: dict[str, int] = {}
+
+    def add(self, agent_name: str, tokens: int) -> None:
+        with self._lock:
+            self._tokens[agent_name] = self._tokens.get(agent_name, 0) + int(tokens)
+
+    def spent(self, agent_name: str) -> int:
+        with self._lock:
+            return self._tokens.get(agent_name, 0)
+
+
+class _AgentStep:
+    """One agent execution: its attempts, retry scheduling and chain records.
+
+    Failed attempts are classified (see retry_scheduler.classify_error);
+    retryable ones are rescheduled on the retry scheduler with backoff and
+    jitter instead of sleeping, and `start` hands a Future back to run_dag
+    so the waiting step holds neither a chain worker nor an LLM slot.
+    Every attempt's timing ends up in the step's sub_agent_chain record.
+    """
+
+    def __init__(self, job_id: str, tenant_id: str, step_index: int, agent_name: str, parent_agent: str | None,
+                 agent_cfg: dict, current_input: str, slots: threading.Semaphore, spend: _ChainSpend):
+        self.job_id = job_id
+        self.tenant_id = tenant_id
+        self.step_index = step_index
+        self.agent_name = agent_name
+        self.parent_agent = parent_agent
+        self.agent_cfg = agent_cfg
+        self.current_input = current_input
+        self.slots = slots
+        self.spend = spend
+        # Load per-agent policy
+        self.retry_cfg = agent_cfg.get("retry_policy") or {}
+        self.policy = RetryPolicy.from_config(self.retry_cfg, max_delay=settings.agent_retry_max_delay_seconds)
+        self.token_budget = agent_cfg.get("token_budget")
+        self.model_name = (agent_cfg.get("llm_config") or {}).get("model", "gemma2-9b-it")
+        self.chain_id = f"{job_id}_{step_index}_{agent_name}" if parent_agent else f"{job_id}_{step_index}"
+        self.attempts = []
+        self.started = time.monotonic()
+        self.future: Future | None = None
+
+    def start(self) -> str | None | Future:
+        """Run the first attempt; returns the output, None on failure, or a Future if a retry is pending."""
+        # Mark running
+        sub_agent_chain_dao.save({
+            "chain_id": self.chain_id,
+            "job_id": self.job_id,
+            "step": self.step_index,
+            "agent_name": self.agent_name,
+            "parent_agent": self.parent_agent,
+            "status": "RUNNING",
+            "log": ""
+        })
+
+        # Log status change for Kibana
+        logger.info(f"🔄 Agent status changed: {self.agent_name} → RUNNING", extra={
+            "job_id": self.job_id,
+            "agent_id": self.agent_name,
+            "step": self.step_index,
+            "status": "RUNNING",
+            "tenant_id": self.tenant_id,
+            "event_type": "status_change"
+        })
+
+        # Emit Kafka event for agent started
+        emit_agent_event("agent.status_change", self.agent_name, self.job_id, self.tenant_id, "RUNNING",
+                         self.step_index, {
+            "parent_agent": self.parent_agent,
+            "model": self.model_name,
+            "token_budget": self.token_budget,
+            "retry_policy": self.retry_cfg
+        })
+
+        return self._attempt(1)
+
+    def _spent_tokens(self) -> int:
+        if self.token_budget is None:
+            return 0
+        return self.spend.spent(self.agent_name)
+
+    def _attempt(self, attempt: int) -> str | None | Future:
+        # Pre-flight: fit the prompt to what's left of the budget, or refuse before calling the provider
+        try:
+            fitted = fit_agent_prompt(self.agent_name, self.agent_cfg,
+                                      lambda context: build_agent_prompt(self.agent_name, context),
+                                      self.current_input, spent=self._spent_tokens())
+        except TokenBudgetExceeded as e:
+            return self._fail(f"Token budget exceeded for {self.agent_name}: {e}")
+
+        # Emit retry event if not first attempt
+        if attempt > 1:
+            emit_agent_event("agent.execution", self.agent_name, self.job_id, self.tenant_id, "RETRYING",
+                             self.step_index, {
+                "attempt": attempt,
+                "max_attempts": self.policy.max_attempts,
+                "error": self.attempts[-1].get("error")
+            })
 
-    current_input = job_input
+        record = {"attempt": attempt, "started_at": datetime.utcnow().isoformat(),
+                  "prompt_tokens": fitted.prompt_tokens, "context_trimmed": fitted.trimmed}
+        self.attempts.append(record)
+        started = time.monotonic()
+        output = None
+        try:
+            # Per-job concurrency limit applies to the LLM calls themselves
+            with self.slots:
+                output = real_agent_response(self.agent_name, self.current_input, model=self.model_name,
+                                             prompt=fitted.prompt, max_tokens=completion_reserve(self.agent_cfg))
+            # Validate success criteria if present
+            criteria = (self.agent_cfg.get("success_criteria") or [])
+            if criteria:
+                _check_success_criteria(criteria, output)
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            record.update({
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "status": "FAILED",
+                "error": str(e),
+                "retryable": retryable,
+                "status_code": getattr(e, "status_code", None),
+                "retry_after": retry_after,
+            })
+            if retryable and attempt < self.policy.max_attempts:
+                delay = self.policy.next_delay(attempt, retry_after)
+                record["retry_in_seconds"] = round(delay, 3)
+                logger.warning(f"⏳ Agent attempt {attempt} failed, retrying in {delay:.2f}s: {self.agent_name}", extra={
+                    "job_id": self.job_id,
+                    "agent_id": self.agent_name,
+                    "step": self.step_index,
+                    "error": str(e),
+                    "tenant_id": self.tenant_id
+                })
+                return self._schedule(attempt + 1, delay)
+            if output is not None and isinstance(e, SuccessCriteriaError):
+                # Out of attempts: keep the last output, as the chain always has
+                return self._complete(output)
+            return self._fail(str(e))
+
+        record.update({"duration_ms": round((time.monotonic() - started) * 1000, 1), "status": "COMPLETED"})
+        return self._complete(output)
+
+    def _schedule(self, attempt: int, delay: float) -> Future:
+        if self.future is None:
+            self.future = Future()
+        retry_scheduler.call_later(delay, self._resume, attempt)
+        return self.future
+
+    def _resume(self, attempt: int) -> None:
+        try:
+            result = self._attempt(attempt)
+        except BaseException as e:
+            self.future.set_exception(e)
+            return
+        if result is not self.future:
+            self.future.set_result(result)
+
+    def _timing(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "attempt_count": len(self.attempts),
+            "duration_ms": round((time.monotonic() - self.started) * 1000, 1)
+        }
+
+    def _fail(self, error: str) -> None:
+        # Save failure record
+        sub_agent_chain_dao.save({
+            "chain_id": self.chain_id,
+            "job_id": self.job_id,
+            "step": self.step_index,
+            "agent_name": self.agent_name,
+            "parent_agent": self.parent_agent,
+            "status": "FAILED",
+            "log": error or "Execution failed",
+            **self._timing()
+        })
+
+        # Log failure for Kibana
+        logger.error(f"❌ Agent execution failed: {self.agent_name}", extra={
+            "job_id": self.job_id,
+            "agent_id": self.agent_name,
+            "step": self.step_index,
+            "status": "FAILED",
+            "error": error,
+            "tenant_id": self.tenant_id,
+            "event_type": "status_change"
+        })
+
+        # Emit Kafka event for agent failed
+        emit_agent_event("agent.status_change", self.agent_name, self.job_id, self.tenant_id, "FAILED",
+                         self.step_index, {
+            "parent_agent": self.parent_agent,
+            "error": error,
+            "attempts": len(self.attempts),
+            "final_attempt": True
+        })
+
+        # Do not halt chain; dependents proceed with the same input
+        return None
+
+    def _complete(self, output: str) -> str:
+        # Track tokens using transformers and save memory
+        token_usage = token_tracker.track_agent_tokens(
+            agent_id=self.agent_name,
+            input_text=self.current_input,
+            output_text=output,
+            model_name=self.model_name,
+            step=self.step_index,
+        )
+        self.spend.add(self.agent_name, token_usage.total_tokens)
+
+        memory_manager.save_agent_memory(
+            agent_id=self.agent_name,
+            job_id=self.job_id,
+            tenant_id=self.tenant_id,
+            step=self.step_index,
+            input_text=self.current_input,
+            output_text=output,
+            token_usage=token_usage,
+            model_name=self.model_name,
+        )
+
+        timing = self._timing()
+        memory_manager.save_sub_agent_chain(
+            job_id=self.job_id,
+            step=self.step_index,
+            agent_name=self.agent_name,
+            parent_agent=self.parent_agent,
+            status="COMPLETED",
+            log=output,
+            token_usage=token_usage,
+            model_name=self.model_name,
+            timing=timing,
+        )
+
+        # Log completion for Kibana
+        logger.info(f"✅ Agent execution completed: {self.agent_name}", extra={
+            "job_id": self.job_id,
+            "agent_id": self.agent_name,
+            "step": self.step_index,
+            "status": "COMPLETED",
+            "tokens_used": token_usage.total_tokens,
+            "tenant_id": self.tenant_id,
+            "event_type": "status_change"
+        })
+
+        # Emit Kafka event for agent completed
+        emit_agent_event("agent.status_change", self.agent_name, self.job_id, self.tenant_id, "COMPLETED",
+                         self.step_index, {
+            "parent_agent": self.parent_agent,
+            "tokens_used": token_usage.total_tokens,
+            "input_tokens": token_usage.input_tokens,
+            "output_tokens": token_usage.output_tokens,
+            "model": self.model_name,
+            "output_length": len(output),
+            "attempts": timing["attempt_count"],
+            "duration_ms": timing["duration_ms"]
+        })
+
+        return output
+
+
+def _run_agent_step(job_id: str, tenant_id: str, step_index: int, agent_name: str, parent_agent: str | None,
+                    agent_cfg: dict, current_input: str, slots: threading.Semaphore,
+                    spend: _ChainSpend) -> str | None | Future:
+    """Run one agent with its retry policy and token budget.
+
+    Returns its output, None if it failed, or a Future resolving to either
+    once a scheduled retry has run.
+    """
+    return _AgentStep(job_id, tenant_id, step_index, agent_name, parent_agent,
+                      agent_cfg, current_input, slots, spend).start()
+
+
+def execute_chain(job_id: str, job_input: str, agent_chain: list, tenant_id: str,
+                  max_parallel: int | None = None, cancelled: threading.Event | None = None) -> str:
+    """Run an agent chain as a DAG and return the final output.
+
+    `agent_chain` entries are agent names or {"agent", "id", "depends_on"}
+    dicts (see chain_dag.build_nodes); a plain list of names runs linearly as
+    before. Parent agents (type "agent") run their sub_agents as a DAG too,
+    and the merged output of the sub-agents nothing depends on becomes the
+    parent step's output. Independent agents run concurrently, with at most
+    `max_parallel` (AGENT_CHAIN_MAX_PARALLEL) LLM calls in flight per job.
+    Once `cancelled` is set no further step starts and ChainCancelled is
+    raised; steps already running finish.
+    """
+    # Token budgets count this run's spend only; token_tracker is shared with concurrent jobs
+    spend = _ChainSpend()
+    max_parallel = max(1, max_parallel or settings.agent_chain_max_parallel)
+    slots = threading.Semaphore(max_parallel)
+    nodes = build_nodes(agent_chain)
+    step_of = {node.id: step_index for step_index, node in enumerate(nodes)}
    
     # Emit job started event
     emit_agent_event("job.progress", "orchestrator", job_id, tenant_id, "STARTED", 0, {
@@ -61,377 +388,38 @@ def execute_chain(job_id: str, job_input: str, agent_chain: list[str], tenant_id
     })
 
 
-    for step_index, agent_name in enumerate(agent_chain):
-        agent_config = get_agent_config(agent_name)
+    def check_cancelled(agent_name: str):
+        if cancelled is not None and cancelled.is_set():
+            raise ChainCancelled(f"Chain {job_id} cancelled before {agent_name}")
 
+    def run_step(node: DagNode, step_input: str) -> str | None | Future:
+        check_cancelled(node.agent_name)
+        step_index = step_of[node.id]
+        agent_config = {**get_agent_config(node.agent_name), **node.config}
 
         if agent_config.get("type") == "agent":
-            sub_agents = agent_config.get("sub_agents", [])
-            for sub_agent_name in sub_agents:
-                # Load per-agent policy
-                sub_cfg = get_agent_config(sub_agent_name) or {}
-                retry_cfg = sub_cfg.get("retry_policy") or {}
-                max_attempts = max(1, int(retry_cfg.get("max_attempts", 1)))
-                delay_seconds = max(0, int(retry_cfg.get("delay_seconds", 0)))
-                token_budget = sub_cfg.get("token_budget")
-                model_name = (sub_cfg.get("llm_config") or {}).get("model", "gemma2-9b-it")
-
-
-                # Mark running
-                sub_agent_chain_dao.save({
-                    "chain_id": f"{job_id}_{step_index}_{sub_agent_name}",
-                    "job_id": job_id,
-                    "step": step_index,
-                    "agent_name": sub_agent_name,
-                    "parent_agent": agent_name,
-                    "status": "RUNNING",
-                    "log": ""
-                })
-               
-                # Log status change for Kibana
-                logger.info(f"🔄 Agent status changed: {sub_agent_name} → RUNNING", extra={
-                    "job_id": job_id,
-                    "agent_id": sub_agent_name,
-                    "step": step_index,
-                    "status": "RUNNING",
-                    "tenant_id": tenant_id,
-                    "event_type": "status_change"
-                })
-               
-                # Emit Kafka event for agent started
-                emit_agent_event("agent.status_change", sub_agent_name, job_id, tenant_id, "RUNNING", step_index, {
-                    "parent_agent": agent_name,
-                    "model": model_name,
-                    "token_budget": token_budget,
-                    "retry_policy": retry_cfg
-                })
-
-
-                def remaining_budget() -> int | None:
-                    if token_budget is None:
-                        return None
-                    summary = token_tracker.get_agent_token_summary(sub_agent_name)
-                    return max(0, int(token_budget) - int(summary.get("total_tokens", 0)))
-
-
-                last_error = None
-                sub_output = None
-                for attempt in range(1, max_attempts + 1):
-                    rem = remaining_budget()
-                    if rem is not None and rem <= 0:
-                        last_error = f"Token budget exceeded for {sub_agent_name}"
-                        break
-                   
-                    # Emit retry event if not first attempt
-                    if attempt > 1:
-                        emit_agent_event("agent.execution", sub_agent_name, job_id, tenant_id, "RETRYING", step_index, {
-                            "attempt": attempt,
-                            "max_attempts": max_attempts,
-                            "error": last_error
-                        })
-                   
-                    try:
-                        sub_output = real_agent_response(sub_agent_name, current_input, model=model_name)
-                        # Validate success criteria if present
-                        criteria = (sub_cfg.get("success_criteria") or [])
-                        if criteria:
-                            failures = []
-                            lower_resp = (sub_output or "").lower()
-                            if any(c.lower() in ("must output json", "output must be json", "return json") for c in criteria):
-                                try:
-                                    import json as _json
-                                    _json.loads(sub_output)
-                                except Exception:
-                                    failures.append("Output is not valid JSON")
-                            if any("include at least 2 charts" in c.lower() or "include at least two charts" in c.lower() for c in criteria):
-                                indicators = ["plot_type", "chart", "graph", "figure"]
-                                count = sum(lower_resp.count(ind) for ind in indicators)
-                                if count < 2:
-                                    failures.append("Fewer than 2 chart indicators found in output")
-                            if failures:
-                                raise ValueError(f"Success criteria failed: {failures}")
-                        break
-                    except Exception as e:
-                        last_error = str(e)
-                        if attempt < max_attempts and delay_seconds:
-                            time.sleep(delay_seconds)
-
-
-                if sub_output is None:
-                    # Save failure record
-                    sub_agent_chain_dao.save({
-                        "chain_id": f"{job_id}_{step_index}_{sub_agent_name}",
-                        "job_id": job_id,
-                        "step": step_index,
-                        "agent_name": sub_agent_name,
-                        "parent_agent": agent_name,
-                        "status": "FAILED",
-                        "log": last_error or "Execution failed"
-                    })
-                   
-                    # Log failure for Kibana
-                    logger.error(f"❌ Agent execution failed: {sub_agent_name}", extra={
-                        "job_id": job_id,
-                        "agent_id": sub_agent_name,
-                        "step": step_index,
-                        "status": "FAILED",
-                        "error": last_error,
-                        "tenant_id": tenant_id,
-                        "event_type": "status_change"
-                    })
-                   
-                    # Emit Kafka event for agent failed
-                    emit_agent_event("agent.status_change", sub_agent_name, job_id, tenant_id, "FAILED", step_index, {
-                        "parent_agent": agent_name,
-                        "error": last_error,
-                        "attempts": max_attempts,
-                        "final_attempt": True
-                    })
-                   
-                    # Do not halt chain; proceed with same current_input
-                    continue
-
-
-                # Track tokens using transformers and save memory
-                token_usage = token_tracker.track_agent_tokens(
-                    agent_id=sub_agent_name,
-                    input_text=current_input,
-                    output_text=sub_output,
-                    model_name=model_name,
-                    step=step_index,
-                )
-
-
-                memory_manager.save_agent_memory(
-                    agent_id=sub_agent_name,
-                    job_id=job_id,
-                    tenant_id=tenant_id,
-                    step=step_index,
-                    input_text=current_input,
-                    output_text=sub_output,
-                    token_usage=token_usage,
-                    model_name=model_name,
-                )
-
-
-                memory_manager.save_sub_agent_chain(
-                    job_id=job_id,
-                    step=step_index,
-                    agent_name=sub_agent_name,
-                    parent_agent=agent_name,
-                    status="COMPLETED",
-                    log=sub_output,
-                    token_usage=token_usage,
-                    model_name=model_name,
-                )
-               
-                # Log completion for Kibana
-                logger.info(f"✅ Agent execution completed: {sub_agent_name}", extra={
-                    "job_id": job_id,
-                    "agent_id": sub_agent_name,
-                    "step": step_index,
-                    "status": "COMPLETED",
-                    "tokens_used": token_usage.total_tokens,
-                    "tenant_id": tenant_id,
-                    "event_type": "status_change"
-                })
-               
-                # Emit Kafka event for agent completed
-                emit_agent_event("agent.status_change", sub_agent_name, job_id, tenant_id, "COMPLETED", step_index, {
-                    "parent_agent": agent_name,
-                    "tokens_used": token_usage.total_tokens,
-                    "input_tokens": token_usage.input_tokens,
-                    "output_tokens": token_usage.output_tokens,
-                    "model": model_name,
-                    "output_length": len(sub_output)
-                })
-
-
-                current_input = sub_output
-                time.sleep(0.2)
+            sub_nodes = build_nodes(agent_config.get("sub_agents", []))
 
+            def run_sub_agent(sub_node: DagNode, sub_input: str) -> str | None | Future:
+                check_cancelled(sub_node.agent_name)
+                # Load per-agent policy
+                sub_cfg = {**(get_agent_config(sub_node.agent_name) or {}), **sub_node.config}
+                return _run_agent_step(job_id, tenant_id, step_index, sub_node.agent_name, node.agent_name,
+                                       sub_cfg, sub_input, slots, spend)
 
-        else:
-            # Load per-agent policy
-            retry_cfg = agent_config.get("retry_policy") or {}
-            max_attempts = max(1, int(retry_cfg.get("max_attempts", 1)))
-            delay_seconds = max(0, int(retry_cfg.get("delay_seconds", 0)))
-            token_budget = agent_config.get("token_budget")
-            model_name = (agent_config.get("llm_config") or {}).get("model", "gemma2-9b-it")
+            sub_outputs = run_dag(sub_nodes, step_input, run_sub_agent, max_parallel)
+            return merge_outputs({sink: sub_outputs[sink] for sink in sinks(sub_nodes)}) if sub_nodes else None
 
+        return _run_agent_step(job_id, tenant_id, step_index, node.agent_name, None,
+                               agent_config, step_input, slots, spend)
 
-            # Mark running
-            sub_agent_chain_dao.save({
-                "chain_id": f"{job_id}_{step_index}",
-                "job_id": job_id,
-                "step": step_index,
-                "agent_name": agent_name,
-                "parent_agent": None,
-                "status": "RUNNING",
-                "log": ""
-            })
-           
-            # Log status change for Kibana
-            logger.info(f"🔄 Agent status changed: {agent_name} → RUNNING", extra={
-                "job_id": job_id,
-                "agent_id": agent_name,
-                "step": step_index,
-                "status": "RUNNING",
-                "tenant_id": tenant_id,
-                "event_type": "status_change"
-            })
-           
-            # Emit Kafka event for agent started
-            emit_agent_event("agent.status_change", agent_name, job_id, tenant_id, "RUNNING", step_index, {
-                "parent_agent": None,
-                "model": model_name,
-                "token_budget": token_budget,
-                "retry_policy": retry_cfg
-            })
 
-
-            def remaining_budget() -> int | None:
-                if token_budget is None:
-                    return None
-                summary = token_tracker.get_agent_token_summary(agent_name)
-                return max(0, int(token_budget) - int(summary.get("total_tokens", 0)))
-
-
-            last_error = None
-            output = None
-            for attempt in range(1, max_attempts + 1):
-                rem = remaining_budget()
-                if rem is not None and rem <= 0:
-                    last_error = f"Token budget exceeded for {agent_name}"
-                    break
-               
-                # Emit retry event if not first attempt
-                if attempt > 1:
-                    emit_agent_event("agent.execution", agent_name, job_id, tenant_id, "RETRYING", step_index, {
-                        "attempt": attempt,
-                        "max_attempts": max_attempts,
-                        "error": last_error
-                    })
-               
-                try:
-                    output = real_agent_response(agent_name, current_input, model=model_name)
-                    # Validate success criteria if present
-                    criteria = (agent_config.get("success_criteria") or [])
-                    if criteria:
-                        failures = []
-                        lower_resp = (output or "").lower()
-                        if any(c.lower() in ("must output json", "output must be json", "return json") for c in criteria):
-                            try:
-                                import json as _json
-                                _json.loads(output)
-                            except Exception:
-                                failures.append("Output is not valid JSON")
-                        if any("include at least 2 charts" in c.lower() or "include at least two charts" in c.lower() for c in criteria):
-                            indicators = ["plot_type", "chart", "graph", "figure"]
-                            count = sum(lower_resp.count(ind) for ind in indicators)
-                            if count < 2:
-                                failures.append("Fewer than 2 chart indicators found in output")
-                        if failures:
-                            raise ValueError(f"Success criteria failed: {failures}")
-                    break
-                except Exception as e:
-                    last_error = str(e)
-                    if attempt < max_attempts and delay_seconds:
-                        time.sleep(delay_seconds)
-
-
-            if output is None:
-                sub_agent_chain_dao.save({
-                    "chain_id": f"{job_id}_{step_index}",
-                    "job_id": job_id,
-                    "step": step_index,
-                    "agent_name": agent_name,
-                    "parent_agent": None,
-                    "status": "FAILED",
-                    "log": last_error or "Execution failed"
-                })
-               
-                # Log failure for Kibana
-                logger.error(f"❌ Agent execution failed: {agent_name}", extra={
-                    "job_id": job_id,
-                    "agent_id": agent_name,
-                    "step": step_index,
-                    "status": "FAILED",
-                    "error": last_error,
-                    "tenant_id": tenant_id,
-                    "event_type": "status_change"
-                })
-               
-                # Emit Kafka event for agent failed
-                emit_agent_event("agent.status_change", agent_name, job_id, tenant_id, "FAILED", step_index, {
-                    "parent_agent": None,
-                    "error": last_error,
-                    "attempts": max_attempts,
-                    "final_attempt": True
-                })
-               
-                # Keep current_input unchanged and continue
-                continue
-
-
-            token_usage = token_tracker.track_agent_tokens(
-                agent_id=agent_name,
-                input_text=current_input,
-                output_text=output,
-                model_name=model_name,
-                step=step_index,
-            )
-
-
-            memory_manager.save_agent_memory(
-                agent_id=agent_name,
-                job_id=job_id,
-                tenant_id=tenant_id,
-                step=step_index,
-                input_text=current_input,
-                output_text=output,
-                token_usage=token_usage,
-                model_name=model_name,
-            )
-
-
-            memory_manager.save_sub_agent_chain(
-                job_id=job_id,
-                step=step_index,
-                agent_name=agent_name,
-                parent_agent=None,
-                status="COMPLETED",
-                log=output,
-                token_usage=token_usage,
-                model_name=model_name,
-            )
-           
-            # Log completion for Kibana
-            logger.info(f"✅ Agent execution completed: {agent_name}", extra={
-                "job_id": job_id,
-                "agent_id": agent_name,
-                "step": step_index,
-                "status": "COMPLETED",
-                "tokens_used": token_usage.total_tokens,
-                "tenant_id": tenant_id,
-                "event_type": "status_change"
-            })
-           
-            # Emit Kafka event for agent completed
-            emit_agent_event("agent.status_change", agent_name, job_id, tenant_id, "COMPLETED", step_index, {
-                "parent_agent": None,
-                "tokens_used": token_usage.total_tokens,
-                "input_tokens": token_usage.input_tokens,
-                "output_tokens": token_usage.output_tokens,
-                "model": model_name,
-                "output_length": len(output)
-            })
-
-
-            current_input = output
-            time.sleep(0.2)
+    outputs = run_dag(nodes, job_input, run_step, max_parallel)
+    current_input = merge_outputs({sink: outputs[sink] for sink in sinks(nodes)}) if nodes else job_input
    
     # Emit job completed event
     emit_agent_event("job.progress", "orchestrator", job_id, tenant_id, "COMPLETED", len(agent_chain), {
         "final_output_length": len(current_input)
     })
+
+    return current_input
@@ -1,3 +1,162 @@
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.prompt_budget import count_tokens, trim_context
+
+HIT_LINE = re.compile(r"^Score: (-?\d+(?:\.\d+)?) \| (.*)$")
+# Columns that identify a row rather than describe it
+ID_COLUMN = re.compile(r"(^|_)(id|uuid|guid|hash|row_?id|index)$", re.IGNORECASE)
+STOP_WORDS = {"the", "and", "for", "with", "what", "which", "how", "why", "are", "was", "were", "did", "does",
+              "from", "this", "that", "our", "about", "show", "give", "tell", "last", "all"}
+
+
+def _parse_row(text: str) -> Optional[Dict[str, str]]:
+    """Split "col: val | col: val" back into columns; None if it isn't in that shape."""
+    row, last = {}, None
+    for part in text.split(" | "):
+        col, sep, value = part.partition(": ")
+        col = col.strip()
+        if sep and col and col not in row:
+            row[col] = value.strip()
+            last = col
+        elif last is not None:
+            # A value that itself contained " | "
+            row[last] += " | " + part
+        else:
+            return None
+    return row
+
+
+def _terms(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {w.rstrip("s") for w in words if len(w) > 2 and w not in STOP_WORDS}
+
+
+def _select_columns(columns: List[str], rows: List[Dict[str, str]], question_terms: set,
+                    max_columns: int) -> Tuple[List[str], Dict[str, str]]:
+    """Columns worth a table column, plus the ones every row shares (stated once instead)."""
+    mentioned = [c for c in columns if _terms(c.replace("_", " ")) & question_terms]
+    kept, constants = [], {}
+    for col in columns:
+        values = {row.get(col, "") for row in rows}
+        if values == {""}:
+            continue
+        if col not in mentioned:
+            if len(rows) > 1 and len(values) == 1:
+                constants[col] = values.pop()
+                continue
+            if ID_COLUMN.search(col):
+                continue
+        kept.append(col)
+    if len(kept) > max_columns:
+        keep = set([c for c in kept if c in mentioned][:max_columns])
+        keep.update([c for c in kept if c not in keep][:max_columns - len(keep)])
+        kept = [c for c in kept if c in keep]
+    return kept, constants
+
+
+def _normalize(value: str) -> str:
+    """Standard form of a cell: numbers compared exactly ("900" == "900.0"), text case/space-insensitively."""
+    value = value.strip().lower()
+    try:
+        number = Decimal(value.replace(",", ""))
+    except InvalidOperation:
+        return re.sub(r"\s+", " ", value)
+    return f"{number.normalize():f}" if number.is_finite() else value
+
+
+def _signature(row: Dict[str, str], columns: List[str]) -> tuple:
+    return tuple(_normalize(row.get(col, "")) for col in columns)
+
+
+def _dedupe(rows: List[Tuple[float, Dict[str, str]]], all_columns: List[str],
+            columns: List[str]) -> Tuple[List[Tuple[float, Dict[str, str]]], List[int]]:
+    """Collapse rows whose shown cells equal an earlier (higher-scored) row's, counting them.
+
+    A hit retrieved twice (equal in every parsed column, IDs included) is
+    dropped outright; distinct records that only look alike once the ID
+    columns are hidden are folded into one line with their multiplicity, so
+    sums and counts over the table stay right. Rows of a time series differ
+    in a date or a metric and all stay.
+    """
+    kept, counts, records, position = [], [], set(), {}
+    for score, row in rows:
+        record = _signature(row, all_columns)
+        if record in records:
+            continue
+        records.add(record)
+        shown = _signature(row, columns)
+        if shown in position:
+            counts[position[shown]] += 1
+            continue
+        position[shown] = len(kept)
+        kept.append((score, row))
+        counts.append(1)
+    return kept, counts
+
+
+def _cell(value: str) -> str:
+    return re.sub(r"[\t\r\n]+", " ", value)
+
+
+def _compact_hits(hits: List[Tuple[float, Dict[str, str]]], question_terms: set) -> List[str]:
+    columns = list(dict.fromkeys(col for _, row in hits for col in row))
+    kept, constants = _select_columns(columns, [row for _, row in hits], question_terms,
+                                      settings.agent_context_max_columns)
+    hits, counts = _dedupe(hits, columns, kept)
+    # Only say how many records a line stands for when some line stands for more than one
+    multiples = any(count > 1 for count in counts)
+    lines = []
+    if constants:
+        lines.append("All rows: " + "; ".join(f"{col}={_cell(value)}" for col, value in constants.items()))
+    lines.append("\t".join(["score"] + kept + (["n"] if multiples else [])))
+    lines.extend("\t".join([f"{score:.2f}"] + [_cell(row.get(col, "")) for col in kept]
+                           + ([str(count)] if multiples else []))
+                 for (score, row), count in zip(hits, counts))
+    return lines
+
+
+def compact_context(context: str, question: str, max_tokens: Optional[int] = None) -> str:
+    """Render retrieved hits as compact tables before they go into a prompt.
+
+    Each run of "Score: x | col: val | ..." lines (one dataset's hits)
+    becomes a tab-separated table with the column names once, columns
+    shared by every row stated once above it, ID-like columns dropped unless
+    the question names them, at most AGENT_CONTEXT_MAX_COLUMNS columns
+    (those the question mentions first) and duplicate rows removed; rows
+    that only match on the shown columns are folded into one with an "n"
+    column saying how many records it stands for.
+    Section headers and non-hit text pass through. The result is capped at
+    `max_tokens` (AGENT_CONTEXT_MAX_TOKENS) with prompt_budget.trim_context,
+    which keeps every dataset's best rows.
+    """
+    question_terms = _terms(question)
+    output, hits = [], []
+
+    def flush():
+        if hits:
+            output.extend(_compact_hits(hits, question_terms))
+            hits.clear()
+
+    for line in context.split("\n"):
+        match = HIT_LINE.match(line)
+        row = _parse_row(match.group(2)) if match else None
+        if row is None:
+            flush()
+            output.append(line)
+        else:
+            hits.append((float(match.group(1)), row))
+    flush()
+
+    compacted = "\n".join(output)
+    max_tokens = settings.agent_context_max_tokens if max_tokens is None else max_tokens
+    if count_tokens(compacted) > max_tokens:
+        compacted = trim_context(compacted, max_tokens)
+    return compacted
+
+
 def get_enhanced_data_for_agent(agent_name: str, input_text: str, tenant_id: str):
     from app.services.es_search import (
         query_sales_data,
@@ -44,4 +203,6 @@ def get_enhanced_data_for_agent(agent_name: str, input_text: str, tenant_id: str
         "social_media_engagement_agent": lambda: query_social_media_engagement_dataset(query_text=input_text, tenant_id=tenant_id)
     }
 
-    return agent_data_mapping.get(agent_name, lambda: input_text)()
+    if agent_name not in agent_data_mapping:
+        return input_text
+    return compact_context(agent_data_mapping[agent_name](), input_text)
@@ -1,66 +1,30 @@
-from app.dao.agent_job_dao import agent_job_dao
 from app.dao.sub_agent_chain_dao import sub_agent_chain_dao
-from app.services.chaining_controller import execute_chain
-from app.models.agent_job import AgentJob
-from app.services.orchestrator_agent import run_autogen_agent
+from app.services.agent_jobs import agent_jobs
+from app.services.chain_dag import build_nodes
 import uuid
-from datetime import datetime
 
-def dispatch_agent_job(job_input: str, tenant_id: str, agent_chain: list[str]):
-    job_id = str(uuid.uuid4())
-    
-    job = AgentJob(
-        job_id=job_id,
-        tenant_id=tenant_id,
-        input=job_input,
-        output="",
-        status="QUEUED",
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    agent_job_dao.save(job)
-
-    for i, agent_name in enumerate(agent_chain):
-        sub_agent_chain_dao.save({
-            "chain_id": f"{job_id}_{i}",
-            "job_id": job_id,
-            "step": i,
-            "agent_name": agent_name,
-            "status": "PENDING",
-            "log": ""
-        })
 
-    execute_chain(job_id, job_input, agent_chain, tenant_id)
-    return {"job_id": job_id}
+def dispatch_agent_job(job_input: str, tenant_id: str, agent_chain: list):
+    """Queue an orchestrator + agent chain run; workers execute it outside the request.
 
-def dispatch_agent_job(job_input: str, tenant_id: str, agent_chain: list[str]):
+    Raises ValueError for an invalid chain (unknown dependency, cycle).
+    """
     job_id = str(uuid.uuid4())
-    
-    # Save top-level job
-    job = AgentJob(
-        job_id=job_id,
-        tenant_id=tenant_id,
-        input=job_input,
-        output="",
-        status="QUEUED",
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    agent_job_dao.save(job)
-
-    # Step 1: Run orchestrator
-    orchestrator_output = run_autogen_agent(job_id, job_input, tenant_id)
 
-    # Step 2: Execute chained sub-agents using orchestrator_output
-    for i, agent_name in enumerate(agent_chain):
+    for i, node in enumerate(build_nodes(agent_chain)):
         sub_agent_chain_dao.save({
             "chain_id": f"{job_id}_{i}",
             "job_id": job_id,
             "step": i,
-            "agent_name": agent_name,
+            "agent_name": node.agent_name,
+            "depends_on": node.depends_on,
             "status": "PENDING",
             "log": ""
         })
 
-    execute_chain(job_id, orchestrator_output, agent_chain, tenant_id)
-    return {"job_id": job_id}
+    job = agent_jobs.enqueue(job_input, tenant_id, agent_chain, job_id=job_id)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "status_url": f"/api/v1/agent-job/{job_id}"
+    }
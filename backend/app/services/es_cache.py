@@ -1,9 +1,7 @@
-from elasticsearch import Elasticsearch
 from langchain_community.embeddings import HuggingFaceEmbeddings
 import hashlib
 from app.core.core_log import agent_logger as logger
-
-es = Elasticsearch("http://elasticsearch:9200")
+from app.core.elastic import es
 embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 CACHE_INDEX = "agent_cache"
 
@@ -1,29 +1,45 @@
 import pandas as pd
-from elasticsearch import Elasticsearch, helpers
+from elasticsearch import NotFoundError, helpers
 from datetime import datetime
 import hashlib
 import uuid
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable
+from openpyxl import load_workbook
+from app.core.config import settings
+from app.core.elastic import create_es_client, get_es_client
+from app.services.ingestion_pipeline import EmbeddingStage, IngestionMetrics, get_embedding_model, prefetch
 import json
 import os
 import time
 import numpy as np
+from dataclasses import dataclass
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass
+class SheetSchema:
+    """Column dtypes fixed by a sheet's first chunk and applied to the rest."""
+    dtypes: Dict[str, Any]
+    frame_kind: Optional[str]
+    data_types: Dict[str, str]
+
+
 class ExcelToElasticsearch:
     def __init__(self,
-                 es_host: str = "http://elasticsearch:9200",
+                 es_host: Optional[str] = None,
                  index_name: str = "agent_dataset",
                  sub_index: str = "customer_survey_dataset",
                  embedding_model: str = "all-MiniLM-L6-v2",
                  tenant_id: Optional[str] = None,
                  max_text_length: int = 8000,
-                 batch_size: int = 100):
+                 batch_size: int = 100,
+                 chunk_size: Optional[int] = None,
+                 embedding_batch_size: Optional[int] = None,
+                 embedding_workers: Optional[int] = None,
+                 embedding_processes: Optional[bool] = None):
         
         self.es_host = es_host
         self.index_name = index_name
@@ -31,13 +47,22 @@ class ExcelToElasticsearch:
         self.embedding_model_name = embedding_model
         self.max_text_length = max_text_length
         self.batch_size = batch_size
+        self.chunk_size = max(1, chunk_size or settings.ingestion_chunk_size)
+        self.max_in_flight = max(1, settings.ingestion_max_in_flight_chunks)
         
-        # Initialize Elasticsearch - ALIGNED with es_search.py
-        self.es = Elasticsearch([es_host])
+        # Initialize Elasticsearch - shared pooled client unless another cluster is requested
+        self.es = get_es_client() if es_host is None else create_es_client(es_host)
         
         # Initialize embedding model - SAME as es_search.py
         try:
-            self.embedding_model = HuggingFaceEmbeddings(model_name=embedding_model)
+            self.embedding_stage = EmbeddingStage(
+                model_name=embedding_model,
+                batch_size=embedding_batch_size or settings.ingestion_embedding_batch_size,
+                workers=embedding_workers or settings.ingestion_embedding_workers,
+                use_processes=settings.ingestion_embedding_processes if embedding_processes is None else embedding_processes,
+                max_in_flight=self.max_in_flight
+            )
+            self.embedding_model = get_embedding_model(embedding_model, self.embedding_stage.batch_size)
             
             # Test embedding to get dimensions
             test_vector = self.embedding_model.embed_query("test")
@@ -59,6 +84,23 @@ class ExcelToElasticsearch:
         logger.info(f"  - Sub-index: {self.sub_index}")
         logger.info(f"  - Tenant ID: {self.tenant_id}")
 
+    # One document per tenant/sub_index, written only when an ingestion completes
+    MARKER_MAPPING = {
+        "mappings": {
+            "properties": {
+                "tenant_id": {"type": "keyword"},
+                "sub_index": {"type": "keyword"},
+                "file_hash": {"type": "keyword"},
+                "row_count": {"type": "integer"},
+                "completed_at": {"type": "date"}
+            }
+        }
+    }
+
+    @property
+    def marker_index(self) -> str:
+        return f"{self.index_name}_ingestions"
+
     def validate_elasticsearch_connection(self) -> bool:
         """ALIGNED with es_search.py test_elasticsearch_connection()"""
         try:
@@ -97,6 +139,7 @@ class ExcelToElasticsearch:
                         "similarity": "cosine"
                     },
                     "file_hash": {"type": "keyword"},
+                    "row_hash": {"type": "keyword"},
                     # CRITICAL: Must have .keyword field for exact matching
                     "tenant_id": {
                         "type": "text",
@@ -124,6 +167,10 @@ class ExcelToElasticsearch:
                 logger.info(f"Index '{self.index_name}' created successfully.")
             else:
                 logger.info(f"Index '{self.index_name}' already exists.")
+
+            if not self.es.indices.exists(index=self.marker_index):
+                self.es.indices.create(index=self.marker_index, body=self.MARKER_MAPPING)
+                logger.info(f"Index '{self.marker_index}' created successfully.")
                     
             return True
             
@@ -143,6 +190,95 @@ class ExcelToElasticsearch:
             logger.error(f"Failed to calculate file hash: {str(e)}")
             raise
 
+    @staticmethod
+    def _standard_cell(value: Any) -> str:
+        """Canonical text of a cleaned cell value for hashing.
+
+        Blanks become "", integral numbers drop their ".0" and other floats use
+        repr (shortest round-trip form), so the same cell hashes the same
+        whether pandas typed its column as int, float or object.
+        """
+        if value is None:
+            return ""
+        if isinstance(value, (bool, np.bool_)):
+            return "true" if value else "false"
+        if isinstance(value, (int, np.integer)):
+            return str(int(value))
+        if isinstance(value, (float, np.floating)):
+            value = float(value)
+            if not np.isfinite(value):
+                return ""
+            return str(int(value)) if value.is_integer() else repr(value)
+        return str(value)
+
+    @classmethod
+    def calculate_row_hash(cls, cells: Iterable[Tuple[str, Any]]) -> str:
+        """Content hash of a row, taken over its (column, cleaned value) pairs in column order."""
+        canonical = "\x1f".join(f"{col}\x1e{cls._standard_cell(value)}" for col, value in cells)
+        return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+
+    def document_id(self, sheet_name: str, row_hash: str, occurrence: int = 0) -> str:
+        """Deterministic _id for a row: (tenant, sub_index, sheet, row content hash).
+
+        occurrence disambiguates identical rows within the same sheet.
+        """
+        key = f"{self.tenant_id}|{self.sub_index}|{sheet_name}|{row_hash}|{occurrence}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _scope_query(self) -> Dict[str, Any]:
+        return {
+            "bool": {
+                "filter": [
+                    {"term": {"tenant_id.keyword": self.tenant_id}},
+                    {"term": {"sub_index.keyword": self.sub_index}}
+                ]
+            }
+        }
+
+    def _marker_id(self) -> str:
+        return hashlib.sha1(f"{self.tenant_id}|{self.sub_index}".encode("utf-8")).hexdigest()
+
+    def read_completion_marker(self) -> Optional[Dict[str, Any]]:
+        """The marker of the last ingestion that finished for this tenant/sub_index, if any."""
+        try:
+            return self.es.get(index=self.marker_index, id=self._marker_id())["_source"]
+        except NotFoundError:
+            return None
+
+    def write_completion_marker(self, file_hash: str, row_count: int) -> None:
+        self.es.index(index=self.marker_index, id=self._marker_id(), document={
+            "tenant_id": self.tenant_id,
+            "sub_index": self.sub_index,
+            "file_hash": file_hash,
+            "row_count": row_count,
+            "completed_at": datetime.now().isoformat()
+        })
+
+    def clear_completion_marker(self) -> None:
+        try:
+            self.es.delete(index=self.marker_index, id=self._marker_id())
+        except NotFoundError:
+            pass
+
+    def count_documents(self) -> int:
+        return self.es.count(index=self.index_name, query=self._scope_query())["count"]
+
+    def get_existing_documents(self) -> Dict[str, str]:
+        """Map _id -> file_hash for every document already indexed for this tenant/sub_index."""
+        existing = {}
+        try:
+            for hit in helpers.scan(
+                self.es,
+                index=self.index_name,
+                query={"query": self._scope_query(), "_source": ["file_hash"]},
+                size=1000
+            ):
+                existing[hit["_id"]] = hit.get("_source", {}).get("file_hash")
+        except Exception as e:
+            logger.error(f"Failed to load existing documents: {str(e)}")
+            raise
+        return existing
+
     def clean_data_for_elasticsearch(self, data: Any) -> Any:
         """ALIGNED - maintains searchability for smart filters"""
         if isinstance(data, dict):
@@ -176,105 +312,458 @@ class ExcelToElasticsearch:
         """EXACTLY SAME as es_search.py cached version"""
         return self.embedding_model.embed_documents(texts)
 
-    def process_excel(self, file_path: str, header_row: int = 0) -> Dict[str, Any]:
-        """ALIGNED to return format expected by upload endpoint"""
+    def iter_sheet_chunks(self, file_path: str, header_row: int = 0) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yield (sheet_name, DataFrame) chunks of at most chunk_size rows per sheet.
+
+        .xlsx files are read with openpyxl in read-only mode so only one chunk of
+        rows is held in memory at a time. Legacy .xls files are not supported by
+        openpyxl and fall back to pandas, one sheet at a time.
+        """
+        if file_path.lower().endswith(".xls"):
+            yield from self._iter_xls_chunks(file_path, header_row)
+            return
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                sheet_name = worksheet.title
+                rows = worksheet.iter_rows(values_only=True)
+
+                header = None
+                for position, values in enumerate(rows):
+                    if position == header_row:
+                        header = values
+                        break
+                if header is None:
+                    logger.warning(f"Skipping empty sheet: {sheet_name}")
+                    continue
+
+                columns = self._normalize_columns(header)
+                width = len(columns)
+                chunk: List[tuple] = []
+                pending_blank: List[tuple] = []
+                row_offset = 0
+
+                for values in rows:
+                    values = tuple(values[:width]) + (None,) * (width - len(values))
+                    # Trailing blank rows are dropped like pandas does; blank rows
+                    # in the middle of a sheet still consume a row_id.
+                    if all(v is None or v == "" for v in values):
+                        pending_blank.append(values)
+                        continue
+                    if pending_blank:
+                        chunk.extend(pending_blank)
+                        pending_blank = []
+                    chunk.append(values)
+                    if len(chunk) >= self.chunk_size:
+                        yield sheet_name, self._chunk_frame(chunk, columns, row_offset)
+                        row_offset += len(chunk)
+                        chunk = []
+
+                if chunk:
+                    yield sheet_name, self._chunk_frame(chunk, columns, row_offset)
+                elif row_offset == 0:
+                    logger.warning(f"Skipping empty sheet: {sheet_name}")
+        finally:
+            workbook.close()
+
+    def _iter_xls_chunks(self, file_path: str, header_row: int) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Fallback for .xls workbooks: load one sheet at a time and slice it."""
+        sheet_names = pd.ExcelFile(file_path).sheet_names
+        for sheet_name in sheet_names:
+            df = pd.read_excel(file_path, sheet_name=sheet_name, header=header_row)
+            if df.empty:
+                logger.warning(f"Skipping empty sheet: {sheet_name}")
+                continue
+            df.columns = [str(c).strip().replace('.', '_').replace(' ', '_') for c in df.columns]
+            for start in range(0, len(df), self.chunk_size):
+                yield sheet_name, df.iloc[start:start + self.chunk_size]
+            del df
+
+    @staticmethod
+    def _normalize_columns(header: tuple) -> List[str]:
+        """Name columns the way pd.read_excel does, then make them ES-friendly."""
+        names = []
+        seen: Dict[str, int] = {}
+        for position, value in enumerate(header):
+            name = f"Unnamed: {position}" if value is None or str(value).strip() == "" else str(value)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return [c.strip().replace('.', '_').replace(' ', '_') for c in names]
+
+    @staticmethod
+    def _chunk_frame(rows: List[tuple], columns: List[str], row_offset: int) -> pd.DataFrame:
+        """Wrap a chunk of rows without letting pandas infer dtypes.
+
+        Inference would only see this chunk, so an int column would read as
+        float (7 -> 7.0) in just the chunks that happen to contain a blank
+        cell. The sheet's first chunk fixes the column dtypes and every chunk
+        is cast to them (see _sheet_schema / _apply_schema).
+        """
+        df = pd.DataFrame(rows, columns=columns, dtype=object)
+        df.index = pd.RangeIndex(row_offset, row_offset + len(df))
+        return df
+
+    @classmethod
+    def _sheet_schema(cls, df: pd.DataFrame) -> SheetSchema:
+        """Column dtypes for a whole sheet, inferred the way pd.read_excel would from its first chunk."""
+        typed = df.infer_objects()
+        frame_kind = cls._frame_kind(typed)
+        return SheetSchema(
+            dtypes={col: typed[col].dtype for col in typed.columns},
+            frame_kind=frame_kind,
+            data_types={col: cls._dtype_name(typed[col]) for col in typed.columns}
+        )
+
+    @staticmethod
+    def _apply_schema(df: pd.DataFrame, schema: SheetSchema) -> pd.DataFrame:
+        """Cast a chunk's object columns to the sheet's dtypes.
+
+        A blank in an int column becomes a nullable Int64 so its other cells
+        stay ints. Cells that don't fit the sheet's dtype (text in a numeric
+        column) leave that column as object for this chunk.
+        """
+        columns = {}
+        for col, dtype in schema.dtypes.items():
+            series = df[col]
+            if series.dtype != object or dtype == object:
+                continue
+            present = series.dropna()
+            inferred = pd.api.types.infer_dtype(present, skipna=True) if len(present) else "empty"
+            if dtype.kind == "i" and inferred in ("integer", "empty"):
+                columns[col] = series.astype("Int64" if len(present) < len(series) else dtype)
+            elif dtype.kind == "f" and inferred in ("integer", "floating", "mixed-integer-float", "empty"):
+                columns[col] = series.astype(dtype)
+            elif dtype.kind == "M" and inferred in ("datetime", "datetime64", "date", "empty"):
+                columns[col] = pd.to_datetime(series)
+            elif dtype.kind == "b" and inferred == "boolean" and len(present) == len(series):
+                columns[col] = series.astype(dtype)
+        return df.assign(**columns) if columns else df
+
+    @staticmethod
+    def _dtype_name(series: pd.Series) -> str:
+        """The dtype a column has after ``fillna("")``: float columns holding NaN turn object."""
+        if series.dtype.kind == "f" and series.isna().any():
+            return "object"
+        return str(series.dtype)
+
+    @staticmethod
+    def _clean_column(series: pd.Series, frame_kind: Optional[str]) -> Tuple[np.ndarray, str]:
+        """Column-wise equivalent of clean_data_for_elasticsearch.
+
+        Returns an object array holding the cleaned value of every cell (None
+        where the cell would have been dropped) and the dtype string that the
+        column has after ``fillna("")``.
+        """
+        kind = series.dtype.kind
+        n = len(series)
+
+        if kind in "iub":
+            out = np.full(n, None, dtype=object)
+            valid = series.notna().to_numpy()  # only nullable Int64 columns hold NA
+            # iterrows upcasts int columns of an all-numeric frame to float
+            target = float if frame_kind == "float" else getattr(series.dtype, "numpy_dtype", series.dtype)
+            out[valid] = series[valid].to_numpy(dtype=target).tolist()
+            return out, str(series.dtype)
+
+        if kind == "f":
+            raw = series.to_numpy(dtype=float)
+            valid = np.isfinite(raw)
+            out = np.full(n, None, dtype=object)
+            out[valid] = raw[valid].tolist()
+            dtype_name = "object" if np.isnan(raw).any() else str(series.dtype)
+            return out, dtype_name
+
+        if kind == "M":
+            valid = series.notna().to_numpy()
+            out = np.full(n, None, dtype=object)
+            if valid.any():
+                present = series[valid]
+                if present.dt.tz is None and not (present.dt.microsecond.any() or present.dt.nanosecond.any()):
+                    out[valid] = present.dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+                else:
+                    out[valid] = present.map(str).to_numpy()
+            return out, str(series.dtype)
+
+        # Object (and any other) columns: strings are handled with vectorized
+        # string ops, only the leftover non-string cells go through Python.
+        try:
+            lowered = series.str.lower()
+        except AttributeError:
+            # .str refuses columns without any string values
+            lowered = pd.Series(np.nan, index=series.index, dtype=object)
+        is_str = lowered.notna().to_numpy()
+        drop = series.isna().to_numpy() | lowered.isin(["", "nan", "none", "null"]).to_numpy()
+        out = np.full(n, None, dtype=object)
+        keep_str = is_str & ~drop
+        out[keep_str] = series.to_numpy()[keep_str]
+
+        other = ~is_str & ~drop
+        if other.any():
+            out[other] = [ExcelToElasticsearch._clean_scalar(v) for v in series.to_numpy()[other]]
+        return out, str(series.dtype)
+
+    @staticmethod
+    def _clean_scalar(value: Any) -> Any:
+        """Non-string cells of object columns (mixed-type columns only)."""
+        if str(value).lower() in ['nan', 'none', 'null']:
+            return None
+        if isinstance(value, float):
+            return value if np.isfinite(value) else None
+        if isinstance(value, (int, bool)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def _frame_kind(df: pd.DataFrame) -> Optional[str]:
+        """How iterrows would have typed the cells of an all-numeric frame.
+
+        Mixing int and float columns (without NaN, which fillna turns into
+        object columns) makes iterrows interleave every cell as float.
+        """
+        kinds = {dtype.kind for dtype in df.dtypes}
+        if "f" in kinds and kinds <= {"i", "u", "f"} and not df.isna().to_numpy().any():
+            return "float"
+        return None
+
+    def build_chunk_documents(self, sheet_name: str, df: pd.DataFrame, file_hash: str,
+                              schema: Optional[SheetSchema] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Turn one DataFrame chunk into (texts, docs) ready for embedding.
+
+        Cleaning and combined_text construction run column by column with
+        pandas/NumPy operations; the only per-row Python work left is building
+        the row_data dicts themselves. Pass the sheet's `schema` to cast the
+        chunk to the sheet's dtypes and stamp it with the sheet's data_types;
+        otherwise everything comes from this chunk.
+        """
+        if schema is not None:
+            df = self._apply_schema(df, schema)
+            frame_kind, data_types = schema.frame_kind, schema.data_types
+        else:
+            frame_kind, data_types = self._frame_kind(df), None
+        columns = list(df.columns)
+        cleaned = []
+        chunk_types = {}
+        for col in columns:
+            values, dtype_name = self._clean_column(df[col], frame_kind)
+            cleaned.append(values)
+            chunk_types[col] = dtype_name
+        if data_types is None:
+            data_types = chunk_types
+
+        # SAME combined text logic as original: "col: value" joined by " | "
+        combined = np.full(len(df), "", dtype=object)
+        for col, values in zip(columns, cleaned):
+            present = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+            if not present.any():
+                continue
+            text = pd.Series(values, dtype=object).astype(str).to_numpy(dtype=object)
+            part = np.where(present, f"{col}: " + text, "")
+            joiner = np.where((combined != "") & present, " | ", "")
+            combined = combined + joiner + part
+
+        keep = pd.Series(combined, dtype=object).str.strip().to_numpy() != ""
+        row_ids = df.index.to_numpy()
+        timestamp = datetime.now().isoformat()
+
+        texts = []
+        docs = []
+        for position in np.flatnonzero(keep):
+            # CRITICAL: Clean row data but keep it searchable
+            row_dict = {col: values[position] for col, values in zip(columns, cleaned)
+                        if values[position] is not None}
+            texts.append(combined[position])
+
+            # EXACTLY SAME document structure as original
+            docs.append({
+                "sheet_name": sheet_name,
+                "row_id": int(row_ids[position]),
+                "row_data": row_dict,  # CRITICAL: Must be searchable by smart filters
+                "combined_text": combined[position],  # CRITICAL: Must support multi_match
+                "data_types": data_types,
+                "file_hash": file_hash,
+                "row_hash": self.calculate_row_hash((col, values[position]) for col, values in zip(columns, cleaned)),
+                "tenant_id": self.tenant_id,  # CRITICAL: Will create .keyword field
+                "timestamp": timestamp,
+                "embedding_model": self.embedding_model_name,
+                "sub_index": self.sub_index  # CRITICAL: Will create .keyword field
+            })
+
+        return texts, docs
+
+    def _iter_chunk_documents(self, file_path: str, file_hash: str, header_row: int,
+                              stats: Dict[str, Any], metrics: IngestionMetrics,
+                              existing: Dict[str, str]) -> Iterator[Tuple[List[str], Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]]:
+        """Parsing stage: diff each chunk against `existing` before embedding.
+
+        Yields (texts, (new_docs, update_actions)). Only rows whose _id is not
+        already indexed are embedded; rows that are already indexed from an
+        earlier file only get their file_hash/row_id refreshed. Every _id seen
+        is removed from `existing`, so what remains afterwards has vanished.
+        """
+        occurrences: Dict[Tuple[str, str], int] = {}
+        schemas: Dict[str, SheetSchema] = {}
+        for sheet_name, df in self.iter_sheet_chunks(file_path, header_row):
+            if sheet_name not in stats["sheets"]:
+                stats["sheets"].add(sheet_name)
+                schemas[sheet_name] = self._sheet_schema(df)
+                logger.info(f"Processing sheet: {sheet_name}")
+            stats["total_rows"] += len(df)
+            metrics.rows_parsed += len(df)
+
+            texts, docs = self.build_chunk_documents(sheet_name, df, file_hash, schemas[sheet_name])
+            new_texts, new_docs, updates = [], [], []
+            for text, doc in zip(texts, docs):
+                key = (sheet_name, doc["row_hash"])
+                occurrence = occurrences.get(key, 0)
+                occurrences[key] = occurrence + 1
+                doc_id = self.document_id(sheet_name, doc["row_hash"], occurrence)
+                stats["processed_rows"] += 1
+
+                if doc_id not in existing:
+                    doc["_id"] = doc_id
+                    new_texts.append(text)
+                    new_docs.append(doc)
+                    continue
+
+                stats["unchanged_rows"] += 1
+                if existing.pop(doc_id) != file_hash:
+                    updates.append({
+                        "_op_type": "update",
+                        "_index": self.index_name,
+                        "_id": doc_id,
+                        "doc": {"file_hash": file_hash, "row_id": doc["row_id"], "timestamp": doc["timestamp"]}
+                    })
+
+            if new_docs or updates:
+                yield new_texts, (new_docs, updates)
+
+    def _generate_actions(self, file_path: str, file_hash: str, header_row: int,
+                          stats: Dict[str, Any], metrics: IngestionMetrics,
+                          existing: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        """Parse -> embed -> yield bulk actions as a bounded producer/consumer pipeline.
+
+        Parsing runs in its own thread, up to max_in_flight chunks are embedded
+        concurrently on the embedding workers, and streaming_bulk consumes the
+        resulting actions in order as soon as each chunk is embedded. Rows left
+        in `existing` once the file is exhausted are stale; process_excel
+        deletes them only after these upserts pass validation.
+        """
+        chunks = prefetch(self._iter_chunk_documents(file_path, file_hash, header_row, stats, metrics, existing),
+                          depth=self.max_in_flight)
+        for (docs, updates), embeddings in self.embedding_stage.map_ordered(chunks, metrics):
+            yield from updates
+            for doc, vec in zip(docs, embeddings):
+                doc_id = doc.pop("_id")
+                doc["embedding"] = [float(x) for x in vec]  # CRITICAL: Must be float list
+                stats["embedded_rows"] += 1
+                yield {
+                    "_index": self.index_name,
+                    "_id": doc_id,
+                    "_source": doc
+                }
+
+    def _delete_stale(self, stale_ids: Iterable[str], stats: Dict[str, Any]) -> None:
+        """Delete rows that are no longer in the workbook."""
+        actions = ({"_op_type": "delete", "_index": self.index_name, "_id": doc_id} for doc_id in stale_ids)
+        result = self._stream_bulk(actions, batch_size=self.batch_size)
+        stats["deleted_rows"] = result["indexed_documents"]
+
+    def process_excel(self, file_path: str, header_row: int = 0,
+                      metrics: Optional[IngestionMetrics] = None,
+                      file_hash: Optional[str] = None) -> Dict[str, Any]:
+        """ALIGNED to return format expected by upload endpoint.
+
+        Rows are streamed chunk by chunk: each chunk is parsed, embedded and
+        handed to streaming_bulk before the next one is read, so peak memory is
+        bounded by chunk_size rather than by the size of the workbook.
+
+        Ingestion is incremental per tenant/sub_index. Documents get
+        deterministic ids from their row content, so re-uploading a workbook
+        only embeds new or changed rows and deletes rows that disappeared. A
+        completion marker (file_hash + row_count) is written only after a run
+        succeeds; if it matches this file and the indexed document count still
+        agrees, nothing is parsed at all.
+
+        Pass `metrics` to observe rows parsed/embedded/indexed while it runs,
+        and `file_hash` when the MD5 was already computed while spooling the
+        upload, to avoid reading the file a second time.
+        """
         start_time = time.time()
-        
+
         try:
             # Create index
             if not self.create_index():
                 raise Exception("Failed to create Elasticsearch index")
 
-            file_hash = self.calculate_file_hash(file_path)
+            file_hash = file_hash or self.calculate_file_hash(file_path)
             logger.info(f"Processing file with hash: {file_hash}")
 
-            # Load all sheets - SAME as original
-            xls = pd.read_excel(file_path, sheet_name=None, header=header_row)
-            all_docs = []
-            total_rows = 0
-            processed_rows = 0
+            marker = self.read_completion_marker()
+            if marker and marker.get("file_hash") == file_hash:
+                indexed = self.count_documents()
+                if indexed == marker.get("row_count"):
+                    logger.info(f"File {file_hash} already ingested for {self.tenant_id}/{self.sub_index}, skipping")
+                    return {
+                        "total_rows": indexed,
+                        "processed_rows": indexed,
+                        "indexed_documents": 0,
+                        "processing_time_seconds": round(time.time() - start_time, 2),
+                        "sheets_processed": 0,
+                        "file_hash": file_hash,
+                        "skipped": True
+                    }
+                logger.warning(f"File {file_hash} was ingested with {marker.get('row_count')} rows but "
+                               f"{indexed} are indexed, ingesting again")
 
-            for sheet_name, df in xls.items():
-                if df.empty:
-                    logger.warning(f"Skipping empty sheet: {sheet_name}")
-                    continue
-                    
-                logger.info(f"Processing sheet: {sheet_name} with {len(df)} rows")
-                total_rows += len(df)
-
-                # Clean the dataframe - KEEP ORIGINAL LOGIC for compatibility
-                df = df.fillna("")
-                df.columns = [str(c).strip().replace('.', '_').replace(' ', '_') for c in df.columns]
-
-                data_types = {col: str(dtype) for col, dtype in df.dtypes.items()}
-                texts = []
-                docs = []
-
-                for idx, row in df.iterrows():
-                    try:
-                        # CRITICAL: Clean row data but keep it searchable
-                        row_dict = {}
-                        for col, val in row.items():
-                            cleaned_val = self.clean_data_for_elasticsearch(val)
-                            if cleaned_val not in [None, '', 'nan']:
-                                row_dict[col] = cleaned_val
-
-                        # SAME combined text logic as original
-                        combined = " | ".join(f"{k}: {v}" for k, v in row_dict.items() if v not in [None, '', 'nan'])
-                        
-                        if not combined.strip():
-                            continue
-                            
-                        texts.append(combined)
-
-                        # EXACTLY SAME document structure as original
-                        doc = {
-                            "sheet_name": sheet_name,
-                            "row_id": int(idx),
-                            "row_data": row_dict,  # CRITICAL: Must be searchable by smart filters
-                            "combined_text": combined,  # CRITICAL: Must support multi_match
-                            "data_types": data_types,
-                            "file_hash": file_hash,
-                            "tenant_id": self.tenant_id,  # CRITICAL: Will create .keyword field
-                            "timestamp": datetime.now().isoformat(),
-                            "embedding_model": self.embedding_model_name,
-                            "sub_index": self.sub_index  # CRITICAL: Will create .keyword field
-                        }
-                        
-                        docs.append(doc)
-                        processed_rows += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing row {idx} in sheet '{sheet_name}': {str(e)}")
-                        continue
+            # A run that does not finish must not leave a marker claiming the old state
+            self.clear_completion_marker()
+            existing = self.get_existing_documents()
 
-                if docs:
-                    # Generate embeddings - SAME as original
-                    logger.info(f"Generating embeddings for {len(texts)} texts in sheet '{sheet_name}'")
-                    embeddings = self.generate_embeddings(texts)
-                    
-                    for doc, vec in zip(docs, embeddings):
-                        doc["embedding"] = [float(x) for x in vec]  # CRITICAL: Must be float list
-                        
-                    all_docs.extend(docs)
+            stats = {"total_rows": 0, "processed_rows": 0, "embedded_rows": 0,
+                     "unchanged_rows": 0, "deleted_rows": 0, "sheets": set()}
+            metrics = metrics if metrics is not None else IngestionMetrics()
+            actions = self._generate_actions(file_path, file_hash, header_row, stats, metrics, existing)
+            indexing_result = self._stream_bulk(actions, batch_size=self.batch_size, metrics=metrics)
 
-            if not all_docs:
+            if stats["processed_rows"] == 0:
                 raise Exception("No valid documents were processed from the Excel file")
 
-            # Bulk index - SAME as original but with better stats
-            logger.info(f"Indexing {len(all_docs)} documents...")
-            indexing_result = self.bulk_index(all_docs)
-            
+            if indexing_result["failed_documents"] > stats["processed_rows"] * 0.1:  # More than 10% failed
+                raise Exception(f"{indexing_result['failed_documents']} document(s) failed to index. Check logs for details.")
+
+            # Only now that the new rows are in is it safe to drop the ones that vanished;
+            # an empty or broken workbook must never wipe the dataset.
+            if existing:
+                self._delete_stale(existing, stats)
+
+            self._refresh_index()
+            # row_count is what should be indexed; rows that failed to index or
+            # stale rows that failed to delete make the count disagree next time
+            self.write_completion_marker(file_hash, stats["processed_rows"])
             processing_time = round(time.time() - start_time, 2)
-            
+            throughput = metrics.as_dict()
+            logger.info(f"Ingestion throughput: {throughput}")
+            logger.info(f"Incremental ingestion: {stats['embedded_rows']} new, "
+                        f"{stats['unchanged_rows']} unchanged, {stats['deleted_rows']} deleted")
+
             # RETURN FORMAT ALIGNED with upload endpoint expectations
             return {
-                "total_rows": total_rows,
-                "processed_rows": processed_rows,
-                "indexed_documents": len(all_docs),
+                "total_rows": stats["total_rows"],
+                "processed_rows": stats["processed_rows"],
+                "indexed_documents": indexing_result["indexed_documents"],
                 "processing_time_seconds": processing_time,
-                "sheets_processed": len([name for name, df in xls.items() if not df.empty]),
-                "file_hash": file_hash
+                "sheets_processed": len(stats["sheets"]),
+                "file_hash": file_hash,
+                "new_rows": stats["embedded_rows"],
+                "unchanged_rows": stats["unchanged_rows"],
+                "deleted_rows": stats["deleted_rows"],
+                "skipped": False,
+                "throughput": throughput
             }
 
         except Exception as e:
@@ -282,45 +771,29 @@ class ExcelToElasticsearch:
             logger.error(f"Excel processing failed after {processing_time}s: {str(e)}")
             raise
 
-    def bulk_index(self, docs: List[Dict[str, Any]], batch_size: int = 100) -> Dict[str, Any]:
-        """EXACTLY SAME as original - proven to work with search"""
-        actions = []
-        for i, doc in enumerate(docs):
-            try:
-                # Validate document before adding to actions
-                action = {
-                    "_index": self.index_name,
-                    "_source": doc
-                }
-                # Test JSON serialization
-                json.dumps(doc, default=str)
-                actions.append(action)
-            except Exception as e:
-                logger.error(f"Error preparing document {i}: {str(e)}")
-                continue
-
-        if not actions:
-            raise Exception("No valid actions to index")
-
+    def _stream_bulk(self, actions: Iterable[Dict[str, Any]], batch_size: int = 100,
+                     metrics: Optional[IngestionMetrics] = None) -> Dict[str, Any]:
+        """Feed an action iterable to streaming_bulk and count the outcome."""
         success_count = 0
         fail_count = 0
-        failed_docs = []
 
         try:
             for success, info in helpers.streaming_bulk(
-                self.es, 
-                actions, 
+                self.es,
+                actions,
                 chunk_size=batch_size,
                 request_timeout=60,
                 max_retries=3,
                 initial_backoff=2,
-                max_backoff=600
+                max_backoff=600,
+                raise_on_error=False
             ):
                 if success:
                     success_count += 1
+                    if metrics is not None:
+                        metrics.rows_indexed += 1
                 else:
                     fail_count += 1
-                    failed_docs.append(info)
                     logger.error(f"Failed to index document: {info}")
 
         except Exception as e:
@@ -328,10 +801,12 @@ class ExcelToElasticsearch:
             raise
 
         logger.info(f"Bulk indexing complete: {success_count} succeeded, {fail_count} failed.")
+        return {
+            "indexed_documents": success_count,
+            "failed_documents": fail_count
+        }
 
-        if failed_docs and fail_count > len(docs) * 0.1:  # More than 10% failed
-            raise Exception(f"{fail_count} document(s) failed to index. Check logs for details.")
-
+    def _refresh_index(self) -> None:
         # CRITICAL: Refresh the index to make documents searchable immediately
         try:
             self.es.indices.refresh(index=self.index_name)
@@ -339,7 +814,30 @@ class ExcelToElasticsearch:
         except Exception as e:
             logger.warning(f"Failed to refresh index: {str(e)}")
 
-        return {
-            "indexed_documents": success_count,
-            "failed_documents": fail_count
-        }
\ No newline at end of file
+    def bulk_index(self, docs: List[Dict[str, Any]], batch_size: int = 100) -> Dict[str, Any]:
+        """EXACTLY SAME as original - proven to work with search"""
+        actions = []
+        for i, doc in enumerate(docs):
+            try:
+                # Validate document before adding to actions
+                action = {
+                    "_index": self.index_name,
+                    "_source": doc
+                }
+                # Test JSON serialization
+                json.dumps(doc, default=str)
+                actions.append(action)
+            except Exception as e:
+                logger.error(f"Error preparing document {i}: {str(e)}")
+                continue
+
+        if not actions:
+            raise Exception("No valid actions to index")
+
+        result = self._stream_bulk(actions, batch_size=batch_size)
+
+        if result["failed_documents"] > len(docs) * 0.1:  # More than 10% failed
+            raise Exception(f"{result['failed_documents']} document(s) failed to index. Check logs for details.")
+
+        self._refresh_index()
+        return result
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.core_log import agent_logger as logger
+
+
+class ExecutionPlanner:
+    """Starts a request's independent lookups at once and drops the ones that lose.
+
+    Each step runs on a shared pool as soon as it is started; `result`
+    waits for one step, `cancel` stops steps that are no longer needed (a
+    step already running finishes in the background and its result is
+    ignored) and `timings` reports how long each step took, so the pre-LLM
+    phase costs as much as its slowest step rather than the sum.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self.steps: Dict[str, Future] = {}
+        self._durations: Dict[str, float] = {}
+
+    def start(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        started = time.perf_counter()
+
+        def timed():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._durations[name] = round((time.perf_counter() - started) * 1000, 1)
+
+        self.steps[name] = self.executor.submit(timed)
+        return self.steps[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.steps
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        return self.steps[name].result(timeout=timeout)
+
+    def cancel(self, *names: str) -> None:
+        """Cancel the named steps, or every unfinished step when none are named."""
+        for name in names or list(self.steps):
+            future = self.steps.get(name)
+            if future is not None and not future.done() and future.cancel():
+                logger.debug(f"Cancelled speculative step {name}")
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        return {name: self._durations.get(name) for name in self.steps}
+
+
+# Shared by all requests; each orchestration starts at most a couple of steps
+prefetch_executor = ThreadPoolExecutor(max_workers=settings.orchestrator_prefetch_workers,
+                                       thread_name_prefix="orchestrator_prefetch")
@@ -0,0 +1,282 @@
+# backend/app/services/forecasting.py
+
+"""Deterministic ETS forecasting for the predictive-analysis endpoint.
+
+Method is chosen by history length N:
+  - N >= 24: Holt-Winters additive (ETS A,A,A), m = 12
+  - 12 <= N < 24: Holt's linear trend (ETS A,A,N)
+  - N < 12: simple exponential smoothing (ETS A,N,N)
+
+alpha, beta, gamma are searched over {0.05, 0.10, ..., 0.50}. Every grid
+combination is filtered in the same pass over the series: the smoothing state
+is a vector with one entry per combination, so the Python loop runs over time
+steps only. The combination with the lowest one-step-ahead MAPE on the last
+30% of the series wins. Uncertainty bands come from the MAD of the winning
+model's in-sample residuals. forecast_many additionally stacks series of the
+same method and length so a whole dashboard shares one pass.
+"""
+
+import calendar
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PARAM_GRID = np.round(np.arange(0.05, 0.50 + 1e-9, 0.05), 2)
+SEASON_LENGTH = 12
+HOLDOUT_FRACTION = 0.3
+MAD_TO_SIGMA = 1.4826
+Z_P90 = 1.2816
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%m/%d/%Y', '%d/%m/%Y',
+                '%Y/%m/%d', '%Y-%m', '%b %Y', '%B %Y', '%b-%Y', '%Y %b']
+
+
+@dataclass
+class Forecast:
+    method: str
+    params: Dict[str, float]
+    mape: Optional[float]
+    dates: List[str]
+    p50: List[float]
+    p10: List[float]
+    p90: List[float]
+    sigma: float
+    seasonality_index: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def confidence_level(self) -> str:
+        if self.mape is None:
+            return "low"
+        if self.mape < 10:
+            return "high"
+        if self.mape < 25:
+            return "medium"
+        return "low"
+
+
+# --- Dates -------------------------------------------------------------------
+
+def parse_date(value: str) -> Tuple[datetime, str]:
+    """Parse a chart x value, returning the datetime and the format it used."""
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt), fmt
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse date: {value}")
+
+
+def add_months(date: datetime, months: int) -> datetime:
+    month_index = date.month - 1 + months
+    year = date.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
+def future_dates(last_value: str, horizon: int) -> List[str]:
+    """`horizon` consecutive months after `last_value`, in the same format."""
+    try:
+        last_date, fmt = parse_date(last_value)
+    except ValueError:
+        return [f"{last_value} +{h}" for h in range(1, horizon + 1)]
+    return [add_months(last_date, h).strftime(fmt) for h in range(1, horizon + 1)]
+
+
+# --- ETS filtering over the whole grid at once -------------------------------
+#
+# Each model takes Y with shape (S, N) -- S series of equal length N -- and a
+# (P, k) parameter grid. State arrays are (S, P), so one loop over time filters
+# every series under every parameter combination. Returns the one-step-ahead
+# fitted values (S, P, N; NaN before the first prediction), a function giving
+# the h-step forecasts (S, P, h), and the index of the first fitted value.
+
+def _grid(n_params: int) -> np.ndarray:
+    """All (alpha[, beta[, gamma]]) combinations as a (P, n_params) array."""
+    return np.array(list(itertools.product(PARAM_GRID, repeat=n_params)))
+
+
+def _ses(Y: np.ndarray, params: np.ndarray):
+    alpha = params[None, :, 0]
+    fitted = np.full((Y.shape[0], len(params), Y.shape[1]), np.nan)
+    level = np.repeat(Y[:, :1], len(params), axis=1)
+    for t in range(1, Y.shape[1]):
+        fitted[:, :, t] = level
+        level = alpha * Y[:, t:t + 1] + (1 - alpha) * level
+    return fitted, lambda h: np.repeat(level[:, :, None], h, axis=2), 1
+
+
+def _holt(Y: np.ndarray, params: np.ndarray):
+    alpha, beta = params[None, :, 0], params[None, :, 1]
+    fitted = np.full((Y.shape[0], len(params), Y.shape[1]), np.nan)
+    level = np.repeat(Y[:, :1], len(params), axis=1)
+    trend = np.repeat(Y[:, 1:2] - Y[:, :1], len(params), axis=1)
+    for t in range(1, Y.shape[1]):
+        fitted[:, :, t] = level + trend
+        prev_level = level
+        level = alpha * Y[:, t:t + 1] + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+    steps = lambda h: level[:, :, None] + np.arange(1, h + 1)[None, None, :] * trend[:, :, None]
+    return fitted, steps, 1
+
+
+def _holt_winters(Y: np.ndarray, params: np.ndarray, m: int = SEASON_LENGTH):
+    alpha, beta, gamma = params[None, :, 0], params[None, :, 1], params[None, :, 2]
+    n_series, n_params, n = Y.shape[0], len(params), Y.shape[1]
+    fitted = np.full((n_series, n_params, n), np.nan)
+    initial_level = Y[:, :m].mean(axis=1, keepdims=True)
+    level = np.repeat(initial_level, n_params, axis=1)
+    trend = np.repeat((Y[:, m:2 * m].mean(axis=1, keepdims=True) - initial_level) / m, n_params, axis=1)
+    # season[:, :, t % m] holds s_{t-m}
+    season = np.repeat((Y[:, :m] - initial_level)[:, None, :], n_params, axis=1)
+    for t in range(m, n):
+        y_t = Y[:, t:t + 1]
+        s_prev = season[:, :, t % m]
+        fitted[:, :, t] = level + trend + s_prev
+        prev_level = level
+        level = alpha * (y_t - s_prev) + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+        season[:, :, t % m] = gamma * (y_t - level) + (1 - gamma) * s_prev
+
+    def steps(h):
+        horizon = np.arange(1, h + 1)
+        return (level[:, :, None] + horizon[None, None, :] * trend[:, :, None]
+                + season[:, :, (n + horizon - 1) % m])
+
+    return fitted, steps, m
+
+
+METHODS = {
+    "ses": ("Simple Exponential Smoothing (ETS A,N,N)", _ses, ("alpha",)),
+    "holt": ("Holt's Linear Trend (ETS A,A,N)", _holt, ("alpha", "beta")),
+    "holt_winters": ("Holt-Winters Additive (ETS A,A,A), m=12", _holt_winters, ("alpha", "beta", "gamma")),
+}
+
+
+def choose_method(n: int) -> str:
+    if n >= 2 * SEASON_LENGTH:
+        return "holt_winters"
+    if n >= SEASON_LENGTH:
+        return "holt"
+    return "ses"
+
+
+def _holdout_mape(Y: np.ndarray, fitted: np.ndarray, start: int) -> np.ndarray:
+    """(S, P) MAPE (%) of one-step predictions over the last 30% of each series."""
+    n = Y.shape[1]
+    holdout_start = max(start, int(np.floor(n * (1 - HOLDOUT_FRACTION))))
+    actual = Y[:, None, holdout_start:]
+    predicted = fitted[:, :, holdout_start:]
+    nonzero = np.broadcast_to(actual != 0, predicted.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        errors = np.where(nonzero, np.abs((actual - predicted) / np.where(actual == 0, 1, actual)), 0.0)
+        return errors.sum(axis=2) / nonzero.sum(axis=2) * 100
+
+
+def seasonality_index(dates: Sequence[str], y: np.ndarray) -> Dict[str, float]:
+    """Month -> seasonal index, rescaled so the indices average 1.00."""
+    try:
+        months = np.array([parse_date(d)[0].month for d in dates])
+    except ValueError:
+        return {}
+
+    if len(y) >= 2 * SEASON_LENGTH:
+        overall = y.mean()
+        if overall == 0:
+            return {}
+        index = {month: y[months == month].mean() / overall for month in np.unique(months)}
+    else:
+        recent_y, recent_months = y[-SEASON_LENGTH:], months[-SEASON_LENGTH:]
+        if len(recent_y) >= 6:
+            baseline = np.full(len(recent_y), recent_y.mean())
+        else:
+            # 5-month centered moving average, shrinking at the edges
+            baseline = np.array([recent_y[max(0, i - 2):i + 3].mean() for i in range(len(recent_y))])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(baseline != 0, recent_y / baseline, np.nan)
+        index = {month: np.nanmean(ratios[recent_months == month]) for month in np.unique(recent_months)}
+
+    values = np.array([v for v in index.values() if np.isfinite(v)])
+    if not len(values) or values.mean() == 0:
+        return {}
+    scale = values.mean()
+    return {calendar.month_abbr[int(month)]: round(float(v / scale), 2)
+            for month, v in index.items() if np.isfinite(v)}
+
+
+def _method_key(n: int) -> str:
+    return choose_method(n) if n >= 2 else "ses"
+
+
+def _validate(dates: Sequence[str], values: Sequence[float]) -> np.ndarray:
+    y = np.asarray(values, dtype=float)
+    if y.ndim != 1 or len(y) == 0 or not np.isfinite(y).all():
+        raise ValueError("values must be a non-empty sequence of finite numbers")
+    if len(dates) != len(y):
+        raise ValueError("dates and values must have the same length")
+    return y
+
+
+def _to_list(arr: np.ndarray) -> List[float]:
+    return [round(float(v), 2) for v in arr]
+
+
+def forecast_many(series: Sequence[Tuple[Sequence[str], Sequence[float]]], horizon: int = 5) -> List[Forecast]:
+    """Forecast several (dates, values) series, returning one Forecast per input.
+
+    Series that use the same method and have the same length are stacked into
+    one (S, N) array and share a single filtering pass over the parameter grid.
+    """
+    ys = [_validate(dates, values) for dates, values in series]
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    for i, y in enumerate(ys):
+        groups.setdefault((_method_key(len(y)), len(y)), []).append(i)
+
+    results: List[Optional[Forecast]] = [None] * len(ys)
+    for (key, _), members in groups.items():
+        method_name, model, param_names = METHODS[key]
+        grid = _grid(len(param_names))
+        Y = np.stack([ys[i] for i in members])
+
+        fitted, steps, start = model(Y, grid)
+        mape = _holdout_mape(Y, fitted, start)
+        forecasts = steps(horizon)
+
+        for row, i in enumerate(members):
+            y = ys[i]
+            finite = np.isfinite(mape[row])
+            best = int(np.nanargmin(mape[row])) if finite.any() else 0
+            best_mape = round(float(mape[row, best]), 2) if finite[best] else None
+
+            point = forecasts[row, best]
+            residuals = y[start:] - fitted[row, best, start:]
+            sigma = float(np.median(np.abs(residuals - np.median(residuals))) * MAD_TO_SIGMA) if len(residuals) else 0.0
+            band = Z_P90 * sigma * np.sqrt(np.arange(1, horizon + 1))
+            p10, p90 = point - band, point + band
+
+            if (y >= 0).all():
+                # Non-negative history (sales, counts...) -> keep forecasts non-negative
+                point, p10, p90 = np.maximum(point, 0), np.maximum(p10, 0), np.maximum(p90, 0)
+
+            dates = series[i][0]
+            results[i] = Forecast(
+                method=method_name,
+                params={name: float(grid[best, k]) for k, name in enumerate(param_names)},
+                mape=best_mape,
+                dates=future_dates(dates[-1], horizon),
+                p50=_to_list(point),
+                p10=_to_list(p10),
+                p90=_to_list(p90),
+                sigma=round(sigma, 4),
+                seasonality_index=seasonality_index(dates, y),
+            )
+    return results
+
+
+def forecast_series(dates: Sequence[str], values: Sequence[float], horizon: int = 5) -> Forecast:
+    """Fit the ETS model chosen by len(values) and forecast `horizon` months."""
+    return forecast_many([(dates, values)], horizon)[0]
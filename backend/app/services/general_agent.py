@@ -4,7 +4,7 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from app.groq_config import get_groq_config
 from app.core.config import settings
-from app.services.llm_guard import validate_prompt, validate_response, SAFE_FALLBACK_MESSAGE
+from app.services.llm_guard import start_prompt_check, validate_response, SAFE_FALLBACK_MESSAGE
 from app.core.core_log import agent_logger as logger
 
 
@@ -55,15 +55,29 @@ class GeneralAgent:
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
 
     def run(self, query: str) -> str:
-        # Pre-check with guard
+        # Pre-check with guard: local rules answer immediately, the remote
+        # verdict is fetched while the main LLM call is in flight
+        guard = None
         if settings.enable_llm_guard:
-            ok, reason = validate_prompt(query)
+            guard = start_prompt_check(query)
+            if guard.done():
+                ok, reason = guard.result()
+                if not ok:
+                    logger.warning(f"[LLM-GUARD] GeneralAgent prompt blocked: {reason}")
+                    return SAFE_FALLBACK_MESSAGE
+        try:
+            result = self.chain.run(query=query)
+        except Exception:
+            if guard is not None:
+                guard.cancel()
+            raise
+        if guard is not None:
+            ok, reason = guard.result()
             if not ok:
                 logger.warning(f"[LLM-GUARD] GeneralAgent prompt blocked: {reason}")
                 return SAFE_FALLBACK_MESSAGE
             else:
                 logger.debug("[LLM-GUARD] GeneralAgent prompt allowed")
-        result = self.chain.run(query=query)
         # Post-check with guard
         if settings.enable_llm_guard:
             ok, reason = validate_response(result)
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.core_log import logger
+from app.services.excel_to_elasticsearch import ExcelToElasticsearch
+from app.services.ingestion_pipeline import IngestionMetrics
+
+
+class IngestionQueueFull(Exception):
+    """Raised when no more upload jobs can be accepted right now."""
+
+
+@dataclass
+class IngestionJob:
+    tenant_id: str
+    index_name: str
+    sub_index: str
+    filename: str
+    file_path: str
+    file_hash: Optional[str] = None
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"  # queued -> running -> completed | failed
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    metrics: IngestionMetrics = field(default_factory=IngestionMetrics)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = self.metrics.as_dict() if self.started_at else {
+            "rows_parsed": 0, "rows_embedded": 0, "rows_indexed": 0
+        }
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "tenant_id": self.tenant_id,
+            "index_name": self.index_name,
+            "sub_index": self.sub_index,
+            "file": self.filename,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": progress,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class IngestionJobQueue:
+    """In-process job queue for Excel ingestion.
+
+    Stands in for a Kafka topic: the upload endpoint produces jobs and a small
+    pool of worker threads consumes them, so embedding and indexing never run
+    on the event loop. Job state lives in memory and only the most recent
+    `retention` jobs are kept.
+    """
+
+    def __init__(self, workers: int = 1, max_queued: int = 50, retention: int = 500):
+        self.workers = max(1, workers)
+        self.retention = max(1, retention)
+        self._queue: "queue.Queue[IngestionJob]" = queue.Queue(maxsize=max(1, max_queued))
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ingestion_job_{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job: IngestionJob) -> IngestionJob:
+        self.start()
+        with self._lock:
+            self._jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+            raise IngestionQueueFull("Too many uploads are being processed, please retry later")
+        with self._lock:
+            self._evict()
+        logger.info(f"📥 Queued ingestion job {job.job_id} for {job.tenant_id}/{job.sub_index}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self) -> None:
+        # Drop the oldest finished jobs once over the retention limit
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.retention:
+                break
+            if self._jobs[job_id].status in ("completed", "failed"):
+                del self._jobs[job_id]
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: IngestionJob) -> None:
+        job.status = "running"
+        job.started_at = datetime.utcnow().isoformat()
+        job.metrics = IngestionMetrics()
+        status = "failed"
+        try:
+            pipeline = ExcelToElasticsearch(
+                index_name=job.index_name,
+                sub_index=job.sub_index,
+                tenant_id=job.tenant_id
+            )
+            if not pipeline.validate_elasticsearch_connection():
+                raise Exception("Elasticsearch connection failed")
+
+            job.result = pipeline.process_excel(job.file_path, metrics=job.metrics, file_hash=job.file_hash)
+            status = "completed"
+            logger.info(f"✅ Ingestion job {job.job_id} completed", extra={"job_id": job.job_id})
+        except Exception as e:
+            job.error = str(e)
+            logger.exception(f"❌ Ingestion job {job.job_id} failed: {e}", extra={"job_id": job.job_id})
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            try:
+                os.unlink(job.file_path)
+            except OSError as cleanup_error:
+                logger.warning(f"Failed to clean up {job.file_path}: {cleanup_error}")
+            # Published last: a job seen as finished has its finish time and no temp file left
+            job.status = status
+
+
+ingestion_jobs = IngestionJobQueue(
+    workers=settings.ingestion_job_workers,
+    max_queued=settings.ingestion_job_queue_size,
+    retention=settings.ingestion_job_retention
+)
@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+
+@lru_cache(maxsize=4)
+def get_embedding_model(model_name: str, batch_size: int = 64) -> HuggingFaceEmbeddings:
+    """Load a sentence-transformers model once per (model, batch size) and reuse it."""
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+
+# --- Process pool workers ----------------------------------------------------
+
+_worker_model: Optional[HuggingFaceEmbeddings] = None
+
+
+def _init_embedding_worker(model_name: str, batch_size: int, torch_threads: int) -> None:
+    """Runs once in every pool process: pin torch threads and load the model."""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_model.embed_documents(texts)
+
+
+_executors: Dict[Tuple, Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(model_name: str, batch_size: int, workers: int, use_processes: bool) -> Executor:
+    """Shared executors so repeated uploads don't respawn workers or reload models."""
+    key = (model_name, batch_size, workers, use_processes)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            if use_processes:
+                torch_threads = max(1, (os.cpu_count() or 1) // workers)
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_embedding_worker,
+                    initargs=(model_name, batch_size, torch_threads),
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding_worker")
+            _executors[key] = executor
+        return executor
+
+
+# --- Metrics -----------------------------------------------------------------
+
+@dataclass
+class IngestionMetrics:
+    """Row counters for each pipeline stage, plus throughput derived from them."""
+    started_at: float = field(default_factory=time.time)
+    rows_parsed: int = 0
+    rows_embedded: int = 0
+    rows_indexed: int = 0
+    embedding_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        return {
+            "rows_parsed": self.rows_parsed,
+            "rows_embedded": self.rows_embedded,
+            "rows_indexed": self.rows_indexed,
+            "elapsed_seconds": round(elapsed, 2),
+            "parsed_rows_per_second": round(self.rows_parsed / elapsed, 1),
+            "embedded_rows_per_second": round(self.rows_embedded / elapsed, 1),
+            "indexed_rows_per_second": round(self.rows_indexed / elapsed, 1),
+            "embedding_worker_seconds": round(self.embedding_seconds, 2),
+        }
+
+
+# --- Pipeline stages ---------------------------------------------------------
+
+def prefetch(source: Iterable[Any], depth: int) -> Iterator[Any]:
+    """Run `source` in a background thread, buffering at most `depth` items.
+
+    Lets parsing run ahead of embedding/indexing while keeping memory bounded.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        """Block until `entry` is buffered, giving up once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in source:
+                if not put(("item", item)):
+                    return
+            put(("done", done))
+        except BaseException as e:  # propagate to the consumer
+            put(("error", e))
+
+    thread = threading.Thread(target=producer, name="ingestion_parser", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "item":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
+
+
+class EmbeddingStage:
+    """Embeds chunks of texts on a pool of workers, preserving chunk order.
+
+    Up to `max_in_flight` chunks are embedded concurrently while the caller
+    consumes (and bulk-indexes) earlier results.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, workers: int = 2,
+                 use_processes: bool = False, max_in_flight: int = 4):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.use_processes = use_processes
+        self.max_in_flight = max(1, max_in_flight)
+        self.executor = _get_executor(model_name, self.batch_size, self.workers, use_processes)
+
+    def _embed(self, texts: List[str]) -> Tuple[List[List[float]], float]:
+        start = time.time()
+        vectors = get_embedding_model(self.model_name, self.batch_size).embed_documents(texts)
+        return vectors, time.time() - start
+
+    def _submit(self, texts: List[str]):
+        if self.use_processes:
+            start = time.time()
+            future = self.executor.submit(_embed_in_worker, texts)
+            return future, start
+        return self.executor.submit(self._embed, texts), None
+
+    def map_ordered(self, chunks: Iterable[Tuple[List[str], Any]],
+                    metrics: Optional[IngestionMetrics] = None) -> Iterator[Tuple[Any, List[List[float]]]]:
+        """Yield (payload, embeddings) for each (texts, payload) chunk, in order.
+
+        Chunks with no texts are yielded with an empty embeddings list.
+        """
+        pending: deque = deque()
+
+        def collect():
+            payload, count, submitted = pending.popleft()
+            if submitted is None:
+                return payload, []
+            future, started = submitted
+            result = future.result()
+            if started is None:
+                vectors, seconds = result
+            else:
+                vectors, seconds = result, time.time() - started
+            if metrics is not None:
+                metrics.rows_embedded += count
+                metrics.embedding_seconds += seconds
+            return payload, vectors
+
+        try:
+            for texts, payload in chunks:
+                # Chunks with nothing to embed still pass through, in order
+                submitted = self._submit(texts) if texts else None
+                pending.append((payload, len(texts), submitted))
+                while len(pending) >= self.max_in_flight:
+                    yield collect()
+            while pending:
+                yield collect()
+        finally:
+            for _, _, submitted in pending:
+                if submitted is not None:
+                    submitted[0].cancel()
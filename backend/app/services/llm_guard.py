@@ -1,42 +1,126 @@
+import hashlib
 import re
-from typing import Tuple
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
 import httpx
 import json
+from app.core.config import settings
 from app.groq_config import get_groq_config
 from app.core.core_log import agent_logger as logger
+from app.utils.guard_scanner import GuardScanner
 
 SAFE_FALLBACK_MESSAGE = "Your request cannot be processed as written. Please rephrase or provide more context."
 
 
-def _contains_prompt_injection(text: str) -> bool:
-    patterns = [
+PROMPT_INJECTION = "prompt_injection"
+PII = "pii"
+TOXICITY = "toxicity"
+
+GUARD_PATTERNS = {
+    PROMPT_INJECTION: [
         r"ignore (all|any) (previous|prior) (instructions|rules)",
         r"disregard (the )?(system|previous) (prompt|message)",
         r"reveal (your )?(instructions|system prompt)",
         r"act as (an?|the) (exploiter|hacker|malicious)",
-    ]
-    return any(re.search(p, text, re.IGNORECASE) for p in patterns)
-
-
-def _contains_pii(text: str) -> bool:
-    patterns = [
+    ],
+    PII: [
         r"\b\d{3}-\d{2}-\d{4}\b",  # SSN-like
         r"\b\d{16}\b",               # 16-digit card (very naive)
         r"\b\d{3}[- ]?\d{3}[- ]?\d{4}\b",  # phone
         r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",  # email
-    ]
-    return any(re.search(p, text) for p in patterns)
-
-
-def _contains_toxicity(text: str) -> bool:
-    patterns = [
+    ],
+    TOXICITY: [
         r"\bkill\b",
         r"\bviolent\b",
         r"\bhate\b",
-        r"\bterror\w*\b", 
-    ]
-    return any(re.search(p, text, re.IGNORECASE) for p in patterns)
- 
+        r"\bterror\w*\b",
+    ],
+}
+
+# PII patterns are case-agnostic, so one case-insensitive scanner covers all three
+_scanner = GuardScanner(GUARD_PATTERNS, flags=re.IGNORECASE)
+
+
+def _contains_prompt_injection(text: str) -> bool:
+    return _scanner.search(text, PROMPT_INJECTION) is not None
+
+
+def _contains_pii(text: str) -> bool:
+    return _scanner.search(text, PII) is not None
+
+
+def _contains_toxicity(text: str) -> bool:
+    return _scanner.search(text, TOXICITY) is not None
+
+
+def _local_prompt_check(prompt: str) -> Tuple[bool, str]:
+    found = _scanner.categories_in(prompt)
+    if PROMPT_INJECTION in found:
+        return False, "Prompt injection detected"
+    if PII in found:
+        return False, "Potential PII detected in prompt"
+    if TOXICITY in found:
+        return False, "Toxic or harmful content in prompt"
+    return True, "ok"
+
+
+def _local_response_check(response: str) -> Tuple[bool, str]:
+    found = _scanner.categories_in(response)
+    if PII in found:
+        return False, "Potential PII detected in response"
+    if TOXICITY in found:
+        return False, "Toxic or harmful content in response"
+    return True, "ok"
+
+
+class _VerdictCache:
+    """LRU of remote guard verdicts keyed by a hash of (content type, text)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, content_type: str) -> str:
+        return hashlib.sha256(f"{content_type}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is not None:
+                self._entries.move_to_end(key)
+            return verdict
+
+    def set(self, key: str, verdict: Tuple[bool, str]) -> None:
+        with self._lock:
+            self._entries[key] = verdict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_verdicts = _VerdictCache(settings.llm_guard_cache_size)
+_guard_executor = ThreadPoolExecutor(max_workers=settings.llm_guard_workers, thread_name_prefix="llm_guard")
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> httpx.Client:
+    """Shared keep-alive client so guard calls reuse pooled connections."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=settings.llm_guard_timeout_seconds,
+                    limits=httpx.Limits(max_connections=settings.llm_guard_workers * 2,
+                                        max_keepalive_connections=settings.llm_guard_workers)
+                )
+    return _client
+
 
 def _llm_guard_check(text: str, content_type: str) -> Tuple[bool, str]:
     """Use configured LLM provider to check text safety. Returns (ok, reason)."""
@@ -73,7 +157,7 @@ def _llm_guard_check(text: str, content_type: str) -> Tuple[bool, str]:
             "temperature": 0.0,
             "max_tokens": 256
         }
-        resp = httpx.post(api_url, headers=headers, json=payload, timeout=20.0)
+        resp = _get_client().post(api_url, headers=headers, json=payload)
         resp.raise_for_status()
         data = resp.json()
         content = data["choices"][0]["message"]["content"].strip()
@@ -93,28 +177,54 @@ def _llm_guard_check(text: str, content_type: str) -> Tuple[bool, str]:
         logger.error(f"[LLM-GUARD] Error calling safety check: {e}")
         return True, f"guard_unavailable:{e}"
 
-def validate_prompt(prompt: str) -> Tuple[bool, str]:
-    ok, reason = _llm_guard_check(prompt, "prompt")
-    if ok:
-        # lightweight local checks as additional safety
-        if _contains_prompt_injection(prompt):
-            return False, "Prompt injection detected"
-        if _contains_pii(prompt):
-            return False, "Potential PII detected in prompt"
-        if _contains_toxicity(prompt):
-            return False, "Toxic or harmful content in prompt"
+def _cached_guard_check(text: str, content_type: str) -> Tuple[bool, str]:
+    """Remote guard verdict, memoized by text hash (guard outages are not cached)."""
+    key = _VerdictCache.key(text, content_type)
+    verdict = _verdicts.get(key)
+    if verdict is not None:
+        logger.debug(f"[LLM-GUARD] Cached {content_type} verdict")
+        return verdict
+    ok, reason = _llm_guard_check(text, content_type)
+    if ok and reason.startswith("guard_unavailable"):
         return True, "ok"
-    return False, reason
+    verdict = (True, "ok") if ok else (False, reason)
+    _verdicts.set(key, verdict)
+    return verdict
 
 
-def validate_response(response: str) -> Tuple[bool, str]:
-    ok, reason = _llm_guard_check(response, "response")
-    if ok:
-        if _contains_pii(response):
-            return False, "Potential PII detected in response"
-        if _contains_toxicity(response):
-            return False, "Toxic or harmful content in response"
-        return True, "ok"
-    return False, reason
+def _done(verdict: Tuple[bool, str]) -> Future:
+    future: Future = Future()
+    future.set_result(verdict)
+    return future
 
 
+def start_prompt_check(prompt: str) -> Future:
+    """Validate a prompt without blocking the caller.
+
+    The local regex tier runs inline and short-circuits blocked prompts; a
+    cached verdict is returned as an already-completed future. Otherwise the
+    remote guard call runs on the guard pool while the caller makes its main
+    LLM call, and the caller consults (or cancels) the future before
+    releasing the answer. The future resolves to (ok, reason).
+    """
+    ok, reason = _local_prompt_check(prompt)
+    if not ok:
+        return _done((ok, reason))
+    verdict = _verdicts.get(_VerdictCache.key(prompt, "prompt"))
+    if verdict is not None:
+        return _done(verdict)
+    return _guard_executor.submit(_cached_guard_check, prompt, "prompt")
+
+
+def validate_prompt(prompt: str) -> Tuple[bool, str]:
+    ok, reason = _local_prompt_check(prompt)
+    if not ok:
+        return False, reason
+    return _cached_guard_check(prompt, "prompt")
+
+
+def validate_response(response: str) -> Tuple[bool, str]:
+    ok, reason = _local_response_check(response)
+    if not ok:
+        return False, reason
+    return _cached_guard_check(response, "response")
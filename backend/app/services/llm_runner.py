@@ -1,16 +1,42 @@
 import httpx
+from typing import Optional
 from app.groq_config import get_groq_config
 from app.utils.agent_config_loader import get_agent_config
+from app.services.retry_scheduler import is_retryable_status, parse_retry_after
+from app.core.core_log import agent_logger as logger
 
-def real_agent_response(agent_name: str, input_text: str, model: str = "gemma2-9b-it") -> str:
+
+class LLMCallError(Exception):
+    """A failed LLM call; `retryable` and `retry_after` drive the chain's retry scheduler."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def build_agent_prompt(agent_name: str, input_text: str) -> str:
+    agent_cfg = get_agent_config(agent_name)
+    prompt_template = agent_cfg.get("prompt_template", "Analyze:\n\n{{input}}")
+    return prompt_template.replace("{{input}}", input_text)
+
+
+def real_agent_response(agent_name: str, input_text: str, model: str = "gemma2-9b-it",
+                        prompt: Optional[str] = None, max_tokens: int = 1000, json_mode: bool = False) -> str:
+    """Call the LLM for one agent; raises LLMCallError instead of returning an error string.
+
+    `prompt` is a prompt already rendered (and fitted to the token budget) by
+    the caller; by default it is built from the agent's template.
+    `json_mode` asks the provider for a single JSON object (structured output).
+    """
     try:
-        agent_cfg = get_agent_config(agent_name)
-        prompt_template = agent_cfg.get("prompt_template", "Analyze:\n\n{{input}}")
-        
         config = get_groq_config()
         # model = agent_cfg.get("model", config["model"])  # optional override
 
-        prompt = prompt_template.replace("{{input}}", input_text)
+        if prompt is None:
+            prompt = build_agent_prompt(agent_name, input_text)
 
         headers = {
             "Authorization": f"Bearer {config['api_key']}",
@@ -23,9 +49,11 @@ def real_agent_response(agent_name: str, input_text: str, model: str = "gemma2-9
                 {"role": "system", "content": "You are a specialized sub-agent in the EA-AURA AI system."},
                 {"role": "user", "content": prompt}
             ],
-            "max_tokens": 1000,
+            "max_tokens": max_tokens,
             "temperature": 0.7
         }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
 
         # 🔑 Correct dynamic URL
         api_url = f"{config['base_url'].rstrip('/')}/chat/completions"
@@ -46,8 +74,36 @@ def real_agent_response(agent_name: str, input_text: str, model: str = "gemma2-9
         return result["choices"][0]["message"]["content"]
         
     except httpx.HTTPStatusError as e:
-        print(f"[❌ LLM HTTP Error] {e.response.status_code}: {e.response.text}")
-        return f"[Error: HTTP {e.response.status_code}]"
-    except Exception as e:
-        print(f"[❌ LLM Error] {e}")
-        return "[Error: LLM call failed]"
+        status_code = e.response.status_code
+        retryable = is_retryable_status(status_code)
+        logger.warning(f"❌ LLM HTTP error for {agent_name}: {status_code}", extra={
+            "agent_id": agent_name,
+            "model": model,
+            "status_code": status_code,
+            "retryable": retryable,
+            "response_text": e.response.text[:500]
+        })
+        raise LLMCallError(
+            f"HTTP {status_code} from LLM",
+            status_code=status_code,
+            retryable=retryable,
+            retry_after=parse_retry_after(e.response.headers.get("Retry-After")),
+        ) from e
+    except (httpx.TimeoutException, httpx.TransportError) as e:
+        logger.warning(f"❌ LLM call failed for {agent_name}: {e.__class__.__name__}", extra={
+            "agent_id": agent_name,
+            "model": model,
+            "status_code": None,
+            "retryable": True,
+            "error": str(e)
+        })
+        raise LLMCallError(f"LLM call failed: {e.__class__.__name__}", retryable=True) from e
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning(f"❌ LLM response unusable for {agent_name}: {e}", extra={
+            "agent_id": agent_name,
+            "model": model,
+            "status_code": None,
+            "retryable": False,
+            "error": str(e)
+        })
+        raise LLMCallError(f"LLM call failed: {e}") from e
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.dao.agent_memory_dao import agent_memory_dao
 from app.dao.sub_agent_chain_dao import sub_agent_chain_dao
 from app.dao.token_usage_dao import save_token_usage
@@ -95,8 +95,8 @@ class MemoryManager:
    
     def save_sub_agent_chain(self, job_id: str, step: int, agent_name: str,
                            parent_agent: str, status: str, log: str,
-                           token_usage: Any, model_name: str) -> None:
-        """Save sub-agent chain information"""
+                           token_usage: Any, model_name: str, timing: Optional[Dict[str, Any]] = None) -> None:
+        """Save sub-agent chain information (plus per-attempt timing, when given)"""
         try:
             chain_data = {
                 "chain_id": f"{job_id}_{step}",
@@ -109,7 +109,8 @@ class MemoryManager:
                 "token_count": token_usage.total_tokens,
                 "input_tokens": token_usage.input_tokens,
                 "output_tokens": token_usage.output_tokens,
-                "model_name": model_name
+                "model_name": model_name,
+                **(timing or {})
             }
            
             self.sub_agent_chain_dao.save(chain_data)
@@ -5,8 +5,9 @@ from langchain.prompts import PromptTemplate
 from app.groq_config import get_groq_config
 from app.core.config import settings
 from app.core.core_log import agent_logger as logger
+from app.services.analysis_cache import analysis_cache, prompt_version, series_fingerprint
 import json
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, List, Optional, Union
 
 
 class NextStepAnalyser:
@@ -204,8 +205,24 @@ class NextStepAnalyser:
                 "error": f"Analysis failed: {str(e)}"
             }
 
-    def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Main analysis method"""
+    def cache_key(self, data: Dict[str, Any], tenant_id: Optional[str] = None) -> str:
+        """Fingerprint of the chart plus the prompt that analyses it."""
+        return series_fingerprint(
+            "next_step", tenant_id, data.get('title', 'Business Performance'), data.get('plot_type', 'Chart'),
+            data.get('x_values', []), data.get('y_values', []),
+            prompt_version(self.prompt.template, data.get('x_label', 'Time'), data.get('y_label', 'Value'))
+        )
+
+    def analyze(self, data: Dict[str, Any], tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Main analysis method; identical charts are served from the analysis cache"""
+        return analysis_cache.get_or_compute(
+            self.cache_key(data, tenant_id),
+            lambda: self._analyze(data),
+            kind="next_step",
+            tenant_id=tenant_id
+        )
+
+    def _analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             # Prepare data for analysis
             prepared_data = self._prepare_data_summary(data)
@@ -14,8 +14,11 @@ from openai import BadRequestError
 import traceback
 from typing import Dict, List, Optional, Tuple
 from app.services.es_cache import search_cache, save_to_cache, create_cache_index_if_not_exists
-from app.services.response_parser import parse_json_response, restructure_multimetric_data
+from app.services.response_parser import parse_json_response, restructure_multimetric_data, validate_fused_response
 from app.services.data_enhancer import get_enhanced_data_for_agent
+from app.services.prompt_budget import TokenBudgetExceeded, completion_reserve, fit_agent_prompt
+from app.services.llm_runner import real_agent_response
+from app.services.execution_planner import ExecutionPlanner, prefetch_executor
 from fuzzywuzzy import fuzz, process
 from functools import lru_cache
 
@@ -107,6 +110,14 @@ def select_best_subagent(parent_agent_data, user_input: str):
     return None
 
 
+def route_request(user_input: str):
+    """Parent agent and sub-agent for a request: (parent_name, parent_data, sub_agent)"""
+    parent_agent_name, parent_agent_data = match_parent_agent_by_keywords(user_input)
+    if not parent_agent_name:
+        return None, None, None
+    return parent_agent_name, parent_agent_data, select_best_subagent(parent_agent_data, user_input)
+
+
 def prepare_agent_prompt(agent_data: dict, input_text: str, enhanced_data: str) -> str:
     """Prepare agent prompt with template replacement"""
     prompt_template = agent_data.get("prompt_template", "Analyze this:\n\n{{input}}")
@@ -183,7 +194,16 @@ def execute_single_agent_fast(agent_name: str, agent_data: dict, input_text: str
         logger.info(f"✅ Cache hit for agent {agent_name}")
         return cached_response, None, {"cache_hit": True}
     
-    agent_prompt = prepare_agent_prompt(agent_data, input_text, enhanced_data)
+    # Fit retrieved context to the agent's token budget before paying for the call
+    try:
+        agent_prompt = fit_agent_prompt(agent_name, agent_data,
+                                        lambda context: prepare_agent_prompt(agent_data, input_text, context),
+                                        enhanced_data).prompt
+    except TokenBudgetExceeded as e:
+        return None, {
+            "error": f"Agent {agent_name} prompt does not fit its token budget.",
+            "details": str(e)
+        }, {"cache_hit": False}
     model = agent_data["llm_config"]["model"]
     config_list = get_llm_config_list(model)
     
@@ -249,23 +269,42 @@ def execute_single_agent_fast(agent_name: str, agent_data: dict, input_text: str
         }, {"cache_hit": False}
 
 
-def execute_sub_agent_fast(agent_name: str, sub_agent_config: dict, parent_agent: str, 
-                          input_text: str, job_id: str, tenant_id: str) -> Tuple[str, Optional[dict], dict]:
-    """Execute sub-agent optimized for speed"""
-    
+def prepare_sub_agent_context(agent_name: str, parent_agent: str, input_text: str,
+                              tenant_id: str) -> Tuple[str, str, Optional[str]]:
+    """Retrieve a sub-agent's data and look up its cached response: (enhanced_data, cache_key, cached_response)"""
     enhanced_data = get_enhanced_data_for_agent(parent_agent, input_text, tenant_id)
     enhanced_data_hash = get_enhanced_data_hash(enhanced_data)
     
     cache_key = create_cache_key(input_text, agent_name, enhanced_data_hash)
+    return enhanced_data, cache_key, search_cache(cache_key, tenant_id)
+
+
+def execute_sub_agent_fast(agent_name: str, sub_agent_config: dict, parent_agent: str, 
+                          input_text: str, job_id: str, tenant_id: str,
+                          prepared: Optional[Tuple[str, str, Optional[str]]] = None) -> Tuple[str, Optional[dict], dict]:
+    """Execute sub-agent optimized for speed; `prepared` is a prefetched prepare_sub_agent_context result"""
+    
+    enhanced_data, cache_key, cached_response = (
+        prepared or prepare_sub_agent_context(agent_name, parent_agent, input_text, tenant_id)
+    )
     
     # Quick cache check
-    cached_response = search_cache(cache_key, tenant_id)
     if cached_response:
         logger.info(f"✅ Cache hit for sub-agent {agent_name}")
         return cached_response, None, {"cache_hit": True}
     
     subagent_prompt_template = sub_agent_config["params"]["prompt_template"]
-    subagent_prompt = prepare_agent_prompt({"prompt_template": subagent_prompt_template}, input_text, enhanced_data)
+    try:
+        subagent_prompt = fit_agent_prompt(
+            agent_name, sub_agent_config,
+            lambda context: prepare_agent_prompt({"prompt_template": subagent_prompt_template}, input_text, context),
+            enhanced_data
+        ).prompt
+    except TokenBudgetExceeded as e:
+        return None, {
+            "error": f"Sub-agent {agent_name} prompt does not fit its token budget.",
+            "details": str(e)
+        }, {"cache_hit": False}
     
     subagent_model = sub_agent_config["llm_config"]["model"]
     subagent_config_list = get_llm_config_list(subagent_model)
@@ -337,7 +376,6 @@ def execute_parent_agent_fast(parent_agent_name: str, parent_agent_data: dict,
     """Execute parent agent optimized for speed"""
     
     parent_prompt_template = parent_agent_data.get("prompt_template", "Analyze this:\n\n{{input}}")
-    parent_prompt = parent_prompt_template.replace("{{input}}", subagent_response).replace("{{question}}", input_text)
     
     subagent_hash = get_enhanced_data_hash(subagent_response)
     cache_key = create_cache_key(input_text, f"{parent_agent_name}_parent", subagent_hash)
@@ -348,6 +386,18 @@ def execute_parent_agent_fast(parent_agent_name: str, parent_agent_data: dict,
         logger.info(f"✅ Cache hit for parent agent {parent_agent_name}")
         return cached_response, None, {"cache_hit": True}
     
+    try:
+        parent_prompt = fit_agent_prompt(
+            parent_agent_name, parent_agent_data,
+            lambda context: parent_prompt_template.replace("{{input}}", context).replace("{{question}}", input_text),
+            subagent_response
+        ).prompt
+    except TokenBudgetExceeded as e:
+        return None, {
+            "error": f"Parent agent {parent_agent_name} prompt does not fit its token budget.",
+            "details": str(e)
+        }, {"cache_hit": False}
+    
     parent_model = parent_agent_data["llm_config"]["model"]
     parent_config_list = get_llm_config_list(parent_model)
     
@@ -412,6 +462,100 @@ def execute_parent_agent_fast(parent_agent_name: str, parent_agent_data: dict,
         }, {"cache_hit": False}
 
 
+FUSED_PROMPT_TEMPLATE = """{sub_prompt}
+
+---
+In the same reply, also act as the analyst below and write the executive summary from the analysis you just produced.
+
+{parent_prompt}
+
+---
+Reply with ONE JSON object with exactly two keys:
+{{"analysis": <the JSON object specified in the first part>, "executive_summary": "<the executive summary as markdown text>"}}"""
+
+
+def execute_fused_agent_fast(parent_agent_name: str, parent_agent_data: dict, sub_agent_config: dict,
+                             input_text: str, job_id: str, tenant_id: str,
+                             prepared: Tuple[str, str, Optional[str]]) -> Optional[Tuple[str, str, dict]]:
+    """Run sub-agent and parent agent as one structured-output LLM call (parent "fused_mode").
+
+    Returns (sub_agent_response, parent_response, cache_info), or None when the
+    prompt doesn't fit, the call fails or the reply doesn't validate, in which
+    case the caller falls back to the two-step flow.
+    """
+    agent_name = sub_agent_config["agent_id"]
+    enhanced_data = prepared[0]
+    cache_key = create_cache_key(input_text, f"{parent_agent_name}_fused", get_enhanced_data_hash(enhanced_data))
+    model = parent_agent_data["llm_config"]["model"]
+
+    cached_response = search_cache(cache_key, tenant_id)
+    if cached_response:
+        try:
+            analysis, summary = validate_fused_response(cached_response, sub_agent_config)
+            logger.info(f"✅ Cache hit for fused agents {parent_agent_name}/{agent_name}")
+            return json.dumps(analysis), summary, {"cache_hit": True}
+        except ValueError:
+            pass
+
+    subagent_prompt_template = sub_agent_config["params"]["prompt_template"]
+    parent_prompt = (parent_agent_data.get("prompt_template", "Analyze this:\n\n{{input}}")
+                     .replace("{{input}}", "(the analysis object above)")
+                     .replace("{{question}}", input_text))
+    fused_cfg = {
+        "token_budget": parent_agent_data.get("token_budget"),
+        "llm_config": {"max_tokens": completion_reserve(sub_agent_config) + completion_reserve(parent_agent_data)}
+    }
+
+    try:
+        fused_prompt = fit_agent_prompt(
+            parent_agent_name, fused_cfg,
+            lambda context: FUSED_PROMPT_TEMPLATE.format(
+                sub_prompt=prepare_agent_prompt({"prompt_template": subagent_prompt_template}, input_text, context),
+                parent_prompt=parent_prompt
+            ),
+            enhanced_data
+        ).prompt
+        raw_response = real_agent_response(parent_agent_name, input_text, model=model, prompt=fused_prompt,
+                                           max_tokens=fused_cfg["llm_config"]["max_tokens"], json_mode=True)
+        analysis, summary = validate_fused_response(raw_response, sub_agent_config)
+    except Exception as e:
+        logger.warning(f"⚠️ Fused mode failed for {parent_agent_name}, falling back to two-step flow: {e}", extra={
+            "job_id": job_id,
+            "agent": parent_agent_name,
+            "sub_agent": agent_name
+        })
+        return None
+
+    # One call did the work of both agents; it is tracked against the parent
+    token_usage = token_tracker.track_agent_tokens(
+        agent_id=parent_agent_name,
+        input_text=fused_prompt,
+        output_text=raw_response,
+        model_name=model,
+        step=1
+    )
+
+    memory_manager.save_agent_memory(
+        agent_id=parent_agent_name,
+        job_id=job_id,
+        tenant_id=tenant_id,
+        step=1,
+        input_text=fused_prompt,
+        output_text=raw_response,
+        token_usage=token_usage,
+        model_name=model
+    )
+
+    cache_info = {
+        "cache_key": cache_key,
+        "response": raw_response,
+        "tenant_id": tenant_id,
+        "cache_hit": False
+    }
+
+    return json.dumps(analysis), summary, cache_info
+
+
 def process_background_caching(cache_infos: List[dict], workflow_cache_key: str, 
                               final_result: dict, tenant_id: str):
     """Process all caching operations in background"""
@@ -633,9 +777,20 @@ def run_individual_agent(input_text: str, tenant_id: str, agent_name: str, agent
 def run_autogen_agent(input_text: str, tenant_id: str):
     """Main orchestration function optimized for speed with deferred caching"""
     
-    # Quick cache check first
-    cached_result = execute_orchestrator_with_cache_fast(input_text, tenant_id)
+    # Workflow cache lookup, routing and the routed sub-agent's retrieval + cache lookup run
+    # concurrently; a workflow cache hit cancels the rest
+    planner = ExecutionPlanner(prefetch_executor)
+    planner.start("workflow_cache", execute_orchestrator_with_cache_fast, input_text, tenant_id)
+    routing = planner.start("routing", route_request, input_text)
+    if routing.exception() is None:
+        routed_parent, _, routed_subagent = routing.result()
+        if routed_subagent:
+            planner.start("sub_agent_context", prepare_sub_agent_context, routed_subagent["agent_id"],
+                          routed_parent, input_text, tenant_id)
+    
+    cached_result = planner.result("workflow_cache")
     if cached_result:
+        planner.cancel()
         return cached_result
     
     job_id = str(uuid.uuid4())
@@ -651,7 +806,7 @@ def run_autogen_agent(input_text: str, tenant_id: str):
 
     try:
         # Step 1: Match Parent Agent
-        parent_agent_name, parent_agent_data = match_parent_agent_by_keywords(input_text)
+        parent_agent_name, parent_agent_data, selected_subagent = planner.result("routing")
 
         if not parent_agent_name:
             general_agent = GeneralAgent()
@@ -685,8 +840,7 @@ def run_autogen_agent(input_text: str, tenant_id: str):
                 "token_usage": token_tracker.get_job_token_summary(job_id)
             }
 
-        # Step 2: Select Sub-Agent
-        selected_subagent = select_best_subagent(parent_agent_data, input_text)
+        # Step 2: Select Sub-Agent (picked during routing)
         if not selected_subagent:
             logger.error("❌ No sub-agent matched for selected parent agent.", extra={
                 "job_id": job_id, 
@@ -703,31 +857,50 @@ def run_autogen_agent(input_text: str, tenant_id: str):
             "sub_agent": selected_subagent["agent_id"]
         })
 
-        # Step 3: Execute Sub-Agent (fast)
-        subagent_response, error, subagent_cache_info = execute_sub_agent_fast(
-            selected_subagent["agent_id"], selected_subagent, parent_agent_name, 
-            input_text, job_id, tenant_id
-        )
-        if error:
-            return {"job_id": job_id, **error}
+        # Step 3: Execute Sub-Agent (fast), with its data and cache lookup already prefetched
+        prepared = planner.result("sub_agent_context")
+        logger.info("⚡ Pre-LLM phase completed", extra={
+            "job_id": job_id,
+            "timings_ms": planner.timings()
+        })
 
-        cache_infos.append(subagent_cache_info)
-        subagent_response_json = parse_json_response(subagent_response)
+        # Fused mode: one structured-output call for both agents, unless the sub-agent is already cached
+        fused = None
+        if parent_agent_data.get("fused_mode") and not prepared[2]:
+            fused = execute_fused_agent_fast(
+                parent_agent_name, parent_agent_data, selected_subagent,
+                input_text, job_id, tenant_id, prepared
+            )
 
-        # Step 4: Execute Parent Agent (fast)
-        logger.info("▶️ Executing parent agent", extra={
-            "job_id": job_id, 
-            "agent": parent_agent_name
-        })
+        if fused:
+            subagent_response, parent_response, fused_cache_info = fused
+            cache_infos.append(fused_cache_info)
+            subagent_response_json = parse_json_response(subagent_response)
+        else:
+            subagent_response, error, subagent_cache_info = execute_sub_agent_fast(
+                selected_subagent["agent_id"], selected_subagent, parent_agent_name, 
+                input_text, job_id, tenant_id, prepared=prepared
+            )
+            if error:
+                return {"job_id": job_id, **error}
+
+            cache_infos.append(subagent_cache_info)
+            subagent_response_json = parse_json_response(subagent_response)
+
+            # Step 4: Execute Parent Agent (fast)
+            logger.info("▶️ Executing parent agent", extra={
+                "job_id": job_id, 
+                "agent": parent_agent_name
+            })
         
-        parent_response, error, parent_cache_info = execute_parent_agent_fast(
-            parent_agent_name, parent_agent_data, subagent_response, 
-            input_text, job_id, tenant_id
-        )
-        if error:
-            return {"job_id": job_id, **error}
+            parent_response, error, parent_cache_info = execute_parent_agent_fast(
+                parent_agent_name, parent_agent_data, subagent_response, 
+                input_text, job_id, tenant_id
+            )
+            if error:
+                return {"job_id": job_id, **error}
 
-        cache_infos.append(parent_cache_info)
+            cache_infos.append(parent_cache_info)
 
         # Step 5: Orchestrator Agent Summary (fast)
         orchestrator_summary = (
@@ -802,6 +975,7 @@ def run_autogen_agent(input_text: str, tenant_id: str):
             "sub_agent": selected_subagent["agent_id"],
             "sub_agent_response": subagent_response_json,
             "final_response": parent_response,
+            "fused": bool(fused),
             "orchestrator_response": orchestrator_summary,
             "response": orchestrator_summary,
             "token_usage": token_summary,
@@ -1,22 +1,137 @@
 # backend/app/services/predictive_analysis.py
 
 import json
-import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import numpy as np
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+from app.core.config import settings
 from app.groq_config import get_groq_config
+from app.services.analysis_cache import analysis_cache, prompt_version, series_fingerprint
+from app.services.forecasting import Forecast, forecast_many, forecast_series
+from app.services.report_store import build_predictive_report, report_store
 from app.utils.agent_config_loader import get_all_predective_config
+from app.utils.keyword_matcher import KeywordSelector, normalize_keyword
 from app.core.core_log import logger
+from functools import lru_cache
 import re
 
 
+FORECAST_HORIZON = 5
+FORECAST_ENGINE_VERSION = "ets-v1"  # bump when the forecast output changes
+DEFAULT_PROMPT_KEY = "__default__"
+
+
+class PredictivePromptRegistry:
+    """Per-KPI prompt lookup, precompiled once.
+
+    Prompt keys are normalized up front and loaded into an Aho-Corasick
+    automaton (keyword_matcher.KeywordSelector), so matching a chart title is
+    a single scan over the title instead of a regex per key. Like the
+    original lookup, the first key (in config order) whose normalized form is
+    contained in the normalized title wins. PromptTemplates are compiled lazily and cached per key.
+    """
+
+    def __init__(self, prompts: Dict[str, str], default_prompt: str):
+        self.prompts = dict(prompts)
+        self.prompts[DEFAULT_PROMPT_KEY] = default_prompt
+        self._selector = KeywordSelector(prompts)
+        self._templates: Dict[str, PromptTemplate] = {}
+        self.key_for = lru_cache(maxsize=1024)(self._key_for)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Normalize KPI name by keeping only letters, removing everything else"""
+        return normalize_keyword(name)
+
+    def _key_for(self, title: str) -> str:
+        key = self._selector.select(title)
+        return DEFAULT_PROMPT_KEY if key is None else key
+
+    def template(self, key: str) -> PromptTemplate:
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates.setdefault(key, PromptTemplate.from_template(self.prompts[key]))
+        return template
+
+
 class PredictiveAnalysisAgent:
-    def __init__(self):
+    """Forecasts the next five months of a chart series.
+
+    The numbers come from the local ETS engine in app.services.forecasting
+    (Holt-Winters / Holt / SES chosen by history length, grid-searched on
+    MAPE, MAD-scaled P10/P90 bands). The LLM is only used, when enabled, to
+    write a short narrative for the popup.
+    """
+
+    def __init__(self, include_narrative: Optional[bool] = None):
+        self.include_narrative = (settings.predictive_llm_narrative
+                                  if include_narrative is None else include_narrative)
+        self._llms: Dict[int, Any] = {}
+        self._chains: Dict[str, LLMChain] = {}
+
+        narrative_prompt = """You are a business analyst. Explain this forecast to a business user in plain language.
+
+            Chart: {title} ({y_label} over {x_label})
+            Recent history (last 12 points): {recent_history}
+            Method: {method} (MAPE {mape}%)
+            Next 5 months: {predicted_dates}
+            P50 forecast: {p50}
+            P10 (cautious): {p10}
+            P90 (optimistic): {p90}
+            Seasonality index by month: {seasonality}
+
+            Return ONLY a JSON object using double quotes:
+            {{"intro": "one or two sentences on the expected direction", "bullets": ["up to three short, specific observations"]}}
+            """
+
+        # KPI-specific prompts from predictive_prompts.json can override the
+        # narrative; a custom prompt may answer with {"popup": {...}} instead.
+        # They were written to produce a whole forecast, so they get their own
+        # (larger) completion cap rather than the short narrative's.
+        self.prompts = PredictivePromptRegistry(self._load_prompts(), narrative_prompt)
+
+    def _load_prompts(self) -> Dict[str, str]:
+        """Load prompts from agent config loader"""
+        try:
+            prompts_data = get_all_predective_config()
+            if prompts_data and isinstance(prompts_data, dict):
+                logger.info("Loaded prompts from agent config", extra={
+                    "prompt_keys": list(prompts_data.keys()),
+                    "total_prompts": len(prompts_data)
+                })
+                return prompts_data
+            logger.warning("No prompts found in agent config, using default prompt only")
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading prompts from agent config: {str(e)}")
+            return {}
+
+    @staticmethod
+    def _max_tokens_for(key: str) -> int:
+        if key == DEFAULT_PROMPT_KEY:
+            return settings.predictive_narrative_max_tokens
+        return settings.predictive_custom_prompt_max_tokens
+
+    def _chain_for(self, title: str) -> LLMChain:
+        """LLMChain for the prompt matching `title`, built once per prompt key."""
+        key = self.prompts.key_for(title)
+        chain = self._chains.get(key)
+        if chain is None:
+            llm = self._llm_for(self._max_tokens_for(key))
+            chain = self._chains.setdefault(key, LLMChain(llm=llm, prompt=self.prompts.template(key)))
+        return chain
+
+    def _llm_for(self, max_tokens: int):
+        """Built lazily, once per completion cap: pure statistical forecasts never touch the LLM provider."""
+        llm = self._llms.get(max_tokens)
+        if llm is None:
+            llm = self._llms.setdefault(max_tokens, self._build_llm(max_tokens))
+        return llm
+
+    def _build_llm(self, max_tokens: int):
         groq_config = get_groq_config()
 
         if "pinguaicloud" in groq_config["base_url"]:
@@ -24,12 +139,12 @@ class PredictiveAnalysisAgent:
                 if not clean_base_url.endswith('/v1'):
                     clean_base_url += '/v1'
                 
-                self.llm = ChatOpenAI(
+                llm = ChatOpenAI(
                     api_key=groq_config["api_key"],
                     base_url=clean_base_url,
                     model=groq_config["model"],
                     temperature=0.2,
-                    max_tokens=4000
+                    max_tokens=max_tokens
                 )
                 logger.info(f"Using LM Studio with base_url: {clean_base_url}")
         elif "openrouter.ai" in groq_config["base_url"]:
@@ -38,228 +153,23 @@ class PredictiveAnalysisAgent:
                 if not clean_base_url.endswith('/v1'):
                     clean_base_url += '/v1'
                 
-                self.llm = ChatOpenAI(
+                llm = ChatOpenAI(
                     api_key=groq_config["api_key"],
                     base_url=clean_base_url,
                     model=groq_config["model"],
                     temperature=0.2,
-                    max_tokens=4000
+                    max_tokens=max_tokens
                 )
                 logger.info(f"Using OpenRouter with base_url: {clean_base_url}")
         else:
-            self.llm = ChatGroq(
+            llm = ChatGroq(
                 groq_api_key=groq_config["api_key"],
                 model_name=groq_config["model"],
                 temperature=0.2,
-                max_tokens=4000
+                max_tokens=max_tokens
             )
             logger.info("Using Groq API")
-
-        # Load dynamic prompts from JSON file
-        self.prompts_data = self._load_prompts()
-        
-        # Default fallback prompt (your original prompt)
-        self.default_prompt = """You are an expert data analyst specialized in time series forecasting and predictive analytics.
-
-            Given the following chart data, analyze the historical trends and predict the next 5 months using advanced statistical forecasting methods.
-
-            Historical Chart Data:
-            - Title: {title}
-            - Chart Type: {plot_type}
-            - X-axis (Dates): {x_values}
-            - Y-axis ({y_label}): {y_values}
-            - X-axis Label: {x_label}
-            - Y-axis Label: {y_label}
-            - Data Points (N): Count the data points to determine method
-
-            FORECASTING METHODOLOGY (choose by history length N):
-            - If N ≥ 24 months: Use Holt–Winters (ETS A,A,A) with m=12 (additive seasonality)
-            * Level: ℓ_t = α(y_t − s_{{t−m}}) + (1−α)(ℓ_{{t−1}}+b_{{t−1}})
-            * Trend: b_t = β(ℓ_t − ℓ_{{t−1}}) + (1−β)b_{{t−1}}
-            * Seasonality: s_t = γ(y_t − ℓ_t) + (1−γ)s_{{t−m}}
-            * Forecast h: ŷ_{{t+h}} = ℓ_t + h·b_t + s_{{t−m+h mod m}}
-
-            - If 12 ≤ N < 24: Use Holt's Linear (ETS A,A,N)
-            * Level: ℓ_t = αy_t + (1−α)(ℓ_{{t−1}}+b_{{t−1}})
-            * Trend: b_t = β(ℓ_t − ℓ_{{t−1}}) + (1−β)b_{{t−1}}
-            * Forecast h: ŷ_{{t+h}} = ℓ_t + h·b_t
-
-            - If N < 12: Use Simple Exponential Smoothing (ETS A,N,N)
-            * Level: ℓ_t = αy_t + (1−α)ℓ_{{t−1}}
-            * Forecast h: ŷ_{{t+h}} = ℓ_t
-
-            Hyperparameters: α, β, γ ∈ {{0.05, 0.10, ..., 0.50}}; choose set minimizing MAPE on the last 30% (time-ordered split).
-
-            UNCERTAINTY CALCULATION (next 5 months → h = 1,2,3,4,5):
-            - Point forecast = P50 (median forecast)
-            - Calculate residuals e_t = y_t − ŷ_t on fitted portion
-            - Robust scale σ = MAD × 1.4826
-            - σ_h = σ · sqrt(h)
-            - P10 = P50 − 1.2816·σ_h (10th percentile - cautious lower bound)
-            - P90 = P50 + 1.2816·σ_h (90th percentile - optimistic upper bound)
-
-            SEASONALITY INDEX:
-            - If N ≥ 24: For month M, index[M] = mean(sales for M) / overall mean(sales)
-            - Otherwise: Compute from last ≤12 months; if <6 months, use 5-month centered moving average
-            - Rescale indices so mean = 1.00
-
-            Instructions:
-            1. Determine appropriate forecasting method based on N (data length)
-            2. Apply the statistical method with optimized parameters
-            3. Generate exactly 5 future data points (next 5 months from last date)
-            4. Calculate P10, P50, P90 forecasts and maintain realistic values
-            5. The main prediction_result should use P50 values, but provide all variants
-
-            CRITICAL JSON FORMATTING RULES:
-            - Use ONLY double quotes for all strings, arrays, and object keys
-            - Never use single quotes anywhere in the JSON
-            - Ensure all arrays and objects are properly closed with matching brackets
-            - Do not include any text outside the JSON object
-
-            DATE GENERATION RULES:
-            - You MUST generate exactly 5 new dates, each one month after the previous date.
-            - Start from the last date in x_values.
-            - Use the same format as x_values (e.g., "YYYY-MM-DD").
-            - Example: if the last date is "2022-03-01", then the 5 new dates must be:
-            ["2022-04-01", "2022-05-01", "2022-06-01", "2022-07-01", "2022-08-01"].
-            - NEVER repeat the same month, and do not skip months.
-
-            VALUE GENERATION RULES:
-
-            - Generate 5 new P50 values based on the chosen forecasting method.
-
-            IMPORTANT: Return ONLY a valid JSON object in this exact format:
-
-            {{
-            "prediction_result": {{
-                "title": "ForecastP50",
-                "plotType": "{plot_type}",
-                "description": "Actual {title} vs most likely (p50) forecast for the next five months.",
-                "x": [all original dates + 5 new predicted dates of next five months],
-                "y": [all original values + 5 new P50 predicted values],
-                "xLabel": "{x_label}",
-                "yLabel": "{y_label}",
-                "prediction_metadata": {{
-                    "predicted_dates": [5 new dates (each 1 month apart, sequential after last x date)],
-                    "predicted_values": [5 new P50 values],
-                    "predicted_values_p10": [5 new P10 values],
-                    "predicted_values_p90": [5 new P90 values],
-                    "confidence_level": "high/medium/low",
-                    "trend_analysis": "Statistical forecast using [method_name] with MAPE: [value]% and optimized parameters",
-                }}
-            }},
-            "popup": {{
-                "title": "AI Statistical Forecast – {title} (Next 5 months)",
-                "subtitle": "What this advanced prediction means",
-                "intro": "This forecast uses statistical methods (determined by data length N) with uncertainty quantification and optimized parameters.",
-                "bullets": [
-                    "P50: most likely (median) forecast using optimal statistical method.",
-                ],
-                "howToUse": "Start with the P50 Forecast as your primary baseline for planning. The P50 represents the most likely outcome, meaning there is an equal 50% chance that actual results will be higher or lower than this forecast. Using P50 helps create a balanced and realistic plan without being overly optimistic or conservative."
-
-            }}
-            }}
-
-            Apply the appropriate statistical forecasting method and generate precise 5-month forecasts with uncertainty bands.
-            Historical Data Analysis:
-            """
-
-    def _load_prompts(self) -> Dict[str, str]:
-        """Load prompts from agent config loader"""
-        try:
-            # Get prompts from the config loader
-            prompts_data = get_all_predective_config()
-            
-            if prompts_data and isinstance(prompts_data, dict):
-                logger.info("Loaded prompts from agent config", extra={
-                    "prompt_keys": list(prompts_data.keys()),
-                    "total_prompts": len(prompts_data)
-                })
-                return prompts_data
-            else:
-                logger.warning("No prompts found in agent config, using default prompt only")
-                return {}
-                
-        except Exception as e:
-            logger.error(f"Error loading prompts from agent config: {str(e)}")
-            return {}
-    def _normalize_kpi_name(self, name: str) -> str:
-        """Normalize KPI name by keeping only letters, removing everything else"""
-        if not name:
-            return ""
-        return re.sub(r'[^a-z]', '', name.lower())
-
-    def _get_prompt_for_title(self, title: str) -> str:
-        """Get appropriate prompt based on normalized title matching"""
-        if not title or not self.prompts_data:
-            logger.info("Using default prompt (no title or no prompts loaded)")
-            return self.default_prompt
-            
-        # Normalize input title
-        normalized_input = self._normalize_kpi_name(title)
-        
-        logger.info(f"Looking for prompt match", extra={
-            "original_title": title,
-            "normalized_input": normalized_input,
-            "available_keys": list(self.prompts_data.keys())
-        })
-        
-        # Find matching prompt by normalized comparison
-        for prompt_key in self.prompts_data.keys():
-            normalized_key = self._normalize_kpi_name(prompt_key)
-            
-            # Exact match
-            if normalized_key == normalized_input:
-                logger.info(f"EXACT MATCH: '{prompt_key}' matches '{title}'")
-                return self.prompts_data[prompt_key]
-            
-            # Containment match (key contained in input)
-            if normalized_key and normalized_key in normalized_input:
-                logger.info(f"CONTAINMENT MATCH: '{prompt_key}' found in '{title}'")
-                return self.prompts_data[prompt_key]
-                
-        # No match found
-        logger.info(f"NO MATCH: Using default prompt for '{title}'")
-        return self.default_prompt
-
-    def _parse_date(self, date_str: str) -> datetime:
-        """Parse date string to datetime object"""
-        try:
-            return datetime.strptime(date_str, '%Y-%m-%d')
-        except ValueError:
-            try:
-                return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                # If parsing fails, try other common formats
-                formats = ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d']
-                for fmt in formats:
-                    try:
-                        return datetime.strptime(date_str, fmt)
-                    except ValueError:
-                        continue
-                raise ValueError(f"Unable to parse date: {date_str}")
-
-    def _generate_future_dates(self, last_date_str: str, num_months: int = 5) -> List[str]:
-        """Generate future dates based on the last date"""
-        try:
-            last_date = self._parse_date(last_date_str)
-            future_dates = []
-            
-            for i in range(1, num_months + 1):
-                # Add months (approximately 30 days each)
-                future_date = last_date + timedelta(days=30 * i)
-                future_dates.append(future_date.strftime('%Y-%m-%d'))
-            
-            return future_dates
-        except Exception as e:
-            logger.error(f"Error generating future dates: {str(e)}")
-            # Fallback: generate simple sequential dates
-            future_dates = []
-            base_date = datetime.now()
-            for i in range(1, num_months + 1):
-                future_date = base_date + timedelta(days=30 * i)
-                future_dates.append(future_date.strftime('%Y-%m-%d'))
-            return future_dates
+        return llm
 
     def _clean_json_response(self, response: str) -> str:
         """Clean and extract JSON from LLM response"""
@@ -298,8 +208,126 @@ class PredictiveAnalysisAgent:
         
         return json_str.strip()
 
+    def _build_popup(self, title: str, forecast: Forecast) -> Dict[str, Any]:
+        p50, p10, p90 = forecast.p50, forecast.p10, forecast.p90
+        params = ", ".join(f"{name}={value:.2f}" for name, value in forecast.params.items())
+        bullets = [
+            "P50: most likely (median) forecast using optimal statistical method.",
+            f"P10: cautious lower bound ({p10[0]:,.2f} next month, {p10[-1]:,.2f} in month {len(p10)}).",
+            f"P90: optimistic upper bound ({p90[0]:,.2f} next month, {p90[-1]:,.2f} in month {len(p90)}).",
+            f"Model: {forecast.method} ({params})"
+            + (f", holdout MAPE {forecast.mape}%." if forecast.mape is not None else "."),
+        ]
+        return {
+            "title": f"AI Statistical Forecast – {title} (Next {len(p50)} months)",
+            "subtitle": "What this advanced prediction means",
+            "intro": "This forecast uses statistical methods (determined by data length N) with uncertainty quantification and optimized parameters.",
+            "bullets": bullets,
+            "howToUse": "Start with the P50 Forecast as your primary baseline for planning. The P50 represents the most likely outcome, meaning there is an equal 50% chance that actual results will be higher or lower than this forecast. Using P50 helps create a balanced and realistic plan without being overly optimistic or conservative."
+        }
+
+    def _add_narrative(self, popup: Dict[str, Any], chart: Dict[str, Any], forecast: Forecast) -> None:
+        """Ask the LLM for a short intro + bullets; keeps the statistical popup on any failure."""
+        try:
+            chain = self._chain_for(chart["title"])
+            response = chain.run(
+                title=chart["title"],
+                plot_type=chart["plot_type"],
+                x_values=str(chart["x_values"]),
+                y_values=str(chart["y_values"]),
+                x_label=chart["x_label"],
+                y_label=chart["y_label"],
+                recent_history=str(chart["numeric_y"][-12:]),
+                method=forecast.method,
+                mape=forecast.mape,
+                predicted_dates=str(forecast.dates),
+                p50=str(forecast.p50),
+                p10=str(forecast.p10),
+                p90=str(forecast.p90),
+                seasonality=json.dumps(forecast.seasonality_index)
+            )
+            narrative = json.loads(self._clean_json_response(response) or "{}")
+            if isinstance(narrative.get("popup"), dict):
+                narrative = narrative["popup"]
+            if narrative.get("intro"):
+                popup["intro"] = narrative["intro"]
+            if isinstance(narrative.get("bullets"), list):
+                popup["bullets"] = popup["bullets"][:1] + [str(b) for b in narrative["bullets"][:3]] + popup["bullets"][1:]
+        except Exception as e:
+            logger.warning(f"Forecast narrative skipped: {str(e)}")
+
+    def cache_key(self, chart_data: Dict[str, Any], tenant_id: Optional[str] = None) -> str:
+        """Fingerprint of everything that shapes this chart's result."""
+        title = chart_data.get("title", "Prediction")
+        version = [FORECAST_ENGINE_VERSION, FORECAST_HORIZON, self.include_narrative]
+        if self.include_narrative:
+            key = self.prompts.key_for(str(title))
+            version.extend([self.prompts.prompts[key], self._max_tokens_for(key)])
+        return series_fingerprint(
+            "predictive", tenant_id, title, chart_data.get("plotType", "line"),
+            chart_data.get("x", []), chart_data.get("y", []), prompt_version(*version)
+        )
+
+    def _extract_chart(self, chart_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Pull the series out of chart_data; raises ValueError if it can't be forecast."""
+        x_values = chart_data.get("x", [])
+        y_values = chart_data.get("y", [])
+
+        # Validate input data
+        if not x_values or not y_values or len(x_values) != len(y_values):
+            raise ValueError("Invalid chart data: x and y arrays must be non-empty and of the same length")
+        try:
+            numeric_y = [float(v) for v in y_values]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid chart data: {str(e)}")
+
+        return {
+            "title": chart_data.get("title", "Prediction"),
+            "plot_type": chart_data.get("plotType", "line"),
+            "x_values": x_values,
+            "y_values": y_values,
+            "x_label": chart_data.get("xLabel", "Date"),
+            "y_label": chart_data.get("yLabel", "Value"),
+            "dates": [str(x) for x in x_values],
+            "numeric_y": numeric_y
+        }
+
+    def _build_result(self, chart: Dict[str, Any], forecast: Forecast) -> Dict[str, Any]:
+        params = ", ".join(f"{name}={value:.2f}" for name, value in forecast.params.items())
+        prediction_result = {
+            "title": "ForecastP50",
+            "plotType": chart["plot_type"],
+            "description": f"Actual {chart['title']} vs most likely (p50) forecast for the next five months.",
+            "x": list(chart["x_values"]) + forecast.dates,
+            "y": list(chart["y_values"]) + forecast.p50,
+            "xLabel": chart["x_label"],
+            "yLabel": chart["y_label"],
+            "prediction_metadata": {
+                "predicted_dates": forecast.dates,
+                "predicted_values": forecast.p50,
+                "predicted_values_p10": forecast.p10,
+                "predicted_values_p90": forecast.p90,
+                "confidence_level": forecast.confidence_level,
+                "trend_analysis": f"Statistical forecast using {forecast.method} with MAPE: "
+                                  f"{forecast.mape if forecast.mape is not None else 'n/a'}% and optimized parameters ({params})",
+                "method": forecast.method,
+                "parameters": forecast.params,
+                "mape": forecast.mape,
+                "seasonality_index": forecast.seasonality_index
+            }
+        }
+
+        popup = self._build_popup(chart["title"], forecast)
+        if self.include_narrative:
+            self._add_narrative(popup, chart, forecast)
+
+        return {
+            "prediction_result": prediction_result,
+            "popup": popup
+        }
+
     def predict_next_months(self, chart_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Main prediction function with dynamic prompts"""
+        """Main prediction function: local ETS forecast, optional LLM narrative"""
         try:
             logger.info("Starting predictive analysis", extra={
                 "chart_title": chart_data.get("title"),
@@ -307,88 +335,22 @@ class PredictiveAnalysisAgent:
                 "chart_type": chart_data.get("plotType")
             })
 
-            # Extract data from chart_data
-            title = chart_data.get("title", "Prediction")
-            plot_type = chart_data.get("plotType", "line")
-            x_values = chart_data.get("x", [])
-            y_values = chart_data.get("y", [])
-            x_label = chart_data.get("xLabel", "Date")
-            y_label = chart_data.get("yLabel", "Value")
-
-            # Validate input data
-            if not x_values or not y_values or len(x_values) != len(y_values):
-                return {
-                    "error": "Invalid chart data: x and y arrays must be non-empty and of the same length"
-                }
-
-            # Get the appropriate prompt based on title
-            selected_prompt = self._get_prompt_for_title(title)
-            
-            # Create prompt template with the selected prompt
-            prompt_template = PromptTemplate.from_template(selected_prompt)
-            
-            # Create chain with dynamic prompt
-            chain = LLMChain(llm=self.llm, prompt=prompt_template)
-            
-            
-            logger.info("Using dynamic prompt", extra={
-                "title": title,
-                "prompt_source": "custom" if selected_prompt != self.default_prompt else "default",
-                "prompt_length": len(selected_prompt)
-            })
-
-            # Run prediction with dynamic prompt
-            response = chain.run(
-                title=title,
-                plot_type=plot_type,
-                x_values=str(x_values),
-                y_values=str(y_values),
-                x_label=x_label,
-                y_label=y_label
-            )
-
-            logger.info("LLM prediction completed", extra={
-                "response_length": len(response),
-                "chart_title": title
-            })
-
-            # Clean and parse JSON response
-            cleaned_response = self._clean_json_response(response)
-
             try:
-                response_dict = json.loads(cleaned_response)
-
-                prediction_result = response_dict.get("prediction_result", {})
-                popup = response_dict.get("popup", {})
-
-                # Validate prediction_result structure
-                required_keys = ["title", "plotType", "x", "y", "xLabel", "yLabel"]
-                if not all(key in prediction_result for key in required_keys):
-                    return {
-                        "error": "LLM response is incomplete or invalid",
-                        "raw_response": response
-                    }
-
-                logger.info("Prediction completed successfully", extra={
-                    "total_data_points": len(prediction_result.get("x", [])),
-                    "predicted_points": 5,
-                    "confidence": prediction_result.get("prediction_metadata", {}).get("confidence_level", "medium")
-                })
-
-                return {
-                    "prediction_result": prediction_result,
-                    "popup": popup
-                }
+                chart = self._extract_chart(chart_data)
+                forecast = forecast_series(chart["dates"], chart["numeric_y"], horizon=FORECAST_HORIZON)
+            except ValueError as e:
+                return {"error": str(e)}
+
+            result = self._build_result(chart, forecast)
+
+            logger.info("Prediction completed successfully", extra={
+                "total_data_points": len(result["prediction_result"]["x"]),
+                "predicted_points": FORECAST_HORIZON,
+                "method": forecast.method,
+                "confidence": forecast.confidence_level
+            })
 
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing failed: {str(e)}", extra={
-                    "raw_response": response[:500],
-                    "cleaned_response": cleaned_response[:500]
-                })
-                return {
-                    "error": f"JSON parsing failed: {str(e)}",
-                    "raw_response": response
-                }
+            return result
 
         except Exception as e:
             logger.exception("Prediction failed", extra={
@@ -399,65 +361,109 @@ class PredictiveAnalysisAgent:
                 "error": f"Prediction failed: {str(e)}"
             }
 
+    def predict_many(self, charts: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Forecast a whole dashboard at once: {metric_key: chart_data} -> {metric_key: result}.
+
+        Identical series are forecast once, and the remaining ones are stacked
+        by forecast_many so they share the parameter grid search.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        extracted: Dict[str, Dict[str, Any]] = {}
+        unique: Dict[tuple, int] = {}
+        series: List[tuple] = []
+
+        for metric_key, chart_data in charts.items():
+            try:
+                chart = self._extract_chart(chart_data or {})
+            except ValueError as e:
+                results[metric_key] = {"error": str(e)}
+                continue
+            signature = (tuple(chart["dates"]), tuple(chart["numeric_y"]))
+            if signature not in unique:
+                unique[signature] = len(series)
+                series.append((chart["dates"], chart["numeric_y"]))
+            chart["series_index"] = unique[signature]
+            extracted[metric_key] = chart
+
+        try:
+            forecasts = forecast_many(series, horizon=FORECAST_HORIZON) if series else []
+        except Exception as e:
+            logger.exception("Batch prediction failed", extra={"error": str(e), "charts": len(charts)})
+            return {key: results.get(key, {"error": f"Prediction failed: {str(e)}"}) for key in charts}
+
+        for metric_key, chart in extracted.items():
+            results[metric_key] = self._build_result(chart, forecasts[chart["series_index"]])
+
+        logger.info("Batch prediction completed", extra={
+            "charts": len(charts),
+            "unique_series": len(series),
+            "failed": sum(1 for r in results.values() if "error" in r)
+        })
+        return {key: results[key] for key in charts}
+
 # Helper functions to maintain compatibility with existing code
-def get_predictive_analysis(chart_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Main function to get predictive analysis"""
-    agent = PredictiveAnalysisAgent()
-    return agent.predict_next_months(chart_data)
+_agents: Dict[bool, PredictiveAnalysisAgent] = {}
+
+
+def _get_agent(include_narrative: Optional[bool] = None) -> PredictiveAnalysisAgent:
+    """Reuse one agent (and its lazily built LLM client) per narrative setting."""
+    if include_narrative is None:
+        include_narrative = settings.predictive_llm_narrative
+    agent = _agents.get(include_narrative)
+    if agent is None:
+        agent = _agents.setdefault(include_narrative, PredictiveAnalysisAgent(include_narrative=include_narrative))
+    return agent
+
+
+def get_predictive_analysis(chart_data: Dict[str, Any], include_narrative: Optional[bool] = None,
+                            tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """Main function to get predictive analysis (cached per series fingerprint)"""
+    agent = _get_agent(include_narrative)
+    return analysis_cache.get_or_compute(
+        agent.cache_key(chart_data, tenant_id),
+        lambda: agent.predict_next_months(chart_data),
+        kind="predictive",
+        tenant_id=tenant_id
+    )
+
+
+def get_batch_predictive_analysis(charts: Dict[str, Dict[str, Any]],
+                                  include_narrative: Optional[bool] = None,
+                                  tenant_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Forecast many charts in one pass, keyed by metric; cached charts are skipped"""
+    agent = _get_agent(include_narrative)
+    results: Dict[str, Dict[str, Any]] = {}
+    keys: Dict[str, str] = {}
+    for metric_key, chart_data in charts.items():
+        keys[metric_key] = agent.cache_key(chart_data or {}, tenant_id)
+        cached = analysis_cache.get(keys[metric_key])
+        if cached is not None:
+            results[metric_key] = cached
+
+    misses = {metric_key: chart_data for metric_key, chart_data in charts.items() if metric_key not in results}
+    if misses:
+        for metric_key, result in agent.predict_many(misses).items():
+            if "error" not in result:
+                analysis_cache.set(keys[metric_key], result, kind="predictive", tenant_id=tenant_id)
+            results[metric_key] = result
+
+    logger.info("Batch prediction cache", extra={"charts": len(charts), "cache_hits": len(charts) - len(misses)})
+    return {metric_key: results[metric_key] for metric_key in charts}
 
 
 def generate_predictive_report(chart_data: Dict[str, Any], tenant_id: str, 
                              metric_key: str, chart_type: str) -> str:
-    """Generate a detailed predictive report and save to file"""
+    """Build a predictive report and hand it to the background report writer.
+
+    `chart_data` is what get_predictive_analysis returns ({"prediction_result",
+    "popup"}). Returns the path the report will be written to without waiting on disk;
+    list written reports with report_store.list_reports(tenant_id).
+    """
     try:
-        # Create reports directory
-        reports_dir = f"reports/{tenant_id}"
-        os.makedirs(reports_dir, exist_ok=True)
-        
-        # Generate report filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_filename = f"predictive_report_{metric_key}_{timestamp}.json"
-        report_path = os.path.join(reports_dir, report_filename)
-        
-        # Create detailed report
-        prediction_metadata = chart_data.get("prediction_metadata", {})
-        
-        report = {
-            "report_info": {
-                "tenant_id": tenant_id,
-                "metric_key": metric_key,
-                "chart_type": chart_type,
-                "generated_at": datetime.now().isoformat(),
-                "report_type": "predictive_analysis"
-            },
-            "analysis_summary": {
-                "title": chart_data.get("title"),
-                "total_data_points": len(chart_data.get("x", [])),
-                "historical_points": len(chart_data.get("x", [])) - 5,
-                "predicted_points": 5,
-                "confidence_level": prediction_metadata.get("confidence_level", "medium"),
-                "trend_analysis": prediction_metadata.get("trend_analysis", "Trend analysis performed")
-            },
-            "predicted_data": {
-                "dates": prediction_metadata.get("predicted_dates", []),
-                "values": prediction_metadata.get("predicted_values", []),
-                "methodology": "LLM-based trend analysis with fallback linear regression"
-            },
-            "chart_data": chart_data,
-            "recommendations": [
-                "Monitor actual vs predicted values for accuracy assessment",
-                "Consider external factors that may influence future trends",
-                "Update predictions monthly with new data points"
-            ]
-        }
-        
-        # Save report to file
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=2)
-        
-        logger.info(f"Predictive report saved: {report_path}")
+        report = build_predictive_report(chart_data, tenant_id, metric_key, chart_type)
+        report_path, _ = report_store.submit(tenant_id, metric_key, report)
         return report_path
         
     except Exception as e:
         logger.exception(f"Failed to generate predictive report: {str(e)}")
-        return f"Error generating report: {str(e)}"
\ No newline at end of file
+        return f"Error generating report: {str(e)}"
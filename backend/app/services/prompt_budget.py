@@ -0,0 +1,191 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+from app.core.core_log import agent_logger as logger
+
+# Completion tokens reserved when an agent's llm_config has no max_tokens
+# (matches the max_tokens real_agent_response sends by default)
+DEFAULT_COMPLETION_TOKENS = 1000
+TRUNCATION_MARKER = " …[truncated]"
+
+SECTION_HEADER = re.compile(r"^=== .+ ===$")
+# A retrieved hit: "Score: x | ..." or a compacted table row "x\t..." (see data_enhancer)
+SCORED_HIT = re.compile(r"^(?:Score: (-?\d+(?:\.\d+)?) \| |(-?\d+\.\d+)\t)")
+
+TokenCounter = Callable[[str], int]
+
+
+class TokenBudgetExceeded(ValueError):
+    """The prompt can't fit the agent's budget even without retrieved context."""
+    retryable = False
+    retry_after = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough count (about 4 characters per token) for when no tokenizer is available."""
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=1)
+def _tokenizer_counter() -> TokenCounter:
+    try:
+        from app.services.token_tracker import token_tracker
+        token_tracker.count_tokens_with_transformers("warm up")
+    except Exception as e:
+        logger.warning(f"⚠️ Tokenizer unavailable, estimating prompt tokens from length: {e}")
+        return estimate_tokens
+    return token_tracker.count_tokens_with_transformers
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens as counted by the (cached) tracking tokenizer."""
+    return _tokenizer_counter()(text or "")
+
+
+def completion_reserve(agent_cfg: dict) -> int:
+    return int((agent_cfg.get("llm_config") or {}).get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def prompt_token_limit(agent_cfg: dict, spent: int = 0) -> int:
+    """Tokens the prompt may use: the agent's remaining `token_budget` minus
+    the completion reserve, never more than AGENT_PROMPT_MAX_TOKENS."""
+    limit = settings.agent_prompt_max_tokens
+    token_budget = agent_cfg.get("token_budget")
+    if token_budget is not None:
+        limit = min(limit, int(token_budget) - int(spent) - completion_reserve(agent_cfg))
+    return limit
+
+
+@dataclass
+class _Block:
+    position: int
+    text: str
+    section: int
+    score: Optional[float] = None
+    tokens: int = 0
+
+
+def _blocks(context: str) -> List[_Block]:
+    blocks, section = [], 0
+    for position, line in enumerate(context.split("\n")):
+        if SECTION_HEADER.match(line):
+            section += 1
+        match = SCORED_HIT.match(line)
+        score = match and (match.group(1) or match.group(2))
+        blocks.append(_Block(position, line, section, float(score) if score else None))
+    return blocks
+
+
+def _truncate(text: str, max_tokens: int, count: TokenCounter) -> str:
+    """Cut `text` to about `max_tokens`, keeping its head."""
+    if max_tokens <= 0:
+        return ""
+    tokens = count(text)
+    if tokens <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / tokens)
+    while keep > 0:
+        cut = text[:keep].rstrip() + TRUNCATION_MARKER
+        if count(cut) <= max_tokens:
+            return cut
+        keep = int(keep * 0.9)
+    return ""
+
+
+def trim_context(context: str, max_tokens: int, count: TokenCounter = count_tokens) -> str:
+    """Fit retrieved context into `max_tokens`.
+
+    Context in the data enhancer's shape ("=== SECTION ===" headers over
+    "Score: x | text" hits or compacted "x<TAB>..." table rows) keeps its
+    headers and other lines, and then the best-scored hits, taking each
+    dataset's top hit before any dataset's second so every source stays
+    represented. Hits that don't fit are dropped; the remaining lines keep
+    their original order. Anything else is cut at the end.
+    """
+    if count(context) <= max_tokens:
+        return context
+    blocks = _blocks(context)
+    hits = [b for b in blocks if b.score is not None]
+    if not hits:
+        return _truncate(context, max_tokens, count)
+
+    kept = [b for b in blocks if b.score is None]
+    for b in blocks:
+        b.tokens = count(b.text) + 1
+    used = sum(b.tokens for b in kept)
+    if used > max_tokens:
+        return _truncate(context, max_tokens, count)
+
+    by_section = {}
+    for hit in sorted(hits, key=lambda b: -b.score):
+        by_section.setdefault(hit.section, []).append(hit)
+    rank = {hit.position: i for section_hits in by_section.values() for i, hit in enumerate(section_hits)}
+    ranked = sorted(hits, key=lambda b: (rank[b.position], -b.score))
+    for hit in ranked:
+        if used + hit.tokens <= max_tokens:
+            kept.append(hit)
+            used += hit.tokens
+    return "\n".join(b.text for b in sorted(kept, key=lambda b: b.position))
+
+
+@dataclass
+class FittedPrompt:
+    prompt: str
+    prompt_tokens: int
+    limit: int
+    trimmed: bool = False
+
+
+def fit_prompt(build: Callable[[str], str], context: str, limit: int,
+               count: TokenCounter = count_tokens) -> FittedPrompt:
+    """Render `build(context)` within `limit` tokens before any provider call.
+
+    If the full prompt is too large, the context is trimmed (see
+    trim_context) to what remains after the rest of the prompt. Raises
+    TokenBudgetExceeded when even the prompt without context is over the
+    limit, so the call is refused instead of paid for.
+    """
+    prompt = build(context)
+    tokens = count(prompt)
+    if tokens <= limit:
+        return FittedPrompt(prompt, tokens, limit)
+
+    overhead = count(build(""))
+    if overhead > limit:
+        raise TokenBudgetExceeded(f"Prompt needs {overhead} tokens without context; limit is {limit}")
+
+    room = limit - overhead
+    for _ in range(3):
+        trimmed = trim_context(context, room, count)
+        prompt = build(trimmed)
+        tokens = count(prompt)
+        if tokens <= limit:
+            return FittedPrompt(prompt, tokens, limit, trimmed=True)
+        # Per-line counts can undershoot the joined prompt slightly
+        room -= tokens - limit
+    prompt = build("")
+    return FittedPrompt(prompt, count(prompt), limit, trimmed=True)
+
+
+def fit_agent_prompt(agent_name: str, agent_cfg: dict, build: Callable[[str], str], context: str,
+                     spent: int = 0) -> FittedPrompt:
+    """fit_prompt against the agent's budget, logging when the context was trimmed."""
+    limit = prompt_token_limit(agent_cfg, spent)
+    try:
+        fitted = fit_prompt(build, context, limit)
+    except TokenBudgetExceeded as e:
+        logger.warning(f"🚫 Prompt refused before LLM call for {agent_name}: {e}", extra={
+            "agent_id": agent_name,
+            "token_limit": limit
+        })
+        raise
+    if fitted.trimmed:
+        logger.info(f"✂️ Trimmed context for {agent_name} to fit {limit} prompt tokens", extra={
+            "agent_id": agent_name,
+            "prompt_tokens": fitted.prompt_tokens,
+            "token_limit": limit
+        })
+    return fitted
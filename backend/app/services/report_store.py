@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.core_log import logger
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to compact stdlib json
+    orjson = None
+
+INDEX_FILENAME = "index.jsonl"
+
+
+def dumps_compact(obj: Any) -> bytes:
+    """Compact JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', str(value)) or "default"
+
+
+def build_predictive_report(chart_data: Dict[str, Any], tenant_id: str, metric_key: str,
+                            chart_type: str) -> Dict[str, Any]:
+    """The report document for one get_predictive_analysis result.
+
+    `chart_data` is {"prediction_result": ..., "popup": ...}; a bare
+    prediction_result is accepted too. Its "x" holds the historical points
+    followed by the predicted ones.
+    """
+    prediction = chart_data.get("prediction_result") or chart_data
+    prediction_metadata = prediction.get("prediction_metadata") or {}
+    predicted_dates = prediction_metadata.get("predicted_dates", [])
+    total_points = len(prediction.get("x", []))
+
+    return {
+        "report_info": {
+            "tenant_id": tenant_id,
+            "metric_key": metric_key,
+            "chart_type": chart_type,
+            "generated_at": datetime.now().isoformat(),
+            "report_type": "predictive_analysis"
+        },
+        "analysis_summary": {
+            "title": prediction.get("title"),
+            "total_data_points": total_points,
+            "historical_points": max(total_points - len(predicted_dates), 0),
+            "predicted_points": len(predicted_dates),
+            "confidence_level": prediction_metadata.get("confidence_level", "medium"),
+            "trend_analysis": prediction_metadata.get("trend_analysis", "Trend analysis performed")
+        },
+        "predicted_data": {
+            "dates": predicted_dates,
+            "values": prediction_metadata.get("predicted_values", []),
+            "methodology": prediction_metadata.get("method", "Exponential smoothing (ETS)")
+        },
+        "chart_data": chart_data,
+        "recommendations": [
+            "Monitor actual vs predicted values for accuracy assessment",
+            "Consider external factors that may influence future trends",
+            "Update predictions monthly with new data points"
+        ]
+    }
+
+
+class ReportStore:
+    """Writes predictive reports in the background and keeps a per-tenant index.
+
+    Each tenant directory holds the report files plus index.jsonl (one line of
+    metadata per report), which is what listing reads. After every write the
+    tenant is pruned to `max_per_tenant` reports no older than
+    `retention_days`. A single writer thread serializes all disk work, so
+    index updates never race.
+    """
+
+    def __init__(self, base_dir: str = "reports", retention_days: int = 30, max_per_tenant: int = 200):
+        self.base_dir = base_dir
+        self.retention_days = retention_days
+        self.max_per_tenant = max(1, max_per_tenant)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report_writer")
+        self._lock = threading.Lock()
+
+    def tenant_dir(self, tenant_id: str) -> str:
+        return os.path.join(self.base_dir, _safe_name(tenant_id))
+
+    def submit(self, tenant_id: str, metric_key: str, report: Dict[str, Any]) -> Tuple[str, Future]:
+        """Queue `report` for writing; returns its future path immediately."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"predictive_report_{_safe_name(metric_key)}_{timestamp}.json"
+        path = os.path.join(self.tenant_dir(tenant_id), filename)
+        entry = {
+            "filename": filename,
+            "metric_key": metric_key,
+            "created_at": time.time(),
+            "confidence_level": report.get("analysis_summary", {}).get("confidence_level"),
+        }
+        future = self._executor.submit(self._write, tenant_id, path, report, entry)
+        return path, future
+
+    def _write(self, tenant_id: str, path: str, report: Dict[str, Any], entry: Dict[str, Any]) -> str:
+        try:
+            directory = self.tenant_dir(tenant_id)
+            os.makedirs(directory, exist_ok=True)
+            payload = dumps_compact(report)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+            entry["size_bytes"] = len(payload)
+            with self._lock:
+                with open(os.path.join(directory, INDEX_FILENAME), "ab") as index:
+                    index.write(dumps_compact(entry) + b"\n")
+                self._prune(directory)
+            logger.info(f"Predictive report saved: {path}")
+            return path
+        except Exception as e:
+            logger.exception(f"Failed to write predictive report {path}: {str(e)}")
+            raise
+
+    def _read_index(self, directory: str) -> List[Dict[str, Any]]:
+        index_path = os.path.join(directory, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return []
+        entries = []
+        with open(index_path, "rb") as index:
+            for line in index:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def _prune(self, directory: str) -> None:
+        entries = self._read_index(directory)
+        cutoff = time.time() - self.retention_days * 86400
+        keep = [e for e in entries if e.get("created_at", 0) >= cutoff][-self.max_per_tenant:]
+        if len(keep) == len(entries):
+            return
+        kept = {e["filename"] for e in keep}
+        for entry in entries:
+            if entry["filename"] not in kept:
+                try:
+                    os.unlink(os.path.join(directory, entry["filename"]))
+                except FileNotFoundError:
+                    pass
+        tmp_index = os.path.join(directory, f"{INDEX_FILENAME}.tmp")
+        with open(tmp_index, "wb") as index:
+            for entry in keep:
+                index.write(dumps_compact(entry) + b"\n")
+        os.replace(tmp_index, os.path.join(directory, INDEX_FILENAME))
+
+    def list_reports(self, tenant_id: str, metric_key: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest-first report metadata for a tenant, read from its index."""
+        directory = self.tenant_dir(tenant_id)
+        with self._lock:
+            entries = self._read_index(directory)
+        if metric_key:
+            entries = [e for e in entries if e.get("metric_key") == metric_key]
+        entries = entries[::-1][:limit]
+        for entry in entries:
+            entry["path"] = os.path.join(directory, entry["filename"])
+            entry["created_at"] = datetime.fromtimestamp(entry["created_at"]).isoformat()
+        return entries
+
+
+report_store = ReportStore(
+    retention_days=settings.predictive_report_retention_days,
+    max_per_tenant=settings.predictive_report_max_per_tenant
+)
@@ -3,6 +3,7 @@ Response parsing and data restructuring utilities
 """
 import json
 import re
+from typing import Tuple
 
 
 def parse_json_response(raw_response: str):
@@ -34,6 +35,25 @@ def parse_json_response(raw_response: str):
         return {"response": raw_response, "error": "Could not parse JSON"}
 
 
+def validate_fused_response(raw_response: str, sub_agent_config: dict) -> Tuple[dict, str]:
+    """Return (analysis, executive_summary) from a fused reply, or raise ValueError."""
+    parsed = parse_json_response(raw_response)
+    if not isinstance(parsed, dict) or "error" in parsed:
+        raise ValueError("fused reply is not a JSON object")
+    analysis = parsed.get("analysis")
+    summary = parsed.get("executive_summary")
+    if not isinstance(analysis, dict) or not analysis:
+        raise ValueError("fused reply has no analysis object")
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("fused reply has no executive summary")
+    criteria = " ".join(sub_agent_config.get("success_criteria") or []).lower()
+    if "at least 2 charts" in criteria or "at least two charts" in criteria:
+        charts = [v for v in analysis.values() if isinstance(v, dict) and "plot_type" in v and "data" in v]
+        if len(charts) < 2:
+            raise ValueError(f"fused reply has {len(charts)} charts, sub-agent requires 2")
+    return analysis, summary
+
+
 def restructure_multimetric_data(response_json: dict) -> dict:
     """
     Dynamically splits the 'data' array into separate arrays,
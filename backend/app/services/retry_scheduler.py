@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.core_log import logger
+
+# Transient HTTP statuses; any other 4xx is the caller's fault and won't improve on retry
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def classify_error(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """Return (retryable, retry_after) for an attempt's exception.
+
+    Exceptions carrying a `retryable` attribute (LLMCallError, success
+    criteria failures) decide for themselves; timeouts and connection errors
+    are retryable; anything else is treated as fatal.
+    """
+    retryable = getattr(exc, "retryable", None)
+    if retryable is not None:
+        return bool(retryable), getattr(exc, "retry_after", None)
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True, None
+    return False, None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 1
+    base_delay: float = 0.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+
+    @classmethod
+    def from_config(cls, retry_cfg: Optional[dict], max_delay: Optional[float] = None) -> "RetryPolicy":
+        """Build a policy from an agent's `retry_policy` block.
+
+        `delay_seconds` is the first backoff; `backoff_multiplier`,
+        `max_delay_seconds` and `jitter` (fraction of each delay that is
+        randomized) are optional.
+        """
+        retry_cfg = retry_cfg or {}
+        return cls(
+            max_attempts=max(1, int(retry_cfg.get("max_attempts", 1))),
+            base_delay=max(0.0, float(retry_cfg.get("delay_seconds", 0))),
+            max_delay=max(0.0, float(retry_cfg.get("max_delay_seconds",
+                                                   max_delay if max_delay is not None else cls.max_delay))),
+            multiplier=max(1.0, float(retry_cfg.get("backoff_multiplier", cls.multiplier))),
+            jitter=min(1.0, max(0.0, float(retry_cfg.get("jitter", cls.jitter)))),
+        )
+
+    def next_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before attempt `attempt + 1`.
+
+        Exponential backoff capped at `max_delay`, with the top `jitter`
+        fraction randomized so parallel steps don't retry in lockstep. A
+        server's Retry-After is a lower bound and is always honoured.
+        """
+        backoff = min(self.max_delay, self.base_delay * self.multiplier ** max(0, attempt - 1))
+        backoff -= random.uniform(0, backoff * self.jitter)
+        if retry_after is not None:
+            return max(backoff, retry_after)
+        return backoff
+
+
+class RetryScheduler:
+    """Runs callbacks after a delay without parking a thread per waiting retry.
+
+    Due times sit in a heap watched by one timer thread; when a callback is
+    due it is handed to a small worker pool, so a step waiting on backoff
+    holds neither a chain worker nor an LLM slot.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = max(1, workers)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> None:
+        with self._cond:
+            self._ensure_started()
+            heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._seq), fn, args))
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent_retry")
+            self._thread = threading.Thread(target=self._run, name="agent-retry-timer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, fn, args = self._heap[0]
+                wait_for = due - time.monotonic()
+                if wait_for > 0:
+                    self._cond.wait(wait_for)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                self._executor.submit(fn, *args)
+            except Exception as e:
+                logger.error(f"❌ Failed to dispatch scheduled retry: {e}")
+
+
+retry_scheduler = RetryScheduler(workers=settings.agent_retry_workers)
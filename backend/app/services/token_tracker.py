@@ -1,10 +1,20 @@
 from datetime import datetime
 from typing import Dict, List
 from dataclasses import dataclass
+from functools import lru_cache
 from transformers import AutoTokenizer
 from app.core.core_log import agent_logger as logger
 
 
+@lru_cache(maxsize=8)
+def _load_tokenizer(model_name: str):
+    """Load a tokenizer once per model name; unknown models share the Llama-2 one."""
+    try:
+        return AutoTokenizer.from_pretrained(model_name)
+    except OSError:
+        return _load_tokenizer("NousResearch/Llama-2-7b-hf")
+
+
 @dataclass
 class TokenUsage:
     """Data class to track token usage for each agent"""
@@ -26,10 +36,7 @@ class TokenTracker:
     
     def count_tokens_with_transformers(self, text: str, model_name: str = "NousResearch/Llama-2-7b-hf") -> int:
         """Count tokens using transformers library"""
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-        except OSError:
-            tokenizer = AutoTokenizer.from_pretrained("NousResearch/Llama-2-7b-hf")
+        tokenizer = _load_tokenizer(model_name)
         tokens = tokenizer.encode(text, add_special_tokens=False)
         return len(tokens)
     
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.core_log import logger
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', str(value)) or "default"
+
+
+class TTSCache:
+    """Content-addressed store for narration summaries and synthesized audio.
+
+    Entries live under `base_dir/<tenant>/<sha256>.<suffix>` and are written
+    atomically (temp file + rename), so concurrent requests never see partial
+    files. A hit refreshes the file's mtime; once the store grows past
+    `max_bytes`, least recently used files are deleted across all tenants.
+
+    The directory is scanned once, on first use; after that a running byte
+    total and recency order are kept in memory and updated on every hit,
+    put and eviction, so writes don't walk the whole tree.
+    """
+
+    def __init__(self, base_dir: str = "temp_audio", max_bytes: int = 512 * 1024 * 1024):
+        self.base_dir = Path(base_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict] = None  # path -> size, least recently used first
+        self._total = 0
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def tenant_dir(self, tenant_id: str) -> Path:
+        path = self.base_dir / _safe_name(tenant_id)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def path(self, tenant_id: str, key: str, suffix: str) -> Path:
+        return self.tenant_dir(tenant_id) / f"{key}.{suffix}"
+
+    def get(self, tenant_id: str, key: str, suffix: str) -> Optional[Path]:
+        path = self.path(tenant_id, key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entries = self._index()
+            if path in entries:
+                entries.move_to_end(path)
+        return path
+
+    def get_text(self, tenant_id: str, key: str, suffix: str) -> Optional[str]:
+        path = self.get(tenant_id, key, suffix)
+        if path is None:
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:  # evicted in between
+            return None
+
+    def put(self, tenant_id: str, key: str, suffix: str, data: bytes) -> Path:
+        path = self.path(tenant_id, key, suffix)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            entries = self._index()
+            self._total += len(data) - entries.pop(path, 0)
+            entries[path] = len(data)
+            self._evict(keep=path)
+        return path
+
+    def put_text(self, tenant_id: str, key: str, suffix: str, text: str) -> Path:
+        return self.put(tenant_id, key, suffix, text.encode("utf-8"))
+
+    def _index(self) -> OrderedDict:
+        """The in-memory view of the store, built from one directory scan. Caller holds the lock."""
+        if self._entries is None:
+            files = []
+            for path in self.base_dir.glob("*/*"):
+                if path.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            self._entries = OrderedDict((path, size) for _, size, path in sorted(files))
+            self._total = sum(self._entries.values())
+        return self._entries
+
+    def _evict(self, keep: Path) -> None:
+        """Delete least recently used files until the store fits. Caller holds the lock."""
+        entries = self._index()
+        while self._total > self.max_bytes and entries:
+            path = next(iter(entries))
+            if path == keep:  # the file just written is the most recent; nothing older is left
+                break
+            self._total -= entries.pop(path)
+            try:
+                path.unlink()
+            except FileNotFoundError:  # already gone; it no longer counts either way
+                continue
+            logger.debug(f"TTS cache evicted {path}")
+
+
+tts_cache = TTSCache(base_dir=settings.tts_cache_dir, max_bytes=settings.tts_cache_max_bytes)
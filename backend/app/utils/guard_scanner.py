@@ -0,0 +1,90 @@
+# guard_scanner.py
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass(frozen=True)
+class GuardHit:
+    category: str
+    pattern: int  # index into the category's pattern list
+    span: Tuple[int, int]
+
+
+def _alternation(patterns: Sequence[str]) -> str:
+    """Non-capturing alternation with a shared leading \\b hoisted out.
+
+    `\\b(?:a|b)` lets the engine reject most positions with one boundary test
+    instead of trying every alternative; capturing groups would disable the
+    engine's fast paths, so the matching pattern is identified afterwards.
+    """
+    bounded = [p[2:] for p in patterns if p.startswith(r"\b")]
+    rest = [p for p in patterns if not p.startswith(r"\b")]
+    alternatives = [f"(?:{p})" for p in rest]
+    if bounded:
+        alternatives.insert(0, r"\b(?:" + "|".join(f"(?:{p})" for p in bounded) + ")")
+    return "|".join(alternatives)
+
+
+class GuardScanner:
+    """Scans a text for several categories of regex patterns in one pass.
+
+    All patterns are joined into a single alternation compiled once, so a
+    clean text -- the common case -- is read exactly once however many
+    patterns there are. Which category/pattern produced a match is resolved
+    only for the (rare) matches themselves.
+
+    The single pass reports non-overlapping matches, so a match of one
+    category can hide an overlapping one of another (e.g. a word inside an
+    email). When some categories hit but others didn't, only the missing
+    ones are re-checked, so results always equal searching each pattern
+    separately.
+    """
+
+    def __init__(self, categories: Dict[str, Sequence[str]], flags: int = 0):
+        self.categories: List[str] = list(categories)
+        self._patterns: List[Tuple[str, int, "re.Pattern"]] = [
+            (category, i, re.compile(pattern, flags))
+            for category, patterns in categories.items()
+            for i, pattern in enumerate(patterns)
+        ]
+        self._by_category: Dict[str, "re.Pattern"] = {
+            category: re.compile(_alternation(patterns), flags)
+            for category, patterns in categories.items() if patterns
+        }
+        all_patterns = [p for patterns in categories.values() for p in patterns]
+        self._combined = re.compile(_alternation(all_patterns), flags) if all_patterns else None
+
+    def scan(self, text: str) -> List[GuardHit]:
+        """Every category hit in `text`, with spans, ordered by position."""
+        if self._combined is None:
+            return []
+        hits = [self._identify(text, m) for m in self._combined.finditer(text)]
+        if hits:
+            found = {hit.category for hit in hits}
+            for category, regex in self._by_category.items():
+                if category not in found:
+                    hits.extend(self._identify(text, m, category) for m in regex.finditer(text))
+            hits.sort(key=lambda hit: hit.span)
+        return hits
+
+    def categories_in(self, text: str) -> Set[str]:
+        """Names of the categories with at least one hit in `text`."""
+        return {hit.category for hit in self.scan(text)}
+
+    def search(self, text: str, category: str) -> Optional[GuardHit]:
+        """First hit of a single category, or None."""
+        regex = self._by_category.get(category)
+        match = regex.search(text) if regex is not None else None
+        return self._identify(text, match, category) if match else None
+
+    def _identify(self, text: str, match: "re.Match", category: Optional[str] = None) -> GuardHit:
+        # The winning alternative is one of the patterns, matched on its own from the same start
+        start, end = match.span()
+        return next(
+            GuardHit(category=name, pattern=index, span=(start, end))
+            for name, index, regex in self._patterns
+            if (category is None or name == category)
+            and (candidate := regex.match(text, start)) is not None and candidate.end() == end
+        )
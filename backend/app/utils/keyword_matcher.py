@@ -0,0 +1,101 @@
+# keyword_matcher.py
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class AhoCorasick:
+    """Finds which of a fixed set of keywords occur inside a text in one scan.
+
+    Built once from the keywords; `find_all` is O(len(text) + matches)
+    regardless of how many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self.keywords: List[str] = []
+
+        for keyword in keywords:
+            self._add(keyword)
+        self._build_failure_links()
+
+    def _add(self, keyword: str) -> None:
+        index = len(self.keywords)
+        self.keywords.append(keyword)
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> List[int]:
+        """Indices (into `keywords`) of every keyword contained in `text`, sorted."""
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            found.update(self._output[node])
+        return sorted(found)
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Lowest keyword index contained in `text`, or None."""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+
+def normalize_keyword(name: str) -> str:
+    """Lower-case letters only: "Net Revenue (USD)" -> "netrevenueusd"."""
+    if not name:
+        return ""
+    return re.sub(r'[^a-z]', '', name.lower())
+
+
+class KeywordSelector:
+    """Picks the first key (in the given order) whose normalized form occurs in a normalized title.
+
+    Same answer as scanning the keys in order and taking the first exact or
+    contained match, but in one pass over the title. Keys with no letters
+    only match titles with none either, as they did in that scan.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        keys = list(keys)
+        self._keys = [key for key in keys if normalize_keyword(key)]
+        self._blank_key = next((key for key in keys if not normalize_keyword(key)), None)
+        self._matcher = AhoCorasick(normalize_keyword(key) for key in self._keys)
+
+    def select(self, title: str) -> Optional[str]:
+        if not title:
+            return None
+        normalized = normalize_keyword(title)
+        if not normalized:
+            return self._blank_key
+        index = self._matcher.first_match(normalized)
+        return None if index is None else self._keys[index]
@@ -0,0 +1,231 @@
+# upload_spool.py
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+FORM_FIELD_MAX_SIZE = 64 * 1024  # 64KB per text field
+FORM_OVERHEAD = 1024 * 1024  # room for text fields and part headers next to a file
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int, size: int):
+        self.limit = limit
+        self.size = size
+        super().__init__(f"File too large. Maximum size is {limit // (1024 * 1024)}MB")
+
+
+class InvalidUpload(Exception):
+    """The body is not a multipart form this endpoint can read."""
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    md5: str
+
+
+@dataclass
+class SpooledFile:
+    field_name: str
+    filename: str
+    size: int
+    upload: Optional[SpooledUpload]  # None when the file went over the size limit
+
+
+@dataclass
+class SpooledForm:
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: List[SpooledFile] = field(default_factory=list)
+
+    def get_files(self, field_name: str) -> List[SpooledFile]:
+        return [f for f in self.files if f.field_name == field_name]
+
+    def cleanup(self, keep: Optional[str] = None) -> None:
+        """Delete the spooled temp files, except `keep` (handed over to someone else)."""
+        for spooled in self.files:
+            if spooled.upload is not None and spooled.upload.path != keep:
+                try:
+                    os.unlink(spooled.upload.path)
+                except FileNotFoundError:
+                    pass
+
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.field_name = ""
+        self.filename: Optional[str] = None
+        self.data = bytearray()
+        self.file = None
+        self.path: Optional[str] = None
+        self.digest = hashlib.md5()
+        self.size = 0
+
+
+class _FormSpooler:
+    """python-multipart callbacks writing file parts straight to named temp files.
+
+    Callbacks run on the event loop and only queue file data; `flush` does
+    the disk writes (and MD5) in the threadpool between chunks of the body.
+    """
+
+    def __init__(self, charset: str, max_file_size: Optional[int], drain_oversized: bool):
+        self.charset = charset
+        self.max_file_size = max_file_size
+        self.drain_oversized = drain_oversized
+        self.parts: List[_Part] = []
+        self.pending = []
+        self._header_name = b""
+        self._header_value = b""
+
+    def _decode(self, value: bytes) -> str:
+        return value.decode(self.charset, errors="replace")
+
+    def on_part_begin(self) -> None:
+        self.parts.append(_Part())
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.parts[-1].headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        part = self.parts[-1]
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise InvalidUpload('The Content-Disposition header field "name" must be provided.')
+        part.field_name = self._decode(options[b"name"])
+        if b"filename" in options:
+            part.filename = os.path.basename(self._decode(options[b"filename"]))
+            part.file = tempfile.NamedTemporaryFile(delete=False, prefix="upload_",
+                                                    suffix=os.path.splitext(part.filename)[1])
+            part.path = part.file.name
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self.parts[-1]
+        chunk = data[start:end]
+        if part.filename is None:
+            if len(part.data) + len(chunk) > FORM_FIELD_MAX_SIZE:
+                raise InvalidUpload(f"Form field '{part.field_name}' is too large.")
+            part.data.extend(chunk)
+            return
+        part.size += len(chunk)
+        if self.max_file_size is not None and part.size > self.max_file_size:
+            if not self.drain_oversized:
+                raise UploadTooLarge(self.max_file_size, part.size)
+            # Keep counting the rest of this file, but stop storing it
+            self._discard(part)
+            return
+        if part.file is not None:
+            self.pending.append((part, chunk))
+
+    def flush(self) -> None:
+        for part, chunk in self.pending:
+            if part.file is not None:
+                part.digest.update(chunk)
+                part.file.write(chunk)
+        self.pending.clear()
+
+    def close(self) -> None:
+        for part in self.parts:
+            if part.file is not None:
+                part.file.close()
+
+    def _discard(self, part: _Part) -> None:
+        if part.file is not None:
+            part.file.close()
+            part.file = None
+        if part.path is not None:
+            try:
+                os.unlink(part.path)
+            except FileNotFoundError:
+                pass
+            part.path = None
+
+    def discard(self) -> None:
+        for part in self.parts:
+            self._discard(part)
+
+    def form(self) -> SpooledForm:
+        form = SpooledForm()
+        for part in self.parts:
+            if part.filename is None:
+                form.fields.setdefault(part.field_name, self._decode(bytes(part.data)))
+                continue
+            upload = None
+            if part.path is not None:
+                upload = SpooledUpload(path=part.path, size=part.size, md5=part.digest.hexdigest())
+            form.files.append(SpooledFile(field_name=part.field_name, filename=part.filename,
+                                          size=part.size, upload=upload))
+        return form
+
+
+async def spool_form(request: Request, max_file_size: Optional[int] = None, max_body_size: Optional[int] = None,
+                     drain_oversized: bool = False) -> SpooledForm:
+    """Read a multipart/form-data body from the request stream, spooling files to disk as they arrive.
+
+    Use it on routes that take the bare Request: declaring File()/Form()
+    parameters makes Starlette receive and spool the whole body before the
+    route runs. Here a Content-Length over `max_body_size` is refused
+    before any of the body is read, and both limits are checked as bytes
+    arrive. Each file is written once, straight to a named temp file, with
+    its MD5 (same digest as ExcelToElasticsearch.calculate_file_hash)
+    computed on the way through; memory stays at one network chunk.
+
+    A file over `max_file_size` raises UploadTooLarge, or with
+    `drain_oversized` is kept in the form with `upload=None` and its full
+    size, so batch endpoints can report it per file. The caller owns the
+    returned temp files (SpooledForm.cleanup); nothing is left behind if
+    parsing fails.
+    """
+    content_length = request.headers.get("content-length", "")
+    if max_body_size is not None and content_length.isdigit() and int(content_length) > max_body_size:
+        raise UploadTooLarge(max_body_size, int(content_length))
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise InvalidUpload("Expected a multipart/form-data body.")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+
+    spooler = _FormSpooler(charset, max_file_size, drain_oversized)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": spooler.on_part_begin,
+        "on_part_data": spooler.on_part_data,
+        "on_header_field": spooler.on_header_field,
+        "on_header_value": spooler.on_header_value,
+        "on_header_end": spooler.on_header_end,
+        "on_headers_finished": spooler.on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if max_body_size is not None and received > max_body_size:
+                raise UploadTooLarge(max_body_size, received)
+            parser.write(chunk)
+            if spooler.pending:
+                await run_in_threadpool(spooler.flush)
+        parser.finalize()
+        await run_in_threadpool(spooler.close)
+    except MultipartParseError as e:
+        spooler.discard()
+        raise InvalidUpload(f"Malformed multipart body: {e}") from e
+    except BaseException:
+        spooler.discard()
+        raise
+    return spooler.form()
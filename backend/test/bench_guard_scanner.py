@@ -0,0 +1,37 @@
+"""Micro-benchmark: llm_guard local checks, per-pattern re.search vs GuardScanner.
+
+Run from backend/:  PYTHONPATH=. python test/bench_guard_scanner.py
+"""
+import random
+import re
+import timeit
+
+from app.services.llm_guard import GUARD_PATTERNS, PROMPT_INJECTION, TOXICITY, _scanner
+
+WORDS = ("revenue growth churn margin forecast quarter pipeline customers retention "
+         "the of and to in for with is on that by this").split()
+
+
+def _response(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def _per_pattern(text: str) -> set:
+    found = set()
+    for category, patterns in GUARD_PATTERNS.items():
+        flags = re.IGNORECASE if category in (PROMPT_INJECTION, TOXICITY) else 0
+        if any(re.search(p, text, flags) for p in patterns):
+            found.add(category)
+    return found
+
+
+if __name__ == "__main__":
+    for n_words in (200, 2000, 20000):
+        text = _response(n_words)
+        assert _per_pattern(text) == _scanner.categories_in(text)
+        runs = max(10, 20000 // n_words)
+        before = min(timeit.repeat(lambda: _per_pattern(text), number=runs, repeat=5)) / runs
+        after = min(timeit.repeat(lambda: _scanner.categories_in(text), number=runs, repeat=5)) / runs
+        print(f"{len(text):>8} chars  per-pattern {before * 1e6:9.1f} us  "
+              f"scanner {after * 1e6:9.1f} us  x{before / after:.1f}")
@@ -0,0 +1,150 @@
+import time
+
+from app.services.agent_jobs import AgentJobQueue, AgentJobStore, InMemoryAgentJobStore, InMemoryJobBroker
+
+
+def _queue(handler, **kwargs):
+    options = dict(workers=2, lease_seconds=0.5, heartbeat_seconds=0.05, max_attempts=2)
+    options.update(kwargs)
+    return AgentJobQueue(store=InMemoryAgentJobStore(), broker=InMemoryJobBroker(), handler=handler, **options)
+
+
+def _wait_for(jobs, job_id, statuses=("COMPLETED", "FAILED"), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job stuck in {jobs.get(job_id)['status']}")
+
+
+def test_enqueue_returns_immediately_and_worker_completes_job():
+    jobs = _queue(lambda job, cancelled: time.sleep(0.3) or f"done: {job['input']}")
+    try:
+        job = jobs.enqueue("sales report", "tenant-a", ["SalesAgent"])
+        assert job["status"] == "QUEUED"
+        finished = _wait_for(jobs, job["job_id"])
+        assert finished["status"] == "COMPLETED"
+        assert finished["output"] == "done: sales report"
+        assert finished["attempts"] == 1 and finished["lease_expires_at"] is None
+    finally:
+        jobs.stop()
+
+
+def test_heartbeat_keeps_lease_for_long_running_job():
+    # The chain outlives several lease periods; heartbeats keep the reaper away
+    jobs = _queue(lambda job, cancelled: time.sleep(1.5) or "ok")
+    try:
+        job = jobs.enqueue("slow", "tenant-a", [])
+        assert _wait_for(jobs, job["job_id"])["attempts"] == 1
+    finally:
+        jobs.stop()
+
+
+def test_failed_chain_is_marked_failed():
+    def boom(job, cancelled):
+        raise RuntimeError("agent exploded")
+
+    jobs = _queue(boom)
+    try:
+        job = jobs.enqueue("x", "tenant-a", [])
+        finished = _wait_for(jobs, job["job_id"])
+        assert finished["status"] == "FAILED" and finished["error"] == "agent exploded"
+    finally:
+        jobs.stop()
+
+
+def test_expired_lease_is_requeued_then_failed():
+    jobs = _queue(lambda job, cancelled: "recovered")
+    store = jobs.store
+    store.create({"job_id": "j1", "tenant_id": "t", "status": "QUEUED", "input": "", "agent_chain": [], "attempts": 0})
+    # A worker that dies right after claiming never heartbeats
+    assert store.claim("j1", "dead-worker", lease_seconds=0.01) is not None
+    try:
+        jobs.start()
+        finished = _wait_for(jobs, "j1")
+        assert finished["status"] == "COMPLETED" and finished["output"] == "recovered"
+
+        store.create({"job_id": "j2", "tenant_id": "t", "status": "QUEUED", "input": "", "agent_chain": [], "attempts": 1})
+        store.claim("j2", "dead-worker", lease_seconds=0.01)
+        assert _wait_for(jobs, "j2")["status"] == "FAILED"
+    finally:
+        jobs.stop()
+
+
+def test_a_lost_lease_cancels_the_chain_and_writes_nothing():
+    seen = {}
+
+    def chain(job, cancelled):
+        # Another worker takes the job over while this one is still running it
+        jobs.store._jobs[job["job_id"]].update(worker_id="other-worker")
+        seen["cancelled"] = cancelled.wait(2)
+        return "stale result"
+
+    jobs = _queue(chain)
+    try:
+        job = jobs.enqueue("x", "tenant-a", [])
+        deadline = time.time() + 5
+        while "cancelled" not in seen and time.time() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.1)
+        assert seen["cancelled"] is True
+        current = jobs.get(job["job_id"])
+        assert current["status"] == "RUNNING" and current["worker_id"] == "other-worker"
+        assert current["output"] == ""
+    finally:
+        jobs.stop()
+
+
+def test_a_job_past_its_timeout_is_cancelled_and_failed():
+    def chain(job, cancelled):
+        assert cancelled.wait(2)
+        raise RuntimeError("stopped between steps")
+
+    jobs = _queue(chain, timeout_seconds=0.2)
+    try:
+        job = jobs.enqueue("x", "tenant-a", [])
+        finished = _wait_for(jobs, job["job_id"])
+        assert finished["status"] == "FAILED" and finished["error"] == "Agent job timed out after 0.2s"
+    finally:
+        jobs.stop()
+
+
+def test_claim_is_exclusive_while_lease_is_valid():
+    store = InMemoryAgentJobStore()
+    store.create({"job_id": "j", "status": "QUEUED", "attempts": 0})
+    assert store.claim("j", "w1", lease_seconds=10)["worker_id"] == "w1"
+    assert store.claim("j", "w2", lease_seconds=10) is None
+    assert not store.heartbeat("j", "w2", lease_seconds=10)
+    assert store.finish("j", "w1", "COMPLETED", output="x")
+    assert not store.finish("j", "w1", "FAILED")
+
+
+class _RecordingES:
+    """Just enough of an Elasticsearch client to watch the lease writes."""
+
+    def __init__(self, source):
+        self.source = source
+        self.request_options = {}
+        self.updates = []
+
+    def options(self, **kwargs):
+        client = _RecordingES(self.source)
+        client.request_options, client.updates = kwargs, self.updates
+        return client
+
+    def get(self, index, id):
+        return {"_source": dict(self.source), "_seq_no": 4, "_primary_term": 1}
+
+    def update(self, **kwargs):
+        self.updates.append((self.request_options, kwargs))
+
+
+def test_lease_writes_are_not_retried_by_the_transport():
+    store = AgentJobStore()
+    store._es = _RecordingES({"job_id": "j", "status": "QUEUED", "attempts": 0})
+    assert store.claim("j", "w1", lease_seconds=10)["worker_id"] == "w1"
+    (request_options, update), = store._es.updates
+    assert request_options == {"max_retries": 0}
+    assert (update["if_seq_no"], update["if_primary_term"]) == (4, 1)
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+from elasticsearch import NotFoundError
+
+import app.services.analysis_cache as analysis_cache_module
+from app.services.analysis_cache import ES_RETRY_AFTER_SECONDS, AnalysisCache
+
+
+class FakeES:
+    """An in-memory analysis_cache index that records what was asked of it."""
+
+    def __init__(self):
+        self.docs = {}
+        self.gets = 0
+        self.pruned = []
+        self.down = False
+        self.indices = SimpleNamespace(exists=lambda index: True, create=lambda index, body: None)
+
+    def get(self, index, id):
+        self.gets += 1
+        if self.down:
+            raise ConnectionError("es down")
+        if id not in self.docs:
+            raise NotFoundError("not found", meta=None, body={})
+        return {"_source": self.docs[id]}
+
+    def index(self, index, id, document):
+        if self.down:
+            raise ConnectionError("es down")
+        self.docs[id] = document
+
+    def delete_by_query(self, index, query, conflicts, wait_for_completion):
+        self.pruned.append(query["range"]["expires_at"]["lt"])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(analysis_cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _cache(es, **kwargs):
+    cache = AnalysisCache(ttl_seconds=100, prune_interval_seconds=1000, **kwargs)
+    cache._es = es
+    return cache
+
+
+def test_repeat_reads_are_served_in_process(clock):
+    es = FakeES()
+    cache = _cache(es)
+    cache.set("k", {"forecast": [1, 2]}, kind="predictive", tenant_id="t")
+
+    first = cache.get("k")
+    first["tenant_id"] = "decorated by the caller"
+    assert cache.get("k") == {"forecast": [1, 2]}
+    assert es.gets == 0
+    assert es.docs["k"]["kind"] == "predictive" and es.docs["k"]["expires_at"] == int(clock[0]) + 100
+
+
+def test_other_workers_read_through_elasticsearch(clock):
+    es = FakeES()
+    _cache(es).set("k", {"forecast": [1, 2]})
+
+    other = _cache(es)
+    assert other.get("k") == {"forecast": [1, 2]}
+    assert other.get("k") == {"forecast": [1, 2]}
+    assert es.gets == 1
+    assert other.get("missing") is None
+
+
+def test_entries_expire_and_expired_documents_are_pruned(clock):
+    es = FakeES()
+    cache = _cache(es)
+    cache.set("old", {"v": 1})
+    assert es.pruned == [int(clock[0])]
+
+    clock[0] += 101
+    assert cache.get("old") is None
+    assert _cache(es).get("old") is None  # expired in the index too
+
+    # Writes within the prune interval don't prune again
+    cache.set("new", {"v": 2})
+    assert len(es.pruned) == 1
+    clock[0] += 1000
+    cache.set("newer", {"v": 3})
+    assert es.pruned[-1] == int(clock[0]) and len(es.pruned) == 2
+
+
+def test_elasticsearch_outage_is_backed_off(clock):
+    es = FakeES()
+    cache = _cache(es)
+    es.down = True
+
+    assert cache.get("k") is None
+    assert cache.get("k") is None
+    cache.set("k", {"v": 1})
+    assert es.gets == 1 and es.docs == {}
+    assert cache.get("k") == {"v": 1}  # the in-process tier still works
+
+    es.down = False
+    clock[0] += ES_RETRY_AFTER_SECONDS + 1
+    assert cache.get("other") is None
+    assert es.gets == 2
+
+
+def test_get_or_compute_caches_results_but_not_errors(clock):
+    cache = _cache(FakeES())
+    results = iter([{"error": "no data"}, {"status": "error", "message": "bad"}, {"forecast": [3]}])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return next(results)
+
+    assert cache.get_or_compute("k", compute) == {"error": "no data"}
+    assert cache.get_or_compute("k", compute)["status"] == "error"
+    assert cache.get_or_compute("k", compute) == {"forecast": [3]}
+    assert cache.get_or_compute("k", compute) == {"forecast": [3]}
+    assert len(calls) == 3
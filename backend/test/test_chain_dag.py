@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future
+import time
+
+import pytest
+
+from app.services.chain_dag import build_nodes, merge_outputs, run_dag, sinks
+
+
+def test_plain_names_form_a_linear_chain():
+    nodes = build_nodes(["a", "b", "a"])
+    assert [(n.id, n.depends_on) for n in nodes] == [("a", []), ("b", ["a"]), ("a#2", ["b"])]
+    outputs = run_dag(nodes, "in", lambda node, text: f"{text}>{node.agent_name}")
+    assert outputs[sinks(nodes)[0]] == "in>a>b>a"
+
+
+def test_independent_agents_run_concurrently_and_merge():
+    nodes = build_nodes([
+        {"agent": "sales", "depends_on": []},
+        {"agent": "marketing", "depends_on": []},
+        {"agent": "summary", "depends_on": ["sales", "marketing"]},
+    ])
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def run(node, text):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        return text if node.agent_name == "summary" else '{"agent": "%s"}' % node.agent_name
+
+    start = time.time()
+    outputs = run_dag(nodes, "q", run, max_parallel=4)
+    assert peak[0] == 2 and time.time() - start < 0.55
+    assert outputs["summary"] == '{"sales": {"agent": "sales"}, "marketing": {"agent": "marketing"}}'
+
+
+def test_failed_node_passes_its_input_through():
+    nodes = build_nodes(["a", "broken", "c"])
+    outputs = run_dag(nodes, "in", lambda node, text: None if node.agent_name == "broken" else text + node.agent_name)
+    assert outputs["c"] == "inac"
+
+
+def test_invalid_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        build_nodes([{"agent": "a", "depends_on": ["missing"]}])
+    with pytest.raises(ValueError, match="cycle"):
+        build_nodes([{"agent": "a", "depends_on": ["b"]}, {"agent": "b", "depends_on": ["a"]}])
+
+
+def test_merge_outputs_single_passthrough():
+    assert merge_outputs({"a": "not json"}) == "not json"
+    assert merge_outputs({"a": "x", "b": "[1]"}) == '{"a": "x", "b": [1]}'
+
+
+def test_node_can_finish_later_through_a_future():
+    nodes = build_nodes(["retried", "after"])
+    deferred = Future()
+
+    def run(node, text):
+        if node.agent_name == "retried":
+            threading.Timer(0.1, deferred.set_result, args=(text + "+retry",)).start()
+            return deferred
+        return text + ">" + node.agent_name
+
+    assert run_dag(nodes, "in", run, max_parallel=1)["after"] == "in+retry>after"
@@ -0,0 +1,68 @@
+from app.services.data_enhancer import compact_context
+from app.services.prompt_budget import estimate_tokens, trim_context
+
+
+def _hit(score, row):
+    return f"Score: {score:.2f} | " + " | ".join(f"{col}: {value}" for col, value in row.items())
+
+
+SALES = [
+    {"row_id": 1, "region": "north", "currency": "USD", "revenue": 1200, "notes": "steady | no promo"},
+    {"row_id": 2, "region": "south", "currency": "USD", "revenue": 900, "notes": "promo"},
+    {"row_id": 3, "region": "south", "currency": "USD", "revenue": "900.0", "notes": "promo"},
+]
+
+
+def test_hits_become_a_table_with_shared_columns_hoisted():
+    context = "=== SALES DATA ===\n" + "\n".join(_hit(1.9 - i * 0.1, row) for i, row in enumerate(SALES))
+    compacted = compact_context(context, "Revenue by region?", max_tokens=1000)
+    assert compacted.splitlines() == [
+        "=== SALES DATA ===",
+        "All rows: currency=USD",
+        "score\tregion\trevenue\tnotes\tn",
+        "1.90\tnorth\t1200\tsteady | no promo\t1",
+        "1.80\tsouth\t900\tpromo\t2",
+    ]
+    assert estimate_tokens(compacted) < estimate_tokens(context) / 2
+
+
+def test_records_differing_only_in_their_id_are_counted_not_dropped():
+    # row_id 3 is a second south sale: hidden with the ID column, but still counted
+    context = "\n".join(_hit(1.0, row) for row in SALES[1:])
+    assert compact_context(context, "revenue?", max_tokens=1000).splitlines() == [
+        "All rows: region=south; currency=USD; notes=promo", "score\trevenue\tn", "1.00\t900\t2"]
+
+    # The same record retrieved twice is one record
+    context = "\n".join(_hit(1.0, row) for row in [SALES[0], SALES[1], SALES[1]])
+    table = compact_context(context, "revenue?", max_tokens=1000).splitlines()
+    assert table[1:] == ["score\tregion\trevenue\tnotes", "1.00\tnorth\t1200\tsteady | no promo",
+                         "1.00\tsouth\t900\tpromo"]
+
+
+def test_id_columns_stay_when_the_question_asks_for_them():
+    context = "\n".join(_hit(1.0, row) for row in SALES[:2])
+    assert compact_context(context, "which row id sold most?", max_tokens=1000).splitlines()[1].startswith(
+        "score\trow_id")
+
+
+def test_non_hit_text_passes_through():
+    assert compact_context("No relevant brand data found.", "brand?") == "No relevant brand data found."
+
+
+def test_table_rows_are_trimmed_by_score_per_dataset():
+    context = "\n".join(["=== A ===", "score\tx", "1.10\tlow", "1.90\thigh", "=== B ===", "score\tx", "1.50\tonly"])
+    assert trim_context(context, 60, len).splitlines() == [
+        "=== A ===", "score\tx", "1.90\thigh", "=== B ===", "score\tx", "1.50\tonly"]
+
+
+def test_time_series_rows_are_not_collapsed():
+    metrics = [f"m{i}" for i in range(9)]
+    rows = [
+        {"day": "2024-01-01", **{m: 5 for m in metrics}, "revenue": 1234567},
+        {"day": "2024-01-02", **{m: 5 for m in metrics}, "revenue": 1234599},
+        {"day": "2024-01-02", **{m: 5 for m in metrics}, "revenue": 1234599},
+        {"day": "2024-01-03", **{m: 7 for m in metrics}, "revenue": 1},
+    ]
+    context = "\n".join(_hit(1.0 - i * 0.1, row) for i, row in enumerate(rows))
+    table = compact_context(context, "daily revenue", max_tokens=1000).splitlines()
+    assert [line.split("\t")[1] for line in table] == ["day", "2024-01-01", "2024-01-02", "2024-01-03"]
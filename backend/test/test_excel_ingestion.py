@@ -0,0 +1,166 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.services.excel_to_elasticsearch import ExcelToElasticsearch
+from app.services.ingestion_pipeline import IngestionMetrics
+
+
+def _workbook(path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "orders"
+    sheet.append(["order id", "qty", "price", "region", "placed"])
+    for i in range(9):
+        # a blank qty in one row makes pandas type that chunk's column as float
+        sheet.append([i, None if i == 4 else i * 3, 9.99 + i, f"r{i % 3}", datetime(2024, 1, i + 1)])
+    sheet.append([20, 6, 12.5, "r0", datetime(2024, 2, 1)])
+    sheet.append([20, 6, 12.5, "r0", datetime(2024, 2, 1)])
+    workbook.save(path)
+
+
+def _ingester(chunk_size):
+    ingester = ExcelToElasticsearch.__new__(ExcelToElasticsearch)
+    ingester.index_name = "agent_dataset"
+    ingester.sub_index = "orders"
+    ingester.tenant_id = "tenant-1"
+    ingester.embedding_model_name = "all-MiniLM-L6-v2"
+    ingester.chunk_size = chunk_size
+    ingester.batch_size = 100
+    return ingester
+
+
+def _documents(path, chunk_size):
+    stats = {"total_rows": 0, "processed_rows": 0, "unchanged_rows": 0, "sheets": set()}
+    docs = []
+    for _, (new_docs, _) in _ingester(chunk_size)._iter_chunk_documents(
+            str(path), "file-hash", 0, stats, IngestionMetrics(), {}):
+        docs.extend(new_docs)
+    return docs
+
+
+def test_document_ids_do_not_depend_on_chunk_size(tmp_path):
+    path = tmp_path / "orders.xlsx"
+    _workbook(path)
+
+    small, large = _documents(path, 2), _documents(path, 500)
+
+    assert [d["_id"] for d in small] == [d["_id"] for d in large]
+    assert len({d["_id"] for d in small}) == 11
+    # The first chunk fixes the sheet's dtypes: qty is int in 2-row chunks
+    # (no blank yet), float over the whole sheet; the values are the same
+    assert [d["row_data"] for d in small] == [d["row_data"] for d in large]
+    assert len({str(d["data_types"]) for d in small}) == 1
+    assert small[5]["row_data"]["qty"] == 15 and isinstance(small[5]["row_data"]["qty"], int)
+
+
+def _baseline_workbook(path):
+    workbook = Workbook()
+    mixed = workbook.active
+    mixed.title = "mixed"
+    mixed.append(["id", "units", "price", "name", "shipped"])
+    # Blanks sit in the first chunk, which fixes the sheet's dtypes like a whole-sheet read does
+    mixed.append([1, 4, 2.5, "alpha", datetime(2024, 1, 1)])
+    mixed.append([None, None, None, None, None])
+    mixed.append([3, None, None, None, datetime(2024, 1, 3, 12, 30)])
+    mixed.append([4, 6, 3.75, "beta", None])
+    mixed.append([5, 8, 4, "none", datetime(2024, 1, 5)])
+    mixed.append([6, 9, 5.5, "gamma", datetime(2024, 1, 6)])
+    mixed.append([7, 10, 6, "delta", datetime(2024, 1, 7)])
+    numbers = workbook.create_sheet("numbers")
+    numbers.append(["count", "ratio"])
+    for i in range(5):
+        numbers.append([i, i / 4])
+    workbook.save(path)
+
+
+def _baseline_documents(path):
+    """What the original whole-sheet ingestion produced: read_excel, fillna(""), iterrows."""
+    ingester = _ingester(500)
+    docs = []
+    for sheet_name, df in pd.read_excel(path, sheet_name=None).items():
+        df = df.fillna("")
+        df.columns = [str(c).strip().replace('.', '_').replace(' ', '_') for c in df.columns]
+        data_types = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        for idx, row in df.iterrows():
+            row_dict = {}
+            for col, val in row.items():
+                cleaned_val = ingester.clean_data_for_elasticsearch(val)
+                if cleaned_val not in [None, '', 'nan']:
+                    row_dict[col] = cleaned_val
+            combined = " | ".join(f"{k}: {v}" for k, v in row_dict.items())
+            if combined.strip():
+                docs.append((sheet_name, int(idx), json.dumps(row_dict), combined, data_types))
+    return docs
+
+
+@pytest.mark.parametrize("chunk_size", [3, 500])
+def test_documents_match_the_row_by_row_baseline(tmp_path, chunk_size):
+    path = tmp_path / "baseline.xlsx"
+    _baseline_workbook(path)
+
+    docs = [(d["sheet_name"], d["row_id"], json.dumps(d["row_data"]), d["combined_text"], d["data_types"])
+            for d in _documents(path, chunk_size)]
+
+    assert docs == _baseline_documents(path)
+
+
+def test_row_hash_ignores_number_formatting():
+    assert ExcelToElasticsearch.calculate_row_hash([("qty", 7), ("price", 2.5)]) == \
+        ExcelToElasticsearch.calculate_row_hash([("qty", 7.0), ("price", 2.50)])
+    assert ExcelToElasticsearch.calculate_row_hash([("qty", None)]) == \
+        ExcelToElasticsearch.calculate_row_hash([("qty", float("nan"))])
+    assert ExcelToElasticsearch.calculate_row_hash([("qty", 7)]) != \
+        ExcelToElasticsearch.calculate_row_hash([("qty", 7.5)])
+
+
+def _offline_ingester(monkeypatch, marker=None, indexed=0, existing=None):
+    """An ingester whose Elasticsearch calls are recorded instead of sent."""
+    ingester = _ingester(500)
+    calls = {"bulk": [], "markers": [], "generated": 0}
+
+    def stream_bulk(actions, batch_size=100, metrics=None):
+        actions = list(actions)
+        calls["bulk"].append(actions)
+        return {"indexed_documents": len(actions), "failed_documents": 0}
+
+    def generate_actions(file_path, file_hash, header_row, stats, metrics, existing):
+        calls["generated"] += 1
+        return iter(())
+
+    monkeypatch.setattr(ingester, "create_index", lambda: True)
+    monkeypatch.setattr(ingester, "read_completion_marker", lambda: marker)
+    monkeypatch.setattr(ingester, "clear_completion_marker", lambda: calls["markers"].append(None))
+    monkeypatch.setattr(ingester, "write_completion_marker",
+                        lambda file_hash, row_count: calls["markers"].append((file_hash, row_count)))
+    monkeypatch.setattr(ingester, "count_documents", lambda: indexed)
+    monkeypatch.setattr(ingester, "get_existing_documents", lambda: dict(existing or {}))
+    monkeypatch.setattr(ingester, "_generate_actions", generate_actions)
+    monkeypatch.setattr(ingester, "_stream_bulk", stream_bulk)
+    return ingester, calls
+
+
+def test_stale_rows_survive_a_workbook_that_yields_nothing(monkeypatch, tmp_path):
+    ingester, calls = _offline_ingester(monkeypatch, existing={"old-id": "old-hash"})
+
+    with pytest.raises(Exception, match="No valid documents"):
+        ingester.process_excel(str(tmp_path / "empty.xlsx"), file_hash="new-hash")
+    assert calls["bulk"] == [[]]
+    assert calls["markers"] == [None]
+
+
+def test_completed_file_is_skipped_only_when_the_count_agrees(monkeypatch, tmp_path):
+    marker = {"file_hash": "same-hash", "row_count": 11}
+
+    ingester, calls = _offline_ingester(monkeypatch, marker=marker, indexed=11)
+    assert ingester.process_excel(str(tmp_path / "orders.xlsx"), file_hash="same-hash")["skipped"] is True
+    assert calls["generated"] == 0
+
+    # e.g. an earlier run of this file died half way: ingest it again
+    ingester, calls = _offline_ingester(monkeypatch, marker=marker, indexed=7)
+    with pytest.raises(Exception, match="No valid documents"):
+        ingester.process_excel(str(tmp_path / "orders.xlsx"), file_hash="same-hash")
+    assert calls["generated"] == 1
@@ -0,0 +1,39 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.execution_planner import ExecutionPlanner
+
+
+def test_steps_run_concurrently_and_report_timings():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        planner = ExecutionPlanner(executor)
+        start = time.perf_counter()
+        planner.start("cache", lambda: time.sleep(0.2) or None)
+        planner.start("retrieval", lambda query: time.sleep(0.2) or f"rows for {query}", "sales")
+        assert planner.result("retrieval") == "rows for sales" and planner.result("cache") is None
+        assert time.perf_counter() - start < 0.35
+        assert set(planner.timings()) == {"cache", "retrieval"} and planner.timings()["cache"] >= 200
+
+
+def test_cancel_drops_steps_that_have_not_started():
+    release = threading.Event()
+    ran = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        planner = ExecutionPlanner(executor)
+        planner.start("blocking", release.wait)
+        queued = planner.start("speculative", ran.append, "ran")
+        planner.cancel()
+        release.set()
+    assert queued.cancelled() and ran == []
+
+
+def test_step_errors_surface_from_result():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        planner = ExecutionPlanner(executor)
+        planner.start("routing", lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            planner.result("routing")
+        assert planner.timings()["routing"] is not None
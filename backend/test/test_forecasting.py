@@ -0,0 +1,59 @@
+from app.services.forecasting import _grid, _holt_winters, forecast_many, forecast_series, future_dates
+import numpy as np
+
+
+def _reference_holt_winters(y, alpha, beta, gamma, m=12, horizon=5):
+    level = y[:m].mean()
+    trend = (y[m:2 * m].mean() - level) / m
+    season = list(y[:m] - level)
+    fitted = []
+    for t in range(m, len(y)):
+        s_prev = season[t - m]
+        fitted.append(level + trend + s_prev)
+        prev_level = level
+        level = alpha * (y[t] - s_prev) + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+        season.append(gamma * (y[t] - level) + (1 - gamma) * s_prev)
+    forecast = [level + h * trend + season[len(y) - m + (h - 1) % m] for h in range(1, horizon + 1)]
+    return np.array(fitted), np.array(forecast)
+
+
+def test_batched_holt_winters_matches_reference():
+    rng = np.random.default_rng(0)
+    t = np.arange(36)
+    y = 100 + 2 * t + 10 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 2, len(t))
+    grid = _grid(3)
+    Y = np.stack([y, y[::-1]])
+    fitted, steps, start = _holt_winters(Y, grid)
+    for series, values in enumerate(Y):
+        for row in (0, 437, len(grid) - 1):
+            ref_fitted, ref_forecast = _reference_holt_winters(values, *grid[row])
+            assert np.allclose(fitted[series, row, start:], ref_fitted)
+            assert np.allclose(steps(5)[series, row], ref_forecast)
+
+
+def test_forecast_series_method_and_bands():
+    dates = [f"{2022 + i // 12}-{i % 12 + 1:02d}-01" for i in range(18)]
+    values = [10 + i for i in range(18)]
+    forecast = forecast_series(dates, values)
+    assert forecast.method.startswith("Holt's Linear")
+    assert forecast.dates == ["2023-07-01", "2023-08-01", "2023-09-01", "2023-10-01", "2023-11-01"]
+    assert np.allclose(forecast.p50, [28, 29, 30, 31, 32])
+    assert all(lo <= mid <= hi for lo, mid, hi in zip(forecast.p10, forecast.p50, forecast.p90))
+    assert forecast_series(dates[:6], values[:6]).method.startswith("Simple Exponential")
+
+
+def test_forecast_many_matches_individual_forecasts():
+    rng = np.random.default_rng(1)
+    series = []
+    for n in (30, 30, 15, 8):
+        dates = [f"{2020 + i // 12}-{i % 12 + 1:02d}-01" for i in range(n)]
+        series.append((dates, list(50 + rng.normal(0, 5, n).cumsum())))
+    batched = forecast_many(series)
+    for (dates, values), forecast in zip(series, batched):
+        assert forecast == forecast_series(dates, values)
+
+
+def test_future_dates_keeps_format_and_clamps_day():
+    assert future_dates("2024-01-31", 2) == ["2024-02-29", "2024-03-31"]
+    assert future_dates("Nov 2024", 2) == ["Dec 2024", "Jan 2025"]
@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.response_parser import validate_fused_response
+
+TWO_CHARTS = {"success_criteria": ["Return at least 2 charts with labelled axes"]}
+
+
+def _chart(name):
+    return {"plot_type": "line", "data": [{"Date": "2025-01", name: 1}]}
+
+
+def _reply(analysis, summary="## Summary\nRevenue is up."):
+    reply = {"analysis": analysis}
+    if summary is not None:
+        reply["executive_summary"] = summary
+    return json.dumps(reply)
+
+
+def test_valid_fused_reply_is_split_into_analysis_and_summary():
+    analysis = {"revenue": _chart("revenue"), "orders": _chart("orders")}
+    assert validate_fused_response(_reply(analysis), TWO_CHARTS) == (analysis, "## Summary\nRevenue is up.")
+
+
+def test_reply_without_executive_summary_is_rejected():
+    with pytest.raises(ValueError, match="no executive summary"):
+        validate_fused_response(_reply({"revenue": _chart("revenue")}, summary=None), {})
+    with pytest.raises(ValueError, match="no executive summary"):
+        validate_fused_response(_reply({"revenue": _chart("revenue")}, summary="  "), {})
+
+
+def test_reply_with_too_few_charts_is_rejected_when_two_are_required():
+    reply = _reply({"revenue": _chart("revenue"), "note": "only one chart"})
+    with pytest.raises(ValueError, match="1 charts, sub-agent requires 2"):
+        validate_fused_response(reply, TWO_CHARTS)
+    # Without that criterion one chart is enough
+    assert validate_fused_response(reply, {})[1].startswith("## Summary")
+
+
+def test_non_json_reply_is_rejected():
+    with pytest.raises(ValueError, match="not a JSON object"):
+        validate_fused_response("Here is your analysis: revenue is up.", {})
+
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    # The orchestrator needs the full agent stack (autogen, transformers, ...)
+    module = pytest.importorskip("app.services.orchestrator_agent")
+    monkeypatch.setattr(module, "fit_agent_prompt",
+                        lambda name, cfg, build, context: SimpleNamespace(prompt=build(context)))
+    monkeypatch.setattr(module.token_tracker, "track_agent_tokens", lambda **kwargs: None)
+    monkeypatch.setattr(module.memory_manager, "save_agent_memory", lambda **kwargs: None)
+    return module
+
+
+def _run_fused(orchestrator, monkeypatch, cached, fresh):
+    calls = []
+
+    def llm(agent_name, input_text, **kwargs):
+        calls.append(kwargs)
+        return fresh
+
+    monkeypatch.setattr(orchestrator, "search_cache", lambda key, tenant_id: cached)
+    monkeypatch.setattr(orchestrator, "real_agent_response", llm)
+    parent = {"llm_config": {"model": "m"}, "prompt_template": "Summarize {{input}} for {{question}}",
+              "token_budget": None}
+    sub_agent = {"agent_id": "SalesTrend", "params": {"prompt_template": "Chart {{input}}"}, **TWO_CHARTS}
+    result = orchestrator.execute_fused_agent_fast("SalesAnalyst", parent, sub_agent, "revenue by month?",
+                                                   "job-1", "tenant-a", ("rows", "ctx", None))
+    return result, calls
+
+
+def test_rejected_cached_fused_reply_is_not_served(orchestrator, monkeypatch):
+    cached = _reply({"revenue": _chart("revenue")})  # one chart: fails the sub-agent's criteria
+    fresh = _reply({"revenue": _chart("revenue"), "orders": _chart("orders")})
+
+    result, calls = _run_fused(orchestrator, monkeypatch, cached, fresh)
+
+    assert len(calls) == 1 and calls[0]["json_mode"] is True
+    analysis, summary, cache_info = result
+    assert set(json.loads(analysis)) == {"revenue", "orders"} and cache_info["cache_hit"] is False
+
+
+def test_caller_falls_back_to_two_steps_when_no_fused_reply_validates(orchestrator, monkeypatch):
+    cached = _reply({"revenue": _chart("revenue")})
+    fresh = _reply({"revenue": _chart("revenue"), "orders": _chart("orders")}, summary=None)
+
+    # None is the signal run_autogen_agent uses to run the sub-agent and parent separately
+    assert _run_fused(orchestrator, monkeypatch, cached, fresh)[0] is None
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+import app.services.ingestion_jobs as ingestion_jobs_module
+from app.services.ingestion_jobs import IngestionJob, IngestionJobQueue, IngestionQueueFull
+
+
+class StubPipeline:
+    """Stands in for ExcelToElasticsearch; behaviour is set per test on the class."""
+
+    calls = []
+    release = None
+    connected = True
+    error = None
+
+    def __init__(self, index_name, sub_index, tenant_id):
+        self.sub_index = sub_index
+
+    def validate_elasticsearch_connection(self):
+        return self.connected
+
+    def process_excel(self, file_path, metrics=None, file_hash=None):
+        StubPipeline.calls.append((self.sub_index, file_path, file_hash))
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error:
+            raise RuntimeError(self.error)
+        metrics.rows_parsed = 3
+        return {"indexed_documents": 3}
+
+
+@pytest.fixture(autouse=True)
+def pipeline(monkeypatch):
+    monkeypatch.setattr(StubPipeline, "calls", [])
+    monkeypatch.setattr(ingestion_jobs_module, "ExcelToElasticsearch", StubPipeline)
+    return StubPipeline
+
+
+def _job(tmp_path, name="sales"):
+    path = tmp_path / f"{name}.xlsx"
+    path.write_bytes(b"xlsx")
+    return IngestionJob(tenant_id="t1", index_name="agent_dataset", sub_index=name,
+                        filename=f"{name}.xlsx", file_path=str(path), file_hash=f"md5-{name}")
+
+
+def _wait_for(jobs, job_id, statuses=("completed", "failed"), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job is not None and job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job stuck in {jobs.get(job_id).status}")
+
+
+def test_job_runs_to_completion_and_removes_its_temp_file(tmp_path, pipeline):
+    jobs = IngestionJobQueue()
+    job = _job(tmp_path)
+    assert job.to_dict()["progress"] == {"rows_parsed": 0, "rows_embedded": 0, "rows_indexed": 0}
+
+    jobs.submit(job)
+    done = _wait_for(jobs, job.job_id).to_dict()
+
+    assert done["status"] == "completed" and done["result"] == {"indexed_documents": 3}
+    assert done["started_at"] and done["finished_at"] and done["progress"]["rows_parsed"] == 3
+    assert pipeline.calls == [("sales", job.file_path, "md5-sales")]
+    assert not (tmp_path / "sales.xlsx").exists()
+
+
+@pytest.mark.parametrize("connected, error, message", [
+    (False, None, "Elasticsearch connection failed"),
+    (True, "bad workbook", "bad workbook"),
+])
+def test_failed_job_records_the_error_and_removes_its_temp_file(tmp_path, monkeypatch, pipeline,
+                                                                connected, error, message):
+    monkeypatch.setattr(pipeline, "connected", connected)
+    monkeypatch.setattr(pipeline, "error", error)
+    jobs = IngestionJobQueue()
+    job = jobs.submit(_job(tmp_path))
+
+    done = _wait_for(jobs, job.job_id)
+    assert (done.status, done.error) == ("failed", message)
+    assert not (tmp_path / "sales.xlsx").exists()
+
+
+def test_full_queue_rejects_new_jobs(tmp_path, monkeypatch, pipeline):
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "release", release)
+    jobs = IngestionJobQueue(workers=1, max_queued=1)
+    try:
+        running = jobs.submit(_job(tmp_path, "a"))
+        _wait_for(jobs, running.job_id, statuses=("running",))
+        queued = jobs.submit(_job(tmp_path, "b"))
+
+        rejected = _job(tmp_path, "c")
+        with pytest.raises(IngestionQueueFull):
+            jobs.submit(rejected)
+        assert jobs.get(rejected.job_id) is None
+        assert jobs.get(queued.job_id).status == "queued"
+    finally:
+        release.set()
+    assert _wait_for(jobs, queued.job_id).status == "completed"
+
+
+def test_only_finished_jobs_are_evicted_past_retention(tmp_path, monkeypatch, pipeline):
+    jobs = IngestionJobQueue(workers=1, retention=2)
+    first, second = jobs.submit(_job(tmp_path, "a")), jobs.submit(_job(tmp_path, "b"))
+    _wait_for(jobs, first.job_id), _wait_for(jobs, second.job_id)
+
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "release", release)
+    try:
+        third = jobs.submit(_job(tmp_path, "c"))
+        assert jobs.get(first.job_id) is None and jobs.get(second.job_id) is not None
+        _wait_for(jobs, third.job_id, statuses=("running",))
+        fourth = jobs.submit(_job(tmp_path, "d"))
+        # Over the limit again, but only a finished job may go
+        assert jobs.get(second.job_id) is None
+        fifth = jobs.submit(_job(tmp_path, "e"))
+        assert jobs.get(third.job_id) is not None and jobs.get(fourth.job_id) is not None
+        assert jobs.get(fifth.job_id) is not None
+    finally:
+        release.set()
+    assert _wait_for(jobs, fifth.job_id).status == "completed"
@@ -0,0 +1,65 @@
+import random
+import re
+
+import pytest
+
+from app.utils.keyword_matcher import AhoCorasick, KeywordSelector
+
+
+def _linear_scan(keys, title):
+    """The original prompt lookup: keys in config order, first exact or contained match wins."""
+    if not title:
+        return None
+    normalized_title = re.sub(r'[^a-z]', '', title.lower())
+    for key in keys:
+        normalized_key = re.sub(r'[^a-z]', '', key.lower())
+        if normalized_key == normalized_title:
+            return key
+        if normalized_key and normalized_key in normalized_title:
+            return key
+    return None
+
+
+KEYS = ["Net Revenue", "Revenue", "revenue growth", "Gross-Margin %", "margin", "Customer Churn Rate", "churn",
+        "NPS", "sales", "salesforce", "2024"]
+
+
+@pytest.mark.parametrize("title", [
+    "Net Revenue",
+    "net_revenue (USD)",
+    "Revenue Growth YoY",              # "revenue" comes before "revenue growth" in config order
+    "GROSS MARGIN %",
+    "Operating margin",
+    "Monthly customer churn rate",
+    "Churn",
+    "nps score",
+    "Salesforce pipeline",             # "sales" is listed first and is contained
+    "Headcount",
+    "2024",                            # no letters: only a key with no letters matches
+    "",
+    None,
+])
+def test_selection_matches_the_linear_scan(title):
+    assert KeywordSelector(KEYS).select(title) == _linear_scan(KEYS, title)
+
+
+def test_config_order_beats_match_position_and_length():
+    keys = ["growth", "revenuegrowth", "revenue"]
+    assert KeywordSelector(keys).select("Revenue Growth") == "growth"
+    assert KeywordSelector(list(reversed(keys))).select("Revenue Growth") == "revenue"
+
+
+def test_selection_matches_the_linear_scan_on_random_titles():
+    rng = random.Random(7)
+    words = ["rev", "revenue", "net", "enue", "Churn", "CHURN rate", "rate", "margin", "gin", "a", "Net-Rev"]
+    for _ in range(300):
+        keys = rng.sample(words, rng.randint(1, len(words)))
+        title = " ".join(rng.choice(words + ["x", "42", "Q3"]) for _ in range(rng.randint(0, 4)))
+        assert KeywordSelector(keys).select(title) == _linear_scan(keys, title), (keys, title)
+
+
+def test_overlapping_keywords_are_all_found():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    assert matcher.find_all("ushers") == [0, 1, 3]
+    assert matcher.first_match("ushers") == 0
+    assert matcher.first_match("xyz") is None
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.prompt_budget import (TokenBudgetExceeded, fit_prompt, prompt_token_limit,
+                                        trim_context)
+
+
+def words(text):
+    return len(text.split())
+
+
+CONTEXT = "\n".join([
+    "=== SALES DATA ===",
+    "Score: 1.20 | region north revenue fell",
+    "Score: 1.90 | region south revenue rose sharply",
+    "Score: 1.50 | region east flat",
+    "",
+    "=== MARKETING DATA ===",
+    "Score: 1.10 | campaign a spend up",
+    "Score: 1.70 | campaign b conversions doubled",
+])
+
+
+def test_context_that_fits_is_untouched():
+    assert trim_context(CONTEXT, 1000, words) == CONTEXT
+
+
+def test_trim_keeps_headers_and_top_hit_of_every_dataset():
+    trimmed = trim_context(CONTEXT, 28, words)
+    assert trimmed.splitlines() == [
+        "=== SALES DATA ===",
+        "Score: 1.90 | region south revenue rose sharply",
+        "",
+        "=== MARKETING DATA ===",
+        "Score: 1.70 | campaign b conversions doubled",
+    ]
+    assert words(trimmed) <= 28
+
+
+def test_unstructured_context_is_cut_at_the_end():
+    trimmed = trim_context("one two three four five six seven eight", 5, words)
+    assert trimmed.startswith("one two") and trimmed.endswith("[truncated]") and words(trimmed) <= 5
+
+
+def test_fit_prompt_trims_context_then_refuses_oversized_template():
+    build = lambda context: f"Question: why did sales move?\n\n{context}"
+    fitted = fit_prompt(build, CONTEXT, 30, words)
+    assert fitted.trimmed and fitted.prompt_tokens <= 30 and "region south" in fitted.prompt
+    assert not fit_prompt(build, CONTEXT, 500, words).trimmed
+    with pytest.raises(TokenBudgetExceeded):
+        fit_prompt(build, CONTEXT, 3, words)
+
+
+def test_limit_reserves_completion_and_spent_tokens():
+    cfg = {"token_budget": 5000, "llm_config": {"max_tokens": 700}}
+    assert prompt_token_limit(cfg) == 4300
+    assert prompt_token_limit(cfg, spent=4000) == 300
+    assert prompt_token_limit({"llm_config": {}}, spent=10 ** 6) > 0
@@ -0,0 +1,54 @@
+import json
+
+from app.services.report_store import ReportStore, build_predictive_report
+
+
+def _prediction(history=6, horizon=5):
+    dates = [f"2025-{m:02d}" for m in range(1, history + horizon + 1)]
+    return {
+        "prediction_result": {
+            "title": "ForecastP50",
+            "x": dates,
+            "y": list(range(history + horizon)),
+            "prediction_metadata": {
+                "predicted_dates": dates[history:],
+                "predicted_values": list(range(history, history + horizon)),
+                "confidence_level": "high",
+                "method": "ETS(A,A,N)",
+            },
+        },
+        "popup": {"summary": "up"},
+    }
+
+
+def test_report_reads_the_nested_prediction_result():
+    report = build_predictive_report(_prediction(), "tenant-a", "revenue", "line")
+
+    assert report["analysis_summary"] == {
+        "title": "ForecastP50",
+        "total_data_points": 11,
+        "historical_points": 6,
+        "predicted_points": 5,
+        "confidence_level": "high",
+        "trend_analysis": "Trend analysis performed",
+    }
+    assert report["predicted_data"]["methodology"] == "ETS(A,A,N)"
+    # A bare prediction_result gives the same summary
+    bare = build_predictive_report(_prediction()["prediction_result"], "tenant-a", "revenue", "line")
+    assert bare["analysis_summary"] == report["analysis_summary"]
+
+
+def test_submitted_report_is_written_and_indexed(tmp_path):
+    store = ReportStore(base_dir=str(tmp_path), max_per_tenant=2)
+    paths = []
+    for metric in ("revenue", "orders", "revenue"):
+        path, future = store.submit("tenant-a", metric, build_predictive_report(_prediction(), "tenant-a", metric, "line"))
+        assert future.result(timeout=5) == path
+        paths.append(path)
+
+    with open(paths[-1]) as f:
+        assert json.load(f)["analysis_summary"]["title"] == "ForecastP50"
+    listed = store.list_reports("tenant-a")
+    assert [entry["path"] for entry in listed] == paths[:0:-1]
+    assert listed[0]["confidence_level"] == "high"
+    assert [entry["metric_key"] for entry in store.list_reports("tenant-a", metric_key="orders")] == ["orders"]
@@ -0,0 +1,60 @@
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from app.services.retry_scheduler import (RetryPolicy, RetryScheduler, classify_error, is_retryable_status,
+                                          parse_retry_after)
+
+
+def test_backoff_grows_exponentially_with_jitter_and_cap():
+    policy = RetryPolicy.from_config({"max_attempts": 5, "delay_seconds": 1, "jitter": 0.5}, max_delay=3)
+    for _ in range(50):
+        assert 0.5 <= policy.next_delay(1) <= 1
+        assert 1 <= policy.next_delay(2) <= 2
+        assert 1.5 <= policy.next_delay(4) <= 3
+    assert RetryPolicy.from_config({"delay_seconds": 2, "jitter": 0}).next_delay(3) == 8
+
+
+def test_retry_after_is_a_lower_bound():
+    policy = RetryPolicy(max_attempts=3, base_delay=1, jitter=0)
+    assert policy.next_delay(1, retry_after=7) == 7
+    assert policy.next_delay(1, retry_after=0.1) == 1
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 30
+
+
+def test_error_classification():
+    class CallError(Exception):
+        def __init__(self, retryable, retry_after=None):
+            self.retryable, self.retry_after = retryable, retry_after
+
+    assert all(is_retryable_status(code) for code in (429, 500, 503, 408))
+    assert not any(is_retryable_status(code) for code in (400, 401, 404))
+    assert classify_error(CallError(True, 5)) == (True, 5)
+    assert classify_error(CallError(False)) == (False, None)
+    assert classify_error(TimeoutError()) == (True, None)
+    assert classify_error(KeyError("x")) == (False, None)
+
+
+def test_scheduler_runs_callbacks_in_due_order_without_blocking_caller():
+    scheduler = RetryScheduler(workers=2)
+    fired, done = [], threading.Event()
+
+    def record(name):
+        fired.append(name)
+        if len(fired) == 3:
+            done.set()
+
+    start = time.monotonic()
+    scheduler.call_later(0.2, record, "late")
+    scheduler.call_later(0.05, record, "early")
+    scheduler.call_later(0, record, "now")
+    assert time.monotonic() - start < 0.05
+    assert done.wait(2)
+    assert fired == ["now", "early", "late"] and scheduler.pending() == 0
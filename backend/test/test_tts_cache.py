@@ -0,0 +1,30 @@
+import os
+
+from app.services.tts_cache import TTSCache
+
+
+def test_least_recently_used_files_are_evicted_past_the_limit(tmp_path):
+    cache = TTSCache(base_dir=str(tmp_path), max_bytes=25)
+    first = cache.put("t1", "a", "mp3", b"x" * 10)
+    second = cache.put("t2", "b", "mp3", b"x" * 10)
+    assert cache.get("t1", "a", "mp3") == first  # a hit makes "a" the most recent
+
+    third = cache.put("t1", "c", "mp3", b"x" * 10)
+
+    assert first.exists() and third.exists() and not second.exists()
+    assert cache._total == 20
+
+
+def test_existing_files_are_counted_once_and_overwrites_are_not_double_counted(tmp_path):
+    (tmp_path / "t1").mkdir()
+    (tmp_path / "t1" / "old.mp3").write_bytes(b"x" * 20)
+    os.utime(tmp_path / "t1" / "old.mp3", (0, 0))
+    cache = TTSCache(base_dir=str(tmp_path), max_bytes=30)
+
+    cache.put("t1", "new", "mp3", b"x" * 5)
+    cache.put("t1", "new", "mp3", b"x" * 8)
+    assert cache._total == 28 and (tmp_path / "t1" / "old.mp3").exists()
+
+    cache.put("t1", "more", "mp3", b"x" * 5)
+    assert not (tmp_path / "t1" / "old.mp3").exists()
+    assert cache._total == 13
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.upload_spool import InvalidUpload, UploadTooLarge, spool_form
+
+LIMIT = 64 * 1024
+
+
+def _client(seen, **options):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        try:
+            form = await spool_form(request, max_file_size=LIMIT, **options)
+        except (UploadTooLarge, InvalidUpload) as e:
+            seen["error"] = e
+            return {"error": type(e).__name__}
+        seen["form"] = form
+        return {"files": len(form.files)}
+
+    return TestClient(app)
+
+
+def test_files_are_spooled_with_their_digest_and_fields_are_read(tmp_path):
+    seen = {}
+    data = os.urandom(LIMIT - 1)
+    response = _client(seen).post("/upload", data={"tenant_id": "t1"},
+                                  files=[("file", ("sales.xlsx", data)), ("file", ("more.xlsx", b"abc"))])
+
+    assert response.json() == {"files": 2}
+    form = seen["form"]
+    assert form.fields == {"tenant_id": "t1"}
+    first, second = form.get_files("file")
+    assert (first.filename, first.size, first.upload.md5) == ("sales.xlsx", len(data), hashlib.md5(data).hexdigest())
+    assert first.upload.path.endswith(".xlsx")
+    with open(first.upload.path, "rb") as f:
+        assert f.read() == data
+    assert second.upload.size == 3
+
+    form.cleanup(keep=second.upload.path)
+    assert not os.path.exists(first.upload.path) and os.path.exists(second.upload.path)
+    os.unlink(second.upload.path)
+
+
+def test_oversized_content_length_is_refused_before_the_body_is_read():
+    seen = {}
+    client = _client(seen, max_body_size=1024)
+    response = client.post("/upload", files={"file": ("big.xlsx", b"x" * 4096)})
+
+    assert response.json() == {"error": "UploadTooLarge"}
+    assert seen["error"].limit == 1024 and seen["error"].size > 4096
+
+
+def test_an_oversized_file_leaves_no_temp_file(monkeypatch, tmp_path):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    seen = {}
+    response = _client(seen).post("/upload", files={"file": ("big.xlsx", b"x" * (LIMIT + 1))})
+
+    assert response.json() == {"error": "UploadTooLarge"}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_files_can_be_drained_and_reported():
+    seen = {}
+    response = _client(seen, drain_oversized=True).post(
+        "/upload", files=[("files", ("big.csv", b"x" * (LIMIT + 10))), ("files", ("ok.csv", b"y"))])
+
+    assert response.json() == {"files": 2}
+    big, ok = seen["form"].get_files("files")
+    assert big.upload is None and big.size == LIMIT + 10
+    assert ok.upload is not None
+    seen["form"].cleanup()
+
+
+def test_a_non_multipart_body_is_rejected():
+    seen = {}
+    assert _client(seen).post("/upload", json={"a": 1}).json() == {"error": "InvalidUpload"}
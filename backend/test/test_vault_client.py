@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+import vault.client as vault_client
+
+
+class FakeKV:
+    def __init__(self):
+        self.reads = 0
+        self.value = "key-1"
+        self.fail = False
+
+    def read_secret_version(self, path):
+        self.reads += 1
+        if self.fail:
+            raise ConnectionError("vault down")
+        return {"lease_duration": 0, "data": {"data": {"api_key": self.value}}}
+
+
+class FakeClient:
+    def __init__(self, kv):
+        self.secrets = type("Secrets", (), {"kv": type("KV", (), {"v2": kv})()})()
+
+
+@pytest.fixture
+def kv(monkeypatch):
+    kv = FakeKV()
+    monkeypatch.setattr(vault_client, "_client", FakeClient(kv))
+    vault_client.invalidate_vault_secret()
+    yield kv
+    vault_client.invalidate_vault_secret()
+
+
+def test_secret_is_read_from_vault_once(kv):
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-1"
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-1"
+    assert kv.reads == 1
+    with pytest.raises(Exception, match="not found"):
+        vault_client.get_vault_secret("groq", "missing")
+    assert kv.reads == 1
+
+
+def test_stale_secret_is_served_while_refreshing(kv, monkeypatch):
+    monkeypatch.setattr(vault_client, "SECRET_TTL_SECONDS", 0.01)
+    vault_client.get_vault_secret("groq", "api_key")
+    kv.value = "key-2"
+    time.sleep(0.02)
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-1"
+    for _ in range(100):
+        if vault_client.get_vault_secret("groq", "api_key") == "key-2":
+            break
+        time.sleep(0.01)
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-2"
+
+
+def test_failures_back_off_without_calling_vault(kv):
+    kv.fail = True
+    for _ in range(3):
+        with pytest.raises(Exception, match="vault down"):
+            vault_client.get_vault_secret("openrouter", "api_key")
+    assert kv.reads == 1
+
+
+def test_stale_secret_is_not_served_past_the_staleness_limit(kv, monkeypatch):
+    monkeypatch.setattr(vault_client, "SECRET_TTL_SECONDS", 0.05)
+    monkeypatch.setattr(vault_client, "FAILURE_BACKOFF_SECONDS", 0)
+    vault_client.get_vault_secret("groq", "api_key")
+    kv.fail = True
+    time.sleep(0.05)
+    # Within the limit the cached value is still served while refreshes fail
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-1"
+
+    time.sleep(0.05 * vault_client.MAX_STALENESS_FACTOR)
+    with pytest.raises(Exception, match="vault down"):
+        vault_client.get_vault_secret("groq", "api_key")
+
+    kv.fail, kv.value = False, "key-2"
+    assert vault_client.get_vault_secret("groq", "api_key") == "key-2"
@@ -1,41 +1,146 @@
 import os
+import threading
+import time
 import hvac
 import logging
+from typing import Any, Dict, Optional, Tuple
 
 logger = logging.getLogger("uvicorn.error")
 
+# Secrets are served from memory; Vault is only contacted to (re)load them.
+SECRET_TTL_SECONDS = float(os.getenv("VAULT_SECRET_TTL_SECONDS", "300"))
+# Fraction of the TTL/lease after which a background refresh starts
+REFRESH_FRACTION = 0.75
+# Past this multiple of the TTL/lease a cached value is no longer served, even if refreshes keep failing
+MAX_STALENESS_FACTOR = float(os.getenv("VAULT_MAX_STALENESS_FACTOR", "3"))
+# After a failed read, callers fall back immediately for this long
+FAILURE_BACKOFF_SECONDS = float(os.getenv("VAULT_FAILURE_BACKOFF_SECONDS", "30"))
+
+_client: Optional[hvac.Client] = None
+_client_lock = threading.Lock()
+# secret_path -> (data, fetched_at, ttl)
+_secrets: Dict[str, Tuple[Dict[str, Any], float, float]] = {}
+_secrets_lock = threading.Lock()
+_refreshing: set = set()
+_failures: Dict[str, Tuple[float, Exception]] = {}
+
+
+def _get_client() -> hvac.Client:
+    """One authenticated client per process; authentication is checked once."""
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            #For local
+            # vault_addr = os.getenv("VAULT_ADDR", "http://127.0.0.1:8200")
+            # vault_token = os.getenv("VAULT_TOKEN", "for local")
+
+            #For Docker
+            vault_addr = os.getenv("VAULT_ADDR", "http://vault:8200")
+            vault_token = os.getenv("VAULT_TOKEN")
+
+            if not vault_token:
+                raise ValueError("VAULT_TOKEN not found in environment variables.")
+
+            client = hvac.Client(url=vault_addr, token=vault_token)
+
+            if not client.is_authenticated():
+                raise Exception("Failed to authenticate with Vault")
+            _client = client
+    return _client
+
+
+def _reset_client() -> None:
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def _fetch_secret(secret_path: str) -> Tuple[Dict[str, Any], float]:
+    """Read a KV v2 secret; returns (data, ttl) where ttl honours the lease."""
+    try:
+        response = _get_client().secrets.kv.v2.read_secret_version(path=secret_path)
+    except hvac.exceptions.Forbidden:
+        # Token may have been rotated: re-authenticate once and retry
+        _reset_client()
+        response = _get_client().secrets.kv.v2.read_secret_version(path=secret_path)
+    lease = response.get("lease_duration") or 0
+    ttl = min(SECRET_TTL_SECONDS, lease) if lease > 0 else SECRET_TTL_SECONDS
+    return response['data']['data'], ttl
+
+
+def _load(secret_path: str) -> Dict[str, Any]:
+    try:
+        data, ttl = _fetch_secret(secret_path)
+    except Exception as e:
+        with _secrets_lock:
+            _failures[secret_path] = (time.time(), e)
+        raise
+    with _secrets_lock:
+        _secrets[secret_path] = (data, time.time(), ttl)
+        _failures.pop(secret_path, None)
+    return data
+
+
+def _refresh_in_background(secret_path: str) -> None:
+    def refresh():
+        try:
+            _load(secret_path)
+        except Exception as e:
+            logger.warning(f"Vault refresh of '{secret_path}' failed, serving cached value: {e}")
+        finally:
+            with _secrets_lock:
+                _refreshing.discard(secret_path)
+
+    with _secrets_lock:
+        if secret_path in _refreshing:
+            return
+        _refreshing.add(secret_path)
+    threading.Thread(target=refresh, name=f"vault-refresh-{secret_path}", daemon=True).start()
+
+
+def _get_secret_data(secret_path: str) -> Dict[str, Any]:
+    now = time.time()
+    with _secrets_lock:
+        cached = _secrets.get(secret_path)
+        failure = _failures.get(secret_path)
+
+    if cached is not None:
+        data, fetched_at, ttl = cached
+        age = now - fetched_at
+        if age < ttl * MAX_STALENESS_FACTOR:
+            if age >= ttl * REFRESH_FRACTION:
+                _refresh_in_background(secret_path)
+            # A slightly stale value beats blocking the request on Vault; the refresh replaces it
+            return data
+        # Refreshes have kept failing for too long: read (or fail) like a first request
+
+    if failure is not None and now - failure[0] < FAILURE_BACKOFF_SECONDS:
+        raise failure[1]
+    return _load(secret_path)
+
 
 def get_vault_secret(secret_path: str, key: str) -> str:
     """
     Retrieve a secret from HashiCorp Vault.
-    
+
+    Secrets are cached in-process per path and refreshed in the background
+    once VAULT_SECRET_TTL_SECONDS (or the secret's lease, if shorter) is
+    mostly used up, so only the first read of a path waits on Vault. If
+    refreshes keep failing, the cached value is served for at most
+    VAULT_MAX_STALENESS_FACTOR times the TTL; after that reads go to Vault
+    again and raise while it is unreachable.
+
     Args:
         secret_path: Path to the secret in Vault (e.g., "groq" for secret/data/groq)
         key: The key within the secret (e.g., "api_key")
-    
+
     Returns:
         The secret value as a string
     """
-
-    #For local
-    # vault_addr = os.getenv("VAULT_ADDR", "http://127.0.0.1:8200")
-    # vault_token = os.getenv("VAULT_TOKEN", "for local")
-
-    #For Docker
-    vault_addr = os.getenv("VAULT_ADDR", "http://vault:8200")
-    vault_token = os.getenv("VAULT_TOKEN")
-
-    if not vault_token:
-        raise ValueError("VAULT_TOKEN not found in environment variables.")
-
-    client = hvac.Client(url=vault_addr, token=vault_token)
-
-    if not client.is_authenticated():
-        raise Exception("Failed to authenticate with Vault")
-
     try:
-        response = client.secrets.kv.v2.read_secret_version(path=secret_path)
-        secret_data = response['data']['data']
+        secret_data = _get_secret_data(secret_path)
 
         if key not in secret_data:
             raise KeyError(f"Key '{key}' not found in secret at path '{secret_path}'")
@@ -43,4 +148,15 @@ def get_vault_secret(secret_path: str, key: str) -> str:
         return secret_data[key]
 
     except Exception as e:
-        raise Exception(f"Failed to retrieve secret from Vault: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to retrieve secret from Vault: {str(e)}")
+
+
+def invalidate_vault_secret(secret_path: Optional[str] = None) -> None:
+    """Drop cached secrets (all, or one path) so the next read goes to Vault."""
+    with _secrets_lock:
+        if secret_path is None:
+            _secrets.clear()
+            _failures.clear()
+        else:
+            _secrets.pop(secret_path, None)
+            _failures.pop(secret_path, None)